@@ -0,0 +1 @@
+# 負載測試套件: 合成資料產生器(datagen)、范植鈞 / 徐 的資料載入與使用者行為腳本，執行方式見 __main__.py
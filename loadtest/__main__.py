@@ -0,0 +1,106 @@
+# 負載測試與合成資料
+# 每次針對一個 app: 把 app 複製到工作目錄(上傳檔案、SQLite 都寫在這裡)，產生資料後執行使用者行為腳本，結果寫成 JSON
+# 直接呼叫 app(不經過網路)；也可以在工作目錄啟動 server 後以 --base 指定網址
+# 用法(在 repo 根目錄):
+#   python -m loadtest generate --app 范植鈞 --scale small --seed 1 --workdir /tmp/lt-fan --database-url postgresql://user:pw@localhost/loadtest
+#   python -m loadtest run --app 范植鈞 --workdir /tmp/lt-fan --database-url ... --concurrency 20 --duration 60 --out fan.json
+#   python -m loadtest all --app 徐 --scale tiny --workdir /tmp/lt-xu --out xu.json
+# --scale: tiny / small / medium / large(10k 委託人、1M 專案、10M 報價)，可用 --clients 等參數覆寫
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import time
+
+from loadtest import datagen, runner
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MANIFEST = "loadtest.json"
+
+def get_target(app):
+    if app == "范植鈞":
+        from loadtest import fastapi_pg
+        return fastapi_pg
+    if app == "徐":
+        from loadtest import flask_sqlite
+        return flask_sqlite
+    raise SystemExit(f"未知的 app: {app}")
+
+def prepare_workdir(target, workdir):
+    """第一次使用時把 app 複製到工作目錄(略過執行期資料)，之後切換到工作目錄並讓 app 的模組可以匯入"""
+    if not os.path.exists(os.path.join(workdir, MANIFEST)):
+        shutil.copytree(os.path.join(REPO_ROOT, target.APP_DIR), workdir, dirs_exist_ok=True,
+                        ignore=shutil.ignore_patterns("__pycache__", "*.sqlite3", *target.RUNTIME_DIRS))
+    os.chdir(workdir)
+    sys.path.insert(0, workdir)
+
+def generate(args, target):
+    scale = datagen.resolve_scale(args.scale, clients=args.clients, contractors=args.contractors, projects=args.projects, bids=args.bids)
+    started = time.perf_counter()
+    counts = target.load(scale, args.seed, args.disk_projects, args.reset)
+    elapsed = time.perf_counter() - started
+    with open(MANIFEST, "w", encoding="utf-8") as f:
+        json.dump({"app": args.app, "scale": scale, "seed": args.seed, "counts": counts}, f, ensure_ascii=False, indent=2)
+    rows = sum(counts.values())
+    print(f"{args.app}: 載入 {rows} 筆 {elapsed:.1f}s ({rows / elapsed:.0f} 筆/s)  " + "  ".join(f"{table} {n}" for table, n in counts.items()))
+
+async def run_journeys(args, target):
+    if not os.path.exists(MANIFEST):
+        raise SystemExit(f"{args.workdir} 尚未產生資料，請先執行 generate")
+    with open(MANIFEST, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if args.base:
+        print(f"使用 {args.base}；server 需在 {args.workdir} 以相同的資料庫設定啟動")
+    async with target.open_app(args.base) as new_client:
+        context = {"scale": manifest["scale"], "seed": manifest["seed"], "new_client": new_client}
+        recorder, elapsed = await runner.run(target, context, args.concurrency, args.duration, args.journeys, args.seed, args.bidders)
+    result = runner.report(recorder, elapsed, {
+        "app": args.app,
+        "transport": args.base or "in-process",
+        "scale": manifest["scale"],
+        "seed": manifest["seed"],
+        "concurrency": args.concurrency,
+    })
+    runner.print_report(result)
+    if args.out:
+        runner.write_report(result, os.path.join(args.cwd, args.out))
+        print(f"結果已寫入 {args.out}")
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m loadtest")
+    parser.add_argument("command", choices=["generate", "run", "all"])
+    parser.add_argument("--app", required=True, choices=["范植鈞", "徐"])
+    parser.add_argument("--workdir", required=True, help="app 的複本與上傳檔案所在目錄")
+    parser.add_argument("--database-url", help="范植鈞: 測試用的 Postgres 資料庫")
+    # generate
+    parser.add_argument("--scale", default="tiny", choices=list(datagen.SCALES))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--clients", type=int)
+    parser.add_argument("--contractors", type=int)
+    parser.add_argument("--projects", type=int)
+    parser.add_argument("--bids", type=int)
+    parser.add_argument("--disk-projects", type=int, default=1_000, help="前幾個專案的上傳檔案實際寫到磁碟")
+    parser.add_argument("--reset", action="store_true", help="資料庫已有資料時先清空")
+    # run
+    parser.add_argument("--base", help="已啟動的 server 網址；未指定時直接呼叫 app")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--journeys", type=int, help="最多執行的腳本數")
+    parser.add_argument("--bidders", type=int, default=3, help="每個虛擬使用者的接案人帳號數")
+    parser.add_argument("--out", help="結果 JSON 檔")
+    args = parser.parse_args()
+    args.cwd = os.getcwd()
+    args.workdir = os.path.abspath(args.workdir)
+
+    target = get_target(args.app)
+    os.environ.update(target.environment(args.database_url))
+    prepare_workdir(target, args.workdir)
+    if args.command in ("generate", "all"):
+        generate(args, target)
+    if args.command in ("run", "all"):
+        asyncio.run(run_journeys(args, target))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# 合成資料產生器: 依規模與 seed 產生使用者、專案、報價、退件紀錄與上傳檔案
+# 產生的是兩個 app 共用的中性資料(見 project())，由 fastapi_pg / flask_sqlite 轉成各自的資料表
+# 每個專案各自以 (seed, 專案 id) 建立亂數產生器，同樣的 seed 與規模一定得到同樣的資料(時間欄位以產生當下為基準)
+import hashlib
+import random
+from datetime import datetime, timedelta
+
+# 預設規模；命令列的 --clients 等參數可覆寫個別數量
+SCALES = {
+    "tiny": {"clients": 20, "contractors": 50, "projects": 500, "bids": 2_000},
+    "small": {"clients": 500, "contractors": 2_000, "projects": 20_000, "bids": 100_000},
+    "medium": {"clients": 2_000, "contractors": 10_000, "projects": 200_000, "bids": 1_000_000},
+    "large": {"clients": 10_000, "contractors": 50_000, "projects": 1_000_000, "bids": 10_000_000},
+}
+
+# 專案生命週期分布: open(可報價) / expired(截止無人報價) / in_progress(進行中) / review(等待結案審核) / closed(結案)
+STAGE_WEIGHTS = (("open", 30), ("expired", 10), ("in_progress", 25), ("review", 10), ("closed", 25))
+# 進行中以後的專案被退件過的機率，以及退件次數上限
+REJECTION_RATE = 0.3
+MAX_REJECTIONS = 3
+# 上傳檔案大小(位元組)
+FILE_SIZE = 4096
+
+# 產生的帳號共用同一個密碼，使用者行為腳本以此登入
+PASSWORD = "loadtest-pw"
+CLIENT_PREFIX = "lt-client-"
+CONTRACTOR_PREFIX = "lt-contractor-"
+
+WORDS = [
+    "網站", "維護", "行動", "App", "設計", "電商", "後台", "資料庫", "API", "串接", "爬蟲", "報表",
+    "LINE", "聊天機器人", "翻譯", "影片", "剪輯", "Logo", "UI", "UX", "測試", "雲端", "部署", "金流",
+    "會員", "系統", "預約", "排程", "地圖", "推播", "分析", "儀表板", "SEO", "行銷", "文案", "攝影",
+]
+
+def resolve_scale(name, **overrides):
+    scale = dict(SCALES[name])
+    scale.update({key: value for key, value in overrides.items() if value is not None})
+    return scale
+
+def users(scale):
+    """(id, username, role)；委託人 id 從 1 開始，接案人接在後面"""
+    for i in range(scale["clients"]):
+        yield i + 1, f"{CLIENT_PREFIX}{i}", "client"
+    for i in range(scale["contractors"]):
+        yield scale["clients"] + i + 1, f"{CONTRACTOR_PREFIX}{i}", "contractor"
+
+def client_id(scale, index):
+    return index + 1
+
+def contractor_id(scale, index):
+    return scale["clients"] + index + 1
+
+def file_content(sha_seed, size=FILE_SIZE):
+    """由字串決定的檔案內容，大小固定"""
+    block = hashlib.sha256(sha_seed.encode()).digest()
+    return (block * (size // len(block) + 1))[:size]
+
+def project(scale, seed, project_id, now):
+    """回傳一個專案與其報價、退件紀錄、檔案的 dict"""
+    rng = random.Random(seed * 1_000_003 + project_id)
+    stage = rng.choices([name for name, _ in STAGE_WEIGHTS], [weight for _, weight in STAGE_WEIGHTS])[0]
+    words = rng.sample(WORDS, 6)
+    created = now - timedelta(days=rng.uniform(1, 365))
+    if stage == "open":
+        deadline = now + timedelta(days=rng.uniform(1, 60))
+    else:
+        deadline = created + timedelta(days=rng.uniform(1, 30))
+        deadline = min(deadline, now - timedelta(minutes=1))
+
+    average = max(scale["bids"] / max(scale["projects"], 1), 1)
+    bid_count = 0 if stage == "expired" else min(rng.randint(1, max(int(2 * average) - 1, 1)), scale["contractors"])
+    bidders = rng.sample(range(scale["contractors"]), bid_count)
+    assigned = contractor_id(scale, bidders[0]) if stage in ("in_progress", "review", "closed") and bidders else None
+    bids = [{
+        "contractor_id": contractor_id(scale, index),
+        "contractor": f"{CONTRACTOR_PREFIX}{index}",
+        "price": round(rng.uniform(1_000, 200_000), -2),
+        "accepted": None if assigned is None else contractor_id(scale, index) == assigned,
+        "time": created + timedelta(hours=rng.uniform(0, 48)),
+    } for index in bidders]
+
+    rejections = []
+    files = []
+    if assigned is not None:
+        started = created + timedelta(days=2)
+        for n in range(rng.randint(1, MAX_REJECTIONS) if rng.random() < REJECTION_RATE else 0):
+            rejections.append({"time": started + timedelta(days=n + 1), "explanation": "請修正: " + " ".join(rng.sample(WORDS, 3))})
+        files.append(_file(project_id, "in_process", started, assigned))
+        for rejection in rejections:
+            files.append(_file(project_id, "rejected", rejection["time"] - timedelta(hours=1), assigned))
+        if stage in ("review", "closed"):
+            files.append(_file(project_id, "final", started + timedelta(days=len(rejections) + 1), assigned))
+
+    return {
+        "id": project_id,
+        "client_id": client_id(scale, rng.randrange(scale["clients"])),
+        "title": f"{words[0]}{words[1]} #{project_id}",
+        "description": " ".join(words[1:] + rng.sample(WORDS, 4)),
+        "stage": stage,
+        "created": created,
+        "deadline": deadline,
+        "closed": deadline + timedelta(days=len(rejections) + 10) if stage == "closed" else None,
+        "contractor_id": assigned,
+        "bids": bids,
+        "rejections": rejections,
+        "files": files,
+    }
+
+def _file(project_id, stage, time, uploader_id):
+    name = f"{stage}-{project_id}-{time:%Y%m%d%H%M}.bin"
+    return {
+        "stage": stage,
+        "folder": time.strftime("%Y-%m-%d_%H-%M"),
+        "filename": name,
+        "size": FILE_SIZE,
+        "sha256": hashlib.sha256(file_content(name)).hexdigest(),
+        "uploader_id": uploader_id,
+        "time": time,
+    }
+
+def projects(scale, seed, now=None):
+    now = now or datetime.now()
+    for project_id in range(1, scale["projects"] + 1):
+        yield project(scale, seed, project_id, now)
@@ -0,0 +1,207 @@
+# 范植鈞(FastAPI + Postgres): 以 COPY 載入合成資料，以及使用者行為腳本
+# 匯入 app 的模組(migrate、database、main)前需先切換到工作目錄並設定 DATABASE_URL / ASYNC_DATABASE_URL(見 __main__.py)
+import contextlib
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import httpx
+
+from loadtest import datagen
+from loadtest.runner import Session, JourneyFailed
+
+APP_DIR = "范植鈞"
+# 複製 app 到工作目錄時略過的執行期資料
+RUNTIME_DIRS = ("upload_file", "upload_proposal", "upload_sessions", "blobs", "archive_cache", "backup", "benchmarks")
+TIMEOUT = 120
+
+STATUS = {"open": "open", "expired": "noBid", "in_progress": "in_process", "review": "request_close", "closed": "closed"}
+
+COLUMNS = {
+    "users": ("id", "username", "email", "hashed_password", "role"),
+    "projects": ("id", "title", "description", "client_id", "assigned_contractor_id", "status", "close_requested",
+                 "create_time", "close_time", "close_explanation", "proposal_deadline"),
+    "bids": ("project_id", "contractor_id", "price", "proposal_file", "status"),
+    "project_rejections": ("project_id", "rejection_date", "explanation"),
+    "project_files": ("project_id", "stage", "folder", "filename", "size", "sha256", "uploader_id", "upload_time"),
+}
+
+def environment(database_url):
+    if not database_url:
+        raise SystemExit("范植鈞 需要 --database-url (測試用的 Postgres 資料庫)")
+    return {
+        "DATABASE_URL": database_url,
+        "ASYNC_DATABASE_URL": database_url.replace("postgresql://", "postgresql+asyncpg://", 1),
+    }
+
+def _copy_value(value):
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+def _write(buffer, row):
+    buffer.write("\t".join(_copy_value(value) for value in row) + "\n")
+
+def _write_file(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+
+def load(scale, seed, disk_projects, reset):
+    """產生資料並以 COPY 寫入，id <= disk_projects 的專案同時在工作目錄寫出上傳檔案與計劃書；回傳各資料表筆數"""
+    from sqlalchemy import text
+    import migrate
+    from database import engine
+    from passwords import hash_password
+
+    migrate.upgrade()
+    with engine.begin() as conn:
+        if conn.scalar(text("SELECT count(*) FROM users")):
+            if not reset:
+                raise SystemExit("資料庫已有資料；請指向測試用的資料庫，或加上 --reset 清空")
+            conn.exec_driver_sql("TRUNCATE users, projects, bids, project_rejections, project_files, jobs RESTART IDENTITY CASCADE")
+
+    hashed = hash_password(datagen.PASSWORD)
+    buffers = {table: tempfile.TemporaryFile("w+", encoding="utf-8") for table in COLUMNS}
+    counts = dict.fromkeys(COLUMNS, 0)
+    for user_id, username, role in datagen.users(scale):
+        _write(buffers["users"], (user_id, username, f"{username}@example.com", hashed, role))
+        counts["users"] += 1
+
+    for project in datagen.projects(scale, seed):
+        on_disk = project["id"] <= disk_projects
+        _write(buffers["projects"], (
+            project["id"], project["title"], project["description"], project["client_id"], project["contractor_id"],
+            STATUS[project["stage"]], project["stage"] == "review", project["created"], project["closed"],
+            "驗收完成" if project["closed"] else None, project["deadline"],
+        ))
+        for bid in project["bids"]:
+            # 與 submit_bid 相同: proposal_file 是資料夾，計劃書放在裡面
+            proposal = f"upload_proposal/{project['title']}/{bid['contractor']}/proposal.pdf"
+            status = "pending" if bid["accepted"] is None else ("accepted" if bid["accepted"] else "rejected")
+            _write(buffers["bids"], (project["id"], bid["contractor_id"], bid["price"], proposal, status))
+            if on_disk:
+                _write_file(os.path.join(proposal, "proposal.pdf"), datagen.file_content(proposal))
+        for rejection in project["rejections"]:
+            _write(buffers["project_rejections"], (project["id"], rejection["time"], rejection["explanation"]))
+        for f in project["files"]:
+            _write(buffers["project_files"], (project["id"], f["stage"], f["folder"], f["filename"], f["size"], f["sha256"], f["uploader_id"], f["time"]))
+            if on_disk:
+                _write_file(os.path.join("upload_file", project["title"], f["stage"], f["folder"], f["filename"]), datagen.file_content(f["filename"]))
+        counts["projects"] += 1
+        counts["bids"] += len(project["bids"])
+        counts["project_rejections"] += len(project["rejections"])
+        counts["project_files"] += len(project["files"])
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for table, columns in COLUMNS.items():
+            buffers[table].seek(0)
+            cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffers[table])
+            buffers[table].close()
+        # id 由產生器指定，序列接在最大值之後
+        for table in ("users", "projects"):
+            cursor.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT coalesce(max(id), 1) FROM {table}))")
+        raw.commit()
+        raw.autocommit = True
+        cursor.execute("ANALYZE")
+    finally:
+        raw.close()
+    return counts
+
+@contextlib.asynccontextmanager
+async def open_app(base):
+    """產生 client 的函式；未指定 base 時直接呼叫 ASGI app(含 startup 的排程與背景工作)"""
+    if base:
+        yield lambda: httpx.AsyncClient(base_url=base, timeout=TIMEOUT)
+        return
+    from main import app
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        yield lambda: httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=TIMEOUT)
+
+async def login(context, recorder, role, index):
+    scale = context["scale"]
+    if role == "client":
+        index %= scale["clients"]
+        username, user_id = f"{datagen.CLIENT_PREFIX}{index}", datagen.client_id(scale, index)
+    else:
+        index %= scale["contractors"]
+        username, user_id = f"{datagen.CONTRACTOR_PREFIX}{index}", datagen.contractor_id(scale, index)
+    session = Session(context["new_client"](), recorder, username, user_id)
+    response = await session.call("POST /auth/login", "POST", "/auth/login",
+                                  data={"username": username, "password": datagen.PASSWORD}, expect=(200, 302))
+    if response.status_code != 302:
+        raise JourneyFailed(f"{username} 登入失敗")
+    return session
+
+# --- 使用者行為腳本 ---
+
+async def browse_contractor(context, vu, run_id):
+    contractor = vu.rng.choice(vu.contractors)
+    await contractor.call("GET /projects/available_page", "GET", "/projects/available_page")
+    await contractor.call("GET /projects/available_page?sort=deadline", "GET", "/projects/available_page", params={"sort": "deadline"})
+    await contractor.call("GET /projects/search", "GET", "/projects/search", params={"q": vu.rng.choice(datagen.WORDS)})
+    await contractor.call("GET /projects/my_bids", "GET", "/projects/my_bids")
+    await contractor.call("GET /api/v1/projects", "GET", "/api/v1/projects", params={"scope": "available"})
+
+async def browse_client(context, vu, run_id):
+    await vu.client.call("GET /projects/my_projects", "GET", "/projects/my_projects")
+    page = await vu.client.call("GET /api/v1/projects", "GET", "/api/v1/projects", params={"scope": "mine", "fields": "id"})
+    items = page.json()["items"]
+    if items:
+        project_id = vu.rng.choice(items)["id"]
+        await vu.client.call("GET /projects/manage_client/{id}", "GET", f"/projects/manage_client/{project_id}")
+        await vu.client.call("GET /api/v1/projects/{id}/bids", "GET", f"/api/v1/projects/{project_id}/bids")
+
+async def lifecycle(context, vu, run_id):
+    """建立專案 → 報價 → 指派 → 上傳 → 請求結案 → 退件 → 重新上傳 → 結案 → 委託人下載結案檔案"""
+    title = vu.unique_title(run_id)
+    client = vu.client
+    deadline = (datetime.now() + timedelta(days=7)).strftime("%Y-%m-%dT%H:%M")
+    await client.call("POST /projects/create", "POST", "/projects/create",
+                      data={"title": title, "description": " ".join(vu.rng.sample(datagen.WORDS, 6)), "proposal_deadline": deadline},
+                      expect=(302,))
+    page = await client.call("GET /api/v1/projects", "GET", "/api/v1/projects", params={"scope": "mine", "fields": "id,title"})
+    project_id = next((item["id"] for item in page.json()["items"] if item["title"] == title), None)
+    if project_id is None:
+        raise JourneyFailed(f"找不到剛建立的專案 {title}")
+
+    for contractor in vu.contractors:
+        await contractor.call("POST /projects/bid", "POST", "/projects/bid",
+                              data={"project_id": project_id, "price": vu.rng.randrange(1_000, 100_000, 100)},
+                              files={"file": ("proposal.pdf", datagen.file_content(title + contractor.username), "application/pdf")},
+                              expect=(302,))
+    await client.call("GET /projects/my_projects", "GET", "/projects/my_projects")
+    chosen = vu.rng.choice(vu.contractors)
+    await client.call("POST /projects/assign", "POST", "/projects/assign",
+                      data={"project_id": project_id, "contractor_id": chosen.user_id}, expect=(303,))
+
+    await chosen.call("POST /upload/file", "POST", "/upload/file", data={"project_id": project_id},
+                      files={"file": ("progress.bin", datagen.file_content(title + "progress"))}, expect=(303,))
+    for attempt, decision in enumerate(("reject", "close")):
+        await chosen.call("POST /upload/final", "POST", "/upload/final", data={"project_id": project_id},
+                          files={"file": (f"final-{attempt}.bin", datagen.file_content(f"{title}final{attempt}"))}, expect=(303,))
+        await chosen.call("POST /projects/request_close/{id}", "POST", f"/projects/request_close/{project_id}", expect=(303,))
+        await client.call("GET /projects/manage_client/{id}", "GET", f"/projects/manage_client/{project_id}")
+        await client.call("POST /projects/decision", "POST", "/projects/decision",
+                          data={"project_id": project_id, "decision": decision, "explanation": decision}, expect=(303,))
+
+    files = await client.call("GET /api/v1/projects/{id}/files", "GET", f"/api/v1/projects/{project_id}/files", params={"stage": "final"})
+    items = files.json()["items"]
+    if not items:
+        raise JourneyFailed(f"{title} 沒有結案檔案")
+    await client.call("GET /projects/download_zip", "GET", "/projects/download_zip",
+                      params={"project_title": title, "folder": items[-1]["folder"], "stage": "final"})
+
+# 名稱: (權重, 腳本)
+JOURNEYS = {
+    "browse_contractor": (6, browse_contractor),
+    "browse_client": (3, browse_client),
+    "lifecycle": (1, lifecycle),
+}
@@ -0,0 +1,202 @@
+# 徐(Flask + SQLite): 以 executemany 批次載入合成資料，以及使用者行為腳本
+# SQLite 檔案位於工作目錄的 instance/project_platform.db(app 的設定)，匯入 app 時會建立資料表
+# 徐 沒有退件紀錄資料表(退回結案檔案只改狀態)，產生器的退件紀錄不載入；結案後的互評由這裡產生
+import contextlib
+import os
+import random
+import re
+import sqlite3
+from datetime import datetime, timedelta
+
+import httpx
+
+from loadtest import datagen
+from loadtest.runner import Session, JourneyFailed
+
+APP_DIR = "徐"
+RUNTIME_DIRS = ("instance", "project_deliveries")
+TIMEOUT = 120
+BATCH_SIZE = 10_000
+REVIEW_RATE = 0.7
+
+STATUS = {"open": "open", "expired": "rejected", "in_progress": "pending", "review": "waiting_review", "closed": "closed"}
+
+def environment(database_url):
+    if database_url:
+        raise SystemExit("徐 使用工作目錄內的 SQLite 檔案，不接受 --database-url")
+    return {}
+
+def _time(value):
+    return value.strftime("%Y-%m-%d %H:%M:%S.%f") if value else None
+
+class _Batches:
+    """每個資料表累積 BATCH_SIZE 筆後以 executemany 寫入"""
+    def __init__(self, conn, statements):
+        self.conn = conn
+        self.statements = statements
+        self.rows = {table: [] for table in statements}
+        self.counts = dict.fromkeys(statements, 0)
+
+    def add(self, table, row):
+        self.rows[table].append(row)
+        self.counts[table] += 1
+        if len(self.rows[table]) >= BATCH_SIZE:
+            self.flush(table)
+
+    def flush(self, table=None):
+        for name in [table] if table else self.rows:
+            if self.rows[name]:
+                self.conn.executemany(self.statements[name], self.rows[name])
+                self.rows[name].clear()
+
+def load(scale, seed, disk_projects, reset):
+    """產生資料並批次寫入 SQLite，id <= disk_projects 的專案同時寫出結案檔案；回傳各資料表筆數"""
+    from werkzeug.security import generate_password_hash
+    import app as flask_app
+
+    with flask_app.app.app_context():
+        path = flask_app.db.engine.url.database
+    conn = sqlite3.connect(path)
+    try:
+        if conn.execute("SELECT count(*) FROM user").fetchone()[0]:
+            if not reset:
+                raise SystemExit("資料庫已有資料；請使用新的工作目錄，或加上 --reset 清空")
+            for table in ("review", "proposal", "project", "user"):
+                conn.execute(f"DELETE FROM {table}")
+            conn.commit()
+        conn.execute("PRAGMA synchronous = OFF")
+
+        hashed = generate_password_hash(datagen.PASSWORD)
+        batches = _Batches(conn, {
+            "user": "INSERT INTO user (id, username, role, password_hash) VALUES (?, ?, ?, ?)",
+            "project": "INSERT INTO project (id, title, description, status, created_at, closed_at, delivery_file_path, client_id, contractor_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            "proposal": "INSERT INTO proposal (price, details, status, submitted_at, project_id, contractor_id) VALUES (?, ?, ?, ?, ?, ?)",
+            "review": "INSERT INTO review (project_id, reviewer_id, reviewee_id, reviewee_role, score_1, score_2, score_3, comment, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        })
+        for user_id, username, role in datagen.users(scale):
+            batches.add("user", (user_id, username, role, hashed))
+
+        for project in datagen.projects(scale, seed):
+            delivery = None
+            finals = [f for f in project["files"] if f["stage"] == "final"]
+            if finals:
+                # 與 submit_delivery 相同的命名: {專案 id}_{時間}_{檔名}
+                delivery = f"{project['id']}_{finals[-1]['time']:%Y%m%d%H%M%S}_{finals[-1]['filename']}"
+                if project["id"] <= disk_projects:
+                    os.makedirs(flask_app.UPLOAD_FOLDER, exist_ok=True)
+                    with open(os.path.join(flask_app.UPLOAD_FOLDER, delivery), "wb") as f:
+                        f.write(datagen.file_content(finals[-1]["filename"]))
+            batches.add("project", (
+                project["id"], project["title"], project["description"], STATUS[project["stage"]],
+                _time(project["created"]), _time(project["closed"]), delivery, project["client_id"], project["contractor_id"],
+            ))
+            for bid in project["bids"]:
+                status = "submitted" if bid["accepted"] is None else ("accepted" if bid["accepted"] else "rejected")
+                batches.add("proposal", (bid["price"], "提案內容 " + project["title"], status, _time(bid["time"]), project["id"], bid["contractor_id"]))
+            if project["stage"] == "closed":
+                rng = random.Random(seed * 1_000_033 + project["id"])
+                pairs = ((project["client_id"], project["contractor_id"], "contractor"), (project["contractor_id"], project["client_id"], "client"))
+                for reviewer, reviewee, role in pairs:
+                    if rng.random() < REVIEW_RATE:
+                        batches.add("review", (project["id"], reviewer, reviewee, role, rng.randint(1, 5), rng.randint(1, 5), rng.randint(1, 5),
+                                               " ".join(rng.sample(datagen.WORDS, 3)), _time(project["closed"] + timedelta(days=1))))
+        batches.flush()
+        conn.commit()
+        conn.execute("ANALYZE")
+        return batches.counts
+    finally:
+        conn.close()
+
+@contextlib.asynccontextmanager
+async def open_app(base):
+    """產生 client 的函式；未指定 base 時直接呼叫 WSGI app(每個請求在 thread 中執行)"""
+    if base:
+        yield lambda: httpx.AsyncClient(base_url=base, timeout=TIMEOUT)
+        return
+    import app as flask_app
+    yield lambda: httpx.Client(transport=httpx.WSGITransport(app=flask_app.app), base_url="http://loadtest", timeout=TIMEOUT)
+
+async def login(context, recorder, role, index):
+    scale = context["scale"]
+    if role == "client":
+        index %= scale["clients"]
+        username, user_id = f"{datagen.CLIENT_PREFIX}{index}", datagen.client_id(scale, index)
+    else:
+        index %= scale["contractors"]
+        username, user_id = f"{datagen.CONTRACTOR_PREFIX}{index}", datagen.contractor_id(scale, index)
+    client = context["new_client"]()
+    session = Session(client, recorder, username, user_id, sync=isinstance(client, httpx.Client))
+    # 帳密錯誤時回到登入頁(200)
+    await session.call("POST /login", "POST", "/login", data={"username": username, "password": datagen.PASSWORD}, expect=(302,))
+    return session
+
+def _open_project_id(context, rng):
+    """隨機挑一個產生器建立的 open 專案"""
+    scale, seed, now = context["scale"], context["seed"], datetime.now()
+    for _ in range(20):
+        project_id = rng.randint(1, scale["projects"])
+        if datagen.project(scale, seed, project_id, now)["stage"] == "open":
+            return project_id
+    return project_id
+
+# --- 使用者行為腳本 ---
+
+async def browse_contractor(context, vu, run_id):
+    contractor = vu.rng.choice(vu.contractors)
+    await contractor.call("GET /contractor", "GET", "/contractor")
+    project_id = _open_project_id(context, vu.rng)
+    await contractor.call("GET /project/{id}", "GET", f"/project/{project_id}", expect=(200, 302))
+
+async def browse_client(context, vu, run_id):
+    page = await vu.client.call("GET /client", "GET", "/client")
+    project_ids = re.findall(r'href="/project/(\d+)"', page.text)
+    if project_ids:
+        await vu.client.call("GET /project/{id}", "GET", f"/project/{vu.rng.choice(project_ids)}")
+
+async def lifecycle(context, vu, run_id):
+    """建立專案 → 報價 → 接受報價 → 提交結案檔案(請求結案) → 退回 → 重新提交 → 結案 → 下載 → 互評"""
+    title = vu.unique_title(run_id)
+    client = vu.client
+    await client.call("POST /create_project", "POST", "/create_project",
+                      data={"title": title, "description": " ".join(vu.rng.sample(datagen.WORDS, 6))}, expect=(302,))
+    page = await client.call("GET /client", "GET", "/client")
+    found = re.search(rf'href="/project/(\d+)">{re.escape(title)}<', page.text)
+    if not found:
+        raise JourneyFailed(f"找不到剛建立的專案 {title}")
+    project_id = found.group(1)
+
+    for contractor in vu.contractors:
+        await contractor.call("POST /make_proposal/{id}", "POST", f"/make_proposal/{project_id}",
+                              data={"price": vu.rng.randrange(1_000, 100_000, 100), "details": "提案 " + contractor.username}, expect=(302,))
+    page = await client.call("GET /project/{id}", "GET", f"/project/{project_id}")
+    proposal_ids = re.findall(r'/accept_proposal/(\d+)"', page.text)
+    if len(proposal_ids) != len(vu.contractors):
+        raise JourneyFailed(f"{title} 報價數 {len(proposal_ids)}，應為 {len(vu.contractors)}")
+    # 報價依送出時間新到舊排列，第一筆是最後一個報價的接案人
+    await client.call("POST /accept_proposal/{id}", "POST", f"/accept_proposal/{proposal_ids[0]}", expect=(302,))
+    chosen = vu.contractors[-1]
+
+    for attempt, action in enumerate(("reject", "accept")):
+        await chosen.call("POST /submit_delivery/{id}", "POST", f"/submit_delivery/{project_id}",
+                          files={"file": (f"final-{attempt}.bin", datagen.file_content(f"{title}final{attempt}"))}, expect=(302,))
+        page = await client.call("GET /project/{id}", "GET", f"/project/{project_id}")
+        found = re.search(r'/download_delivery/([^"]+)"', page.text)
+        if not found:
+            raise JourneyFailed(f"{title} 沒有結案檔案")
+        await client.call("GET /download_delivery/{file}", "GET", f"/download_delivery/{found.group(1)}")
+        await client.call("POST /review_delivery/{id}", "POST", f"/review_delivery/{project_id}", data={"action": action}, expect=(302,))
+
+    for reviewer in (client, chosen):
+        scores = {f"score_{n}": vu.rng.randint(1, 5) for n in (1, 2, 3)}
+        await reviewer.call("POST /submit_review/{id}", "POST", f"/submit_review/{project_id}",
+                            data={**scores, "comment": "合作愉快"}, expect=(302,))
+    page = await client.call("GET /project/{id}", "GET", f"/project/{project_id}")
+    if 'class="status-closed"' not in page.text:
+        raise JourneyFailed(f"{title} 沒有結案")
+
+# 名稱: (權重, 腳本)
+JOURNEYS = {
+    "browse_contractor": (6, browse_contractor),
+    "browse_client": (3, browse_client),
+    "lifecycle": (1, lifecycle),
+}
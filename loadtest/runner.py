@@ -0,0 +1,173 @@
+# 負載測試執行: 多個虛擬使用者同時依權重挑選使用者行為腳本(journey)執行，記錄每個路由與每個腳本的延遲
+# 路由以 "方法 路徑樣板" 彙總(例如 POST /projects/bid)，結果輸出 throughput 與 p50/p95/p99
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+# 每個路由保留的錯誤訊息數
+MAX_FAILURES = 20
+
+class JourneyFailed(Exception):
+    pass
+
+class Recorder:
+    def __init__(self):
+        self.routes = defaultdict(list)
+        self.route_errors = defaultdict(int)
+        self.journeys = defaultdict(list)
+        self.journey_errors = defaultdict(int)
+        self.failures = []
+
+    def route(self, label, ms, ok):
+        self.routes[label].append(ms)
+        if not ok:
+            self.route_errors[label] += 1
+
+    def journey(self, name, ms, error=None):
+        self.journeys[name].append(ms)
+        if error is not None:
+            self.journey_errors[name] += 1
+            if len(self.failures) < MAX_FAILURES:
+                self.failures.append(f"{name}: {error}")
+
+class Session:
+    """一個登入中的使用者；sync=True 時 client 是同步的 httpx.Client(WSGI app)，在 thread 中送出"""
+    def __init__(self, client, recorder, username, user_id, sync=False):
+        self.client = client
+        self.recorder = recorder
+        self.username = username
+        self.user_id = user_id
+        self.sync = sync
+
+    async def call(self, label, method, url, expect=(200,), **kwargs):
+        start = time.perf_counter()
+        try:
+            if self.sync:
+                response = await asyncio.to_thread(self.client.request, method, url, **kwargs)
+            else:
+                response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError as exc:
+            self.recorder.route(label, (time.perf_counter() - start) * 1000, False)
+            raise JourneyFailed(f"{label}: {exc!r}")
+        ok = response.status_code in expect
+        self.recorder.route(label, (time.perf_counter() - start) * 1000, ok)
+        if not ok:
+            raise JourneyFailed(f"{label}: HTTP {response.status_code} {response.text[:200]!r}")
+        return response
+
+    async def close(self):
+        if self.sync:
+            await asyncio.to_thread(self.client.close)
+        else:
+            await self.client.aclose()
+
+class VirtualUser:
+    """一個委託人與數個接案人帳號，依序執行 journey"""
+    def __init__(self, index, client, contractors, rng):
+        self.index = index
+        self.client = client
+        self.contractors = contractors
+        self.rng = rng
+        self.counter = 0
+
+    def unique_title(self, run_id):
+        self.counter += 1
+        return f"lt-run-{run_id}-{self.index}-{self.counter}"
+
+def percentile(samples, p):
+    if not samples:
+        return 0.0
+    k = min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))
+    return samples[k]
+
+def summarize(samples, errors, elapsed):
+    samples = sorted(samples)
+    return {
+        "count": len(samples),
+        "errors": errors,
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(samples) / len(samples), 2) if samples else 0.0,
+        "p50_ms": round(percentile(samples, 50), 2),
+        "p95_ms": round(percentile(samples, 95), 2),
+        "p99_ms": round(percentile(samples, 99), 2),
+        "max_ms": round(samples[-1], 2) if samples else 0.0,
+    }
+
+async def run(target, context, concurrency, duration, max_journeys, seed, bidders):
+    """target: fastapi_pg 或 flask_sqlite 模組；回傳 (Recorder, 實際執行秒數)"""
+    recorder = Recorder()
+    run_id = time.strftime("%Y%m%d%H%M%S")
+    loop = asyncio.get_running_loop()
+    # 同步 client 的請求在 thread 中送出，thread 數需足夠讓所有虛擬使用者同時送出請求
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=concurrency * (bidders + 1) + 4))
+    names = list(target.JOURNEYS)
+    weights = [target.JOURNEYS[name][0] for name in names]
+    started = [0]
+
+    async def login_all(index):
+        rng = random.Random(seed * 7919 + index)
+        client = await target.login(context, recorder, "client", index)
+        contractors = [await target.login(context, recorder, "contractor", index * bidders + j) for j in range(bidders)]
+        return VirtualUser(index, client, contractors, rng)
+
+    users = await asyncio.gather(*(login_all(i) for i in range(concurrency)))
+    start = time.perf_counter()
+    deadline = start + duration
+
+    async def worker(vu):
+        while time.perf_counter() < deadline and (max_journeys is None or started[0] < max_journeys):
+            started[0] += 1
+            name = vu.rng.choices(names, weights)[0]
+            journey_start = time.perf_counter()
+            try:
+                await target.JOURNEYS[name][1](context, vu, run_id)
+                error = None
+            except JourneyFailed as exc:
+                error = str(exc)
+            recorder.journey(name, (time.perf_counter() - journey_start) * 1000, error)
+
+    try:
+        await asyncio.gather(*(worker(vu) for vu in users))
+    finally:
+        elapsed = time.perf_counter() - start
+        for vu in users:
+            for session in [vu.client] + vu.contractors:
+                await session.close()
+    return recorder, elapsed
+
+def report(recorder, elapsed, meta):
+    total = sum(len(samples) for samples in recorder.routes.values())
+    errors = sum(recorder.route_errors.values())
+    return {
+        **meta,
+        "duration_seconds": round(elapsed, 3),
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "routes": {label: summarize(samples, recorder.route_errors[label], elapsed)
+                   for label, samples in sorted(recorder.routes.items())},
+        "journeys": {name: summarize(samples, recorder.journey_errors[name], elapsed)
+                     for name, samples in sorted(recorder.journeys.items())},
+        "failures": recorder.failures,
+    }
+
+def print_report(result):
+    print(f"{result['app']} ({result['transport']}): {result['requests']} 個請求 {result['duration_seconds']:.1f}s "
+          f"{result['throughput_rps']:.1f} req/s  錯誤 {result['errors']}")
+    print(f"{'route':48s} {'count':>7s} {'err':>5s} {'rps':>8s} {'p50':>9s} {'p95':>9s} {'p99':>9s}")
+    for section in ("routes", "journeys"):
+        for label, stats in result[section].items():
+            print(f"{label:48s} {stats['count']:7d} {stats['errors']:5d} {stats['throughput_rps']:8.1f} "
+                  f"{stats['p50_ms']:8.1f}ms {stats['p95_ms']:8.1f}ms {stats['p99_ms']:8.1f}ms")
+        print()
+    for failure in result["failures"]:
+        print("FAIL", failure)
+
+def write_report(result, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
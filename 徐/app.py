@@ -1,8 +1,12 @@
-from flask import Flask, render_template, redirect, url_for, flash, request, abort, send_from_directory
+from flask import Flask, render_template, redirect, url_for, flash, request, abort, send_from_directory, make_response
 from flask_login import LoginManager, login_user, logout_user, current_user, login_required
 from models import db, User, ROLE_CLIENT, ROLE_CONTRACTOR, Project, Proposal, Review
 import os
+import hashlib
+from functools import lru_cache
 from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
+from urllib.parse import quote
 from datetime import datetime, timedelta
 from sqlalchemy import func
 
@@ -16,6 +20,9 @@ app.config['SECRET_KEY'] = 'your_super_secret_key_FINAL_VERSION_2025'
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///project_platform.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# ✅ 設定後由 nginx 送出結案檔案（例如 /protected/deliveries/），Flask 只做登入檢查
+#    nginx: location /protected/deliveries/ { internal; alias /path/to/徐/project_deliveries/; }
+app.config['ACCEL_REDIRECT_PREFIX'] = os.environ.get('ACCEL_REDIRECT_PREFIX', '')
 
 # ✅ 評價期限（結案後幾天內可互評）
 REVIEW_DEADLINE_DAYS = 7
@@ -445,10 +452,35 @@ def submit_delivery(project_id):
 @app.route('/download_delivery/<path:filename>')
 @login_required
 def download_delivery(filename):
-    try:
-        return send_from_directory(app.config['UPLOAD_FOLDER'], filename, as_attachment=True)
-    except FileNotFoundError:
+    file_path = safe_join(app.config['UPLOAD_FOLDER'], filename)
+    if file_path is None or not os.path.isfile(file_path):
         abort(404)
+    etag = delivery_etag(file_path)
+    accel_prefix = app.config['ACCEL_REDIRECT_PREFIX']
+    if accel_prefix:
+        response = make_response('')
+        response.headers['X-Accel-Redirect'] = accel_prefix + quote(filename)
+        response.headers['Content-Type'] = 'application/octet-stream'
+        response.headers['Content-Disposition'] = f"attachment; filename*=UTF-8''{quote(os.path.basename(filename))}"
+        response.set_etag(etag)
+        return response
+    # conditional=True(預設)：處理 If-None-Match / If-Modified-Since(304) 與 Range(206)
+    return send_from_directory(app.config['UPLOAD_FOLDER'], filename, as_attachment=True, etag=etag)
+
+
+@lru_cache(maxsize=1024)
+def _file_sha256(path, size, mtime_ns):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def delivery_etag(path):
+    """以內容雜湊作為 ETag，檔案大小或修改時間改變時才重算"""
+    st = os.stat(path)
+    return _file_sha256(path, st.st_size, st.st_mtime_ns)
 
 
 # =========================
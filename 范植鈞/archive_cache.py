@@ -0,0 +1,117 @@
+# archive_cache.py
+# 階段資料夾的 zip 快取: 以資料夾內容清單(檔名、大小、修改時間)的雜湊當作 key 存在磁碟，依總大小做 LRU 淘汰
+import hashlib
+import os
+import threading
+import time
+import uuid
+from zipstream import iter_folder_zip
+import storage
+
+# 快取資料夾與總大小上限(bytes)
+ARCHIVE_CACHE_DIR = os.getenv("ARCHIVE_CACHE_DIR", "archive_cache")
+ARCHIVE_CACHE_MAX_BYTES = int(os.getenv("ARCHIVE_CACHE_MAX_BYTES", str(5 * 1024 * 1024 * 1024)))
+
+_lock = threading.Lock()
+stats = {"hits": 0, "misses": 0, "builds": 0, "evictions": 0}
+
+def _count(name):
+    with _lock:
+        stats[name] += 1
+
+def _archive_path(key):
+    return os.path.join(ARCHIVE_CACHE_DIR, f"{key}.zip")
+
+def manifest_key(base_path):
+    """資料夾內容清單的 sha256；任何檔案新增、刪除或修改都會得到不同的 key"""
+    entries = []
+    for root, dirs, files in os.walk(base_path):
+        for file in files:
+            file_path = os.path.join(root, file)
+            try:
+                st = os.stat(file_path)
+            except FileNotFoundError:
+                continue
+            entries.append(f"{os.path.relpath(file_path, base_path)}\0{st.st_size}\0{st.st_mtime_ns}")
+    return hashlib.sha256("\n".join(sorted(entries)).encode()).hexdigest()
+
+def lookup(key):
+    """命中時回傳快取檔路徑並更新其使用時間，否則回傳 None"""
+    path = _archive_path(key)
+    try:
+        # 使用時間記在 atime(LRU 依此淘汰)；mtime 是下載的 Last-Modified 與 ETag 的依據，不能變動
+        st = os.stat(path)
+        os.utime(path, ns=(time.time_ns(), st.st_mtime_ns))
+    except FileNotFoundError:
+        _count("misses")
+        return None
+    _count("hits")
+    return path
+
+def iter_and_store(base_path, key):
+    """串流產生 zip，同時寫入快取；完整送出後才放進快取，中斷時捨棄"""
+    os.makedirs(ARCHIVE_CACHE_DIR, exist_ok=True)
+    tmp_path = os.path.join(ARCHIVE_CACHE_DIR, f".{uuid.uuid4().hex}.part")
+    try:
+        with open(tmp_path, "wb") as out:
+            for chunk in iter_folder_zip(base_path):
+                out.write(chunk)
+                yield chunk
+        os.replace(tmp_path, _archive_path(key))
+        _count("builds")
+        storage.publish(_archive_path(key))
+        evict()
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def build(base_path):
+    """預先建立資料夾的 zip 快取(背景工作使用)，回傳快取檔路徑"""
+    if not os.path.isdir(base_path):
+        return None
+    key = manifest_key(base_path)
+    path = _archive_path(key)
+    if not os.path.exists(path):
+        for _ in iter_and_store(base_path, key):
+            pass
+    return path
+
+def _entries():
+    if not os.path.isdir(ARCHIVE_CACHE_DIR):
+        return []
+    entries = []
+    for name in os.listdir(ARCHIVE_CACHE_DIR):
+        if name.endswith(".zip"):
+            try:
+                st = os.stat(os.path.join(ARCHIVE_CACHE_DIR, name))
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_atime, st.st_size, name))
+    return entries
+
+def evict():
+    """總大小超過上限時，從最久未使用的快取開始刪除(連同儲存後端上的物件)"""
+    entries = sorted(_entries())
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in entries:
+        if total <= ARCHIVE_CACHE_MAX_BYTES:
+            break
+        path = os.path.join(ARCHIVE_CACHE_DIR, name)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        storage.unpublish(path)
+        total -= size
+        _count("evictions")
+
+def cache_status():
+    entries = _entries()
+    with _lock:
+        counters = dict(stats)
+    lookups = counters["hits"] + counters["misses"]
+    counters["hit_ratio"] = round(counters["hits"] / lookups, 4) if lookups else 0.0
+    counters["entries"] = len(entries)
+    counters["bytes"] = sum(size for _, size, _ in entries)
+    counters["max_bytes"] = ARCHIVE_CACHE_MAX_BYTES
+    return counters
@@ -1,18 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, Request, Form
 from fastapi.responses import Response, RedirectResponse
-from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
-from database import get_db
+from sqlalchemy import select, update, delete, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db, AsyncSessionLocal
+from passwords import pwd_context, hash_password, verify_password, hash_password_async, verify_and_update_async
 import models
 from models import User
 import schemas
+import page_cache
+from templating import templates
+import os
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
-templates = Jinja2Templates(directory="templates")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# 可存取 /internal 管理端點的帳號(逗號分隔的使用者名稱)
+ADMIN_USERS = {name.strip() for name in os.getenv("ADMIN_USERS", "").split(",") if name.strip()}
 
 async def get_current_user(request: Request):
     user = request.session.get("user")
@@ -20,11 +23,28 @@ async def get_current_user(request: Request):
         return None
     return user
 
+async def get_admin_user(request: Request):
+    user = request.session.get("user")
+    if not user:
+        raise HTTPException(status_code=401, detail="未登入")
+    if user["username"] not in ADMIN_USERS:
+        raise HTTPException(status_code=403, detail="無權限")
+    return user
+
 async def login_user(request: Request, username: str, password: str, response: Response):
-    db: Session = next(get_db())
-    user_obj = db.query(User).filter(User.username == username).first()
-    if not user_obj or not pwd_context.verify(password, user_obj.hashed_password):
+    # 查完使用者就歸還連線，bcrypt 排隊與計算時不佔用連線池
+    async with AsyncSessionLocal() as db:
+        user_obj = (await db.execute(select(User.id, User.username, User.role, User.hashed_password).filter(User.username == username))).first()
+    if not user_obj:
+        return False
+    verified, new_hash = await verify_and_update_async(password, user_obj.hashed_password)
+    if not verified:
         return False
+    # bcrypt cost 設定改變時，登入成功順便更新雜湊(另開一個短的 session)
+    if new_hash:
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(User).where(User.id == user_obj.id).values(hashed_password=new_hash))
+            await db.commit()
     # 將使用者資訊存進 session
     request.session["user"] = {
         "id": user_obj.id,
@@ -33,24 +53,19 @@ async def login_user(request: Request, username: str, password: str, response: R
     }
     return True
 
-def hash_password(password):
-    return pwd_context.hash(password)
-
-def verify_password(plain, hashed):
-    return pwd_context.verify(plain, hashed)
-
 @router.post("/register")
-async def register_user(request: Request, username: str = Form(...), email: str = Form(...), password: str = Form(...), role: str = Form(...), db: Session = Depends(get_db)):
-    # 檢查 email 是否已註冊
-    existing_user = db.query(models.User).filter(models.User.email == email).first()
-    if existing_user:
-        return templates.TemplateResponse("register.html", {"request": request, "error": "Email 已被註冊"})
-    
-    hashed = hash_password(password)
-    new_user = models.User(username=username, email=email, hashed_password=hashed, role=role)
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+async def register_user(request: Request, username: str = Form(...), email: str = Form(...), password: str = Form(...), role: str = Form(...)):
+    # 先雜湊再開 session，bcrypt 計算時不佔用連線池
+    hashed = await hash_password_async(password)
+    async with AsyncSessionLocal() as db:
+        # 檢查 email 是否已註冊
+        existing_user = await db.scalar(select(models.User.id).filter(models.User.email == email))
+        if existing_user:
+            return templates.TemplateResponse("register.html", {"request": request, "error": "Email 已被註冊"})
+
+        new_user = models.User(username=username, email=email, hashed_password=hashed, role=role)
+        db.add(new_user)
+        await db.commit()
 
     # 註冊完成後直接登入
     request.session["user"] = {"id": new_user.id, "username": new_user.username, "role": new_user.role}
@@ -66,17 +81,27 @@ async def login(request: Request, username: str = Form(...), password: str = For
     return RedirectResponse("/", status_code=302)
 
 @router.post("/delete_account")
-async def delete_account(request: Request, db: Session = Depends(get_db)):
+async def delete_account(request: Request, db: AsyncSession = Depends(get_async_db)):
     user = await get_current_user(request)
     if not user:
         raise HTTPException(status_code=401, detail="未登入")
     
-    db_user = db.query(models.User).filter(models.User.id == user["id"]).first()
-    if not db_user:
+    # 專案、報價等關聯資料由資料庫的 ON DELETE CASCADE / SET NULL 處理，只需一條 DELETE
+    # 資料庫刪除報價或清空 assigned_contractor_id 時不會遞增 version，先遞增曾報價或被指派的專案，讓列表卡片快取失效
+    await db.execute(
+        update(models.Project)
+        .where(or_(
+            models.Project.id.in_(select(models.Bid.project_id).filter(models.Bid.contractor_id == user["id"])),
+            models.Project.assigned_contractor_id == user["id"],
+        ))
+        .values(version=models.Project.version + 1)
+    )
+    deleted = await db.execute(delete(models.User).where(models.User.id == user["id"]))
+    if not deleted.rowcount:
         raise HTTPException(status_code=404, detail="使用者不存在")
-    
-    db.delete(db_user)
-    db.commit()
+    await db.commit()
+    # 委託人的開放專案與接案人的報價可能出現在快取的可承接列表
+    await page_cache.ainvalidate(page_cache.AVAILABLE_PROJECTS)
     
     request.session.clear()
     
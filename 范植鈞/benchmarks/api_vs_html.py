@@ -0,0 +1,57 @@
+# 同一份資料的 HTML 頁面與 /api/v1 JSON 的每秒請求數與回應大小
+# 用法: 先啟動 uvicorn main:app，再執行
+#   python benchmarks/api_vs_html.py --base http://127.0.0.1:8000 --username c1 --password pw --concurrency 20 --requests 1000
+import argparse
+import asyncio
+import time
+
+import httpx
+
+# (名稱, HTML 頁面, 對應的 API)
+PAIRS = {
+    "client": [
+        ("我的專案", "/projects/my_projects", "/api/v1/projects?scope=mine"),
+        ("我的專案(部分欄位)", "/projects/my_projects", "/api/v1/projects?scope=mine&fields=id,title,status"),
+    ],
+    "contractor": [
+        ("可承接專案", "/projects/available_page", "/api/v1/projects?scope=available"),
+        ("我的報價", "/projects/my_bids", "/api/v1/projects?scope=mine"),
+    ],
+}
+
+async def measure(client, path, concurrency, total):
+    sizes = []
+    remaining = total
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            response = await client.get(path)
+            response.raise_for_status()
+            sizes.append(len(response.content))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return total / elapsed, sum(sizes) / len(sizes)
+
+async def run(base, username, password, concurrency, total):
+    async with httpx.AsyncClient(base_url=base, follow_redirects=False, timeout=60) as client:
+        await client.post("/auth/login", data={"username": username, "password": password})
+        role = (await client.get("/api/v1/me")).json()["role"]
+        for name, html_path, api_path in PAIRS[role]:
+            html_rps, html_bytes = await measure(client, html_path, concurrency, total)
+            api_rps, api_bytes = await measure(client, api_path, concurrency, total)
+            print(f"{name}: HTML {html_rps:.1f} req/s {html_bytes:.0f} bytes | "
+                  f"API {api_rps:.1f} req/s {api_bytes:.0f} bytes ({api_bytes / html_bytes:.0%})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base", default="http://127.0.0.1:8000")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(run(args.base, args.username, args.password, args.concurrency, args.requests))
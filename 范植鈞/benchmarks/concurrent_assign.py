@@ -0,0 +1,101 @@
+# 指派接案人: 報價數不同時的耗時，以及同一專案同時送出多個指派時只能有一個成功
+# 直接呼叫 ASGI app(不經過網路)；指向一個測試用的 Postgres 資料庫後執行，結果不符時以非 0 結束
+#   DATABASE_URL=... ASYNC_DATABASE_URL=... python benchmarks/concurrent_assign.py --bids 10,100,1000,5000 --racers 50
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+from sqlalchemy import select, func, text
+
+import database
+import models
+from main import app
+from passwords import hash_password
+
+PREFIX = "assign-bench"
+PASSWORD = "pw"
+
+def setup_users(contractors):
+    """建立(或沿用)委託人與 contractors 個接案人，回傳接案人 id"""
+    with database.SessionLocal() as db:
+        if db.scalar(select(models.User).filter(models.User.username == f"{PREFIX}-client")) is None:
+            db.add(models.User(username=f"{PREFIX}-client", email=f"{PREFIX}-client@example.com", hashed_password=hash_password(PASSWORD), role="client"))
+        db.execute(text("""
+            INSERT INTO users (username, email, hashed_password, role)
+            SELECT :prefix || '-contractor-' || n, :prefix || '-contractor-' || n || '@example.com', '-', 'contractor'
+            FROM generate_series(1, :count) AS n
+            ON CONFLICT DO NOTHING
+        """), {"prefix": PREFIX, "count": contractors})
+        db.commit()
+        return list(db.scalars(select(models.User.id).filter(models.User.username.like(f"{PREFIX}-contractor-%")).order_by(models.User.id).limit(contractors)))
+
+def create_project(contractor_ids):
+    """建立一個開放專案，每個接案人各報價一次，回傳專案 id"""
+    with database.SessionLocal() as db:
+        client_id = db.scalar(select(models.User.id).filter(models.User.username == f"{PREFIX}-client"))
+        project = models.Project(title=f"{PREFIX} {time.time_ns()}", description="指派測試", client_id=client_id,
+                                 proposal_deadline=datetime.now() + timedelta(days=7))
+        db.add(project)
+        db.flush()
+        db.execute(text("""
+            INSERT INTO bids (project_id, contractor_id, price, status)
+            SELECT :project_id, contractor_id, 1000, 'pending' FROM unnest(CAST(:ids AS integer[])) AS contractor_id
+        """), {"project_id": project.id, "ids": contractor_ids})
+        db.commit()
+        return project.id
+
+def bid_statuses(project_id):
+    with database.SessionLocal() as db:
+        rows = db.execute(select(models.Bid.status, func.count()).filter(models.Bid.project_id == project_id).group_by(models.Bid.status))
+        assigned = db.scalar(select(models.Project.assigned_contractor_id).filter(models.Project.id == project_id))
+        return dict(rows.all()), assigned
+
+async def assign(client, project_id, contractor_id):
+    start = time.perf_counter()
+    response = await client.post("/projects/assign", data={"project_id": project_id, "contractor_id": contractor_id})
+    return response.status_code, time.perf_counter() - start
+
+async def run(bid_counts, racers, repeat):
+    contractor_ids = await asyncio.to_thread(setup_users, max(bid_counts + [racers]))
+    ok = True
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120) as client:
+        await client.post("/auth/login", data={"username": f"{PREFIX}-client", "password": PASSWORD})
+
+        for count in bid_counts:
+            timings = []
+            for _ in range(repeat):
+                project_id = await asyncio.to_thread(create_project, contractor_ids[:count])
+                status, seconds = await assign(client, project_id, contractor_ids[count // 2])
+                ok &= status == 303
+                timings.append(seconds * 1000)
+            timings.sort()
+            print(f"報價 {count:5d} 筆: 指派 p50={timings[len(timings) // 2]:.1f}ms  max={timings[-1]:.1f}ms")
+
+        project_id = await asyncio.to_thread(create_project, contractor_ids[:racers])
+        results = await asyncio.gather(*(assign(client, project_id, contractor_id) for contractor_id in contractor_ids[:racers]))
+        statuses = Counter(status for status, _ in results)
+        bids, assigned = await asyncio.to_thread(bid_statuses, project_id)
+        print(f"{racers} 個同時指派: 回應 {dict(statuses)}  報價狀態 {bids}  指派給 {assigned}")
+        ok &= statuses.get(303) == 1 and bids.get("accepted") == 1 and bids.get("rejected") == racers - 1
+        # 只有報價過的接案人能被指派
+        project_id = await asyncio.to_thread(create_project, contractor_ids[:1])
+        status, _ = await assign(client, project_id, contractor_ids[-1])
+        print(f"指派沒有報價的接案人: {status}")
+        ok &= status == 400
+    if not ok:
+        sys.exit("結果不符")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bids", default="10,100,1000,5000")
+    parser.add_argument("--racers", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run([int(n) for n in args.bids.split(",")], args.racers, args.repeat))
@@ -0,0 +1,75 @@
+# 同一接案人對同一專案同時送出多次報價(例如連點)，檢查只會留下一筆報價與一份計劃書，並量測報價請求的耗時
+# 直接呼叫 ASGI app(不經過網路)；指向一個測試用的 Postgres 資料庫後執行，結果不符時以非 0 結束
+#   DATABASE_URL=... ASYNC_DATABASE_URL=... python benchmarks/concurrent_bids.py --submissions 100
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+from sqlalchemy import select, func
+
+import database
+import models
+from main import app
+from passwords import hash_password
+
+PREFIX = "bid-race"
+PASSWORD = "pw"
+
+def setup():
+    """建立(或沿用)委託人與接案人，每次執行都建立一個新的開放專案，回傳專案 id"""
+    with database.SessionLocal() as db:
+        users = {}
+        for role in ("client", "contractor"):
+            username = f"{PREFIX}-{role}"
+            user = db.scalar(select(models.User).filter(models.User.username == username))
+            if user is None:
+                user = models.User(username=username, email=f"{username}@example.com", hashed_password=hash_password(PASSWORD), role=role)
+                db.add(user)
+                db.commit()
+            users[role] = user
+        project = models.Project(title=f"{PREFIX} {time.time_ns()}", description="同時報價測試", client_id=users["client"].id,
+                                 proposal_deadline=datetime.now() + timedelta(days=7))
+        db.add(project)
+        db.commit()
+        return project.id
+
+async def run(submissions):
+    project_id = await asyncio.to_thread(setup)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120) as client:
+        await client.post("/auth/login", data={"username": f"{PREFIX}-contractor", "password": PASSWORD})
+
+        async def submit(i):
+            start = time.perf_counter()
+            response = await client.post("/projects/bid", data={"project_id": project_id, "price": 1000 + i},
+                                         files={"file": ("proposal.pdf", f"%PDF proposal {i}".encode(), "application/pdf")})
+            return response.status_code, time.perf_counter() - start
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(submit(i) for i in range(submissions)))
+        elapsed = time.perf_counter() - started
+
+    with database.SessionLocal() as db:
+        bids = db.scalars(select(models.Bid).filter(models.Bid.project_id == project_id)).all()
+        version = db.scalar(select(models.Project.version).filter(models.Project.id == project_id))
+    statuses = Counter(status for status, _ in results)
+    latencies = sorted(seconds * 1000 for _, seconds in results)
+    proposal_dir = bids[0].proposal_file if bids else None
+    files = os.listdir(proposal_dir) if proposal_dir and os.path.isdir(proposal_dir) else []
+    print(f"{submissions} 個同時報價: 回應 {dict(statuses)}  耗時 {elapsed:.2f}s  "
+          f"p50={latencies[len(latencies) // 2]:.1f}ms  max={latencies[-1]:.1f}ms")
+    print(f"資料庫報價 {len(bids)} 筆  專案 version={version}  計劃書 {files}")
+    if len(bids) != 1 or statuses.get(302) != 1 or version != 1 or len(files) != 1:
+        sys.exit("結果不符: 應該只有一筆報價成功")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--submissions", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(run(args.submissions))
@@ -0,0 +1,125 @@
+# 刪除帳號與專案的耗時，以及刪除後是否留下孤兒資料
+# 接案人: 對 --bids 個專案各報價一次；委託人: --projects 個專案，每個專案有數筆報價、退件紀錄與檔案清單
+# 直接呼叫 ASGI app(不經過網路)；指向一個測試用的 Postgres 資料庫後執行，留下孤兒資料時以非 0 結束
+#   DATABASE_URL=... ASYNC_DATABASE_URL=... python benchmarks/delete_cascade.py --bids 10000 --projects 2000
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+from sqlalchemy import select, func, text
+
+import database
+import models
+from main import app
+from passwords import hash_password
+
+PREFIX = "delete-bench"
+PASSWORD = "pw"
+
+def setup(bids, projects, bids_per_project):
+    """建立一個有 bids 筆報價的接案人與一個有 projects 個專案的委託人，回傳兩人的 username"""
+    run_id = time.time_ns()
+    contractor_name, client_name = f"{PREFIX}-contractor-{run_id}", f"{PREFIX}-client-{run_id}"
+    with database.SessionLocal() as db:
+        for username, role in ((contractor_name, "contractor"), (client_name, "client")):
+            db.add(models.User(username=username, email=f"{username}@example.com", hashed_password=hash_password(PASSWORD), role=role))
+        db.flush()
+        params = {"prefix": PREFIX, "run": run_id, "contractor": contractor_name, "client": client_name,
+                  "bids": bids, "projects": projects, "per_project": bids_per_project}
+        # 其他接案人(對委託人的專案報價)
+        db.execute(text("""
+            INSERT INTO users (username, email, hashed_password, role)
+            SELECT :prefix || '-other-' || :run || '-' || n, :prefix || '-other-' || :run || '-' || n || '@example.com', '-', 'contractor'
+            FROM generate_series(1, :per_project) AS n
+        """), params)
+        # 接案人報價的專案屬於另一個委託人
+        db.execute(text("""
+            INSERT INTO projects (title, description, client_id, status, close_requested, version, create_time, proposal_deadline)
+            SELECT 'delete ' || n, 'delete bench', (SELECT id FROM users WHERE username = :client), 'open', false, 0, now(), now() + interval '7 days'
+            FROM generate_series(1, :bids + :projects) AS n
+        """), params)
+        db.execute(text("""
+            WITH client_projects AS (
+                SELECT id, row_number() OVER (ORDER BY id) AS n FROM projects WHERE client_id = (SELECT id FROM users WHERE username = :client)
+            ), contractor_projects AS (
+                -- 前 bids 個專案留給接案人報價後轉給另一個委託人，之後的 projects 個留在委託人名下
+                UPDATE projects SET client_id = (SELECT id FROM users WHERE username = :prefix || '-other-' || :run || '-1')
+                WHERE id IN (SELECT id FROM client_projects WHERE n <= :bids)
+                RETURNING id
+            )
+            INSERT INTO bids (project_id, contractor_id, price, status)
+            SELECT id, (SELECT id FROM users WHERE username = :contractor), 1000, 'pending' FROM contractor_projects
+        """), params)
+        db.execute(text("""
+            INSERT INTO bids (project_id, contractor_id, price, status)
+            SELECT p.id, u.id, 1000, 'pending'
+            FROM projects p CROSS JOIN users u
+            WHERE p.client_id = (SELECT id FROM users WHERE username = :client)
+              AND u.username LIKE :prefix || '-other-' || :run || '-%'
+        """), params)
+        db.execute(text("""
+            INSERT INTO project_rejections (project_id, rejection_date, explanation)
+            SELECT id, now(), 'delete bench' FROM projects WHERE client_id = (SELECT id FROM users WHERE username = :client)
+        """), params)
+        db.execute(text("""
+            INSERT INTO project_files (project_id, stage, folder, filename, size, sha256, uploader_id, upload_time)
+            SELECT id, 'in_process', '2025-01-01', 'file.bin', 1, repeat('0', 64), (SELECT id FROM users WHERE username = :contractor), now()
+            FROM projects WHERE client_id = (SELECT id FROM users WHERE username = :client)
+        """), params)
+        db.commit()
+        db.execute(text("ANALYZE"))
+        db.commit()
+    return contractor_name, client_name
+
+def orphans():
+    """沒有對應使用者或專案的資料筆數"""
+    with database.SessionLocal() as db:
+        return db.execute(text("""
+            SELECT
+                (SELECT count(*) FROM projects p WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.id = p.client_id)),
+                (SELECT count(*) FROM bids b WHERE NOT EXISTS (SELECT 1 FROM projects p WHERE p.id = b.project_id)
+                                                OR NOT EXISTS (SELECT 1 FROM users u WHERE u.id = b.contractor_id)),
+                (SELECT count(*) FROM project_rejections r WHERE NOT EXISTS (SELECT 1 FROM projects p WHERE p.id = r.project_id)),
+                (SELECT count(*) FROM project_files f WHERE NOT EXISTS (SELECT 1 FROM projects p WHERE p.id = f.project_id))
+        """)).one()
+
+def counts(username):
+    with database.SessionLocal() as db:
+        user_id = db.scalar(select(models.User.id).filter(models.User.username == username))
+        return (
+            db.scalar(select(func.count()).select_from(models.Project).filter(models.Project.client_id == user_id)),
+            db.scalar(select(func.count()).select_from(models.Bid).filter(models.Bid.contractor_id == user_id)),
+        )
+
+async def delete_account(username):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=600) as client:
+        await client.post("/auth/login", data={"username": username, "password": PASSWORD})
+        start = time.perf_counter()
+        response = await client.post("/auth/delete_account")
+        return response.status_code, time.perf_counter() - start
+
+async def run(bids, projects, bids_per_project):
+    contractor, client = await asyncio.to_thread(setup, bids, projects, bids_per_project)
+    ok = True
+    for label, username in (("接案人", contractor), ("委託人", client)):
+        owned_projects, owned_bids = await asyncio.to_thread(counts, username)
+        status, seconds = await delete_account(username)
+        print(f"刪除{label}帳號(專案 {owned_projects} 個、報價 {owned_bids} 筆): {status}  {seconds * 1000:.1f}ms")
+        ok &= status == 302
+    remaining = await asyncio.to_thread(orphans)
+    print(f"孤兒資料(專案, 報價, 退件紀錄, 檔案清單): {tuple(remaining)}")
+    if not ok or any(remaining):
+        sys.exit("刪除失敗或留下孤兒資料")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bids", type=int, default=10_000)
+    parser.add_argument("--projects", type=int, default=2_000)
+    parser.add_argument("--bids-per-project", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.bids, args.projects, args.bids_per_project))
@@ -0,0 +1,149 @@
+# 熱門查詢的執行計畫檢查: 產生大量資料後對每個列表/外鍵查詢執行 EXPLAIN，任一查詢對大資料表使用 Seq Scan 時以非 0 結束
+# 用法: 指向一個測試用的 Postgres 資料庫後執行，第一次會產生資料(可重複執行，已足量時不再新增)
+#   DATABASE_URL=postgresql://user:pw@localhost/bench python benchmarks/explain_plans.py --projects 200000
+#   python benchmarks/explain_plans.py --cleanup   # 刪除產生的資料
+# tests/test_query_plans.py 以較小的資料量在測試資料庫上執行同樣的檢查
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import select, update, func, and_, text
+from sqlalchemy.orm import aliased
+
+from database import SessionLocal, engine
+import migrate
+import models
+from pagination import paginate
+
+PREFIX = "plan-bench"
+CHECKED_TABLES = {"projects", "bids", "project_rejections", "project_files"}
+
+def generate(db, projects, clients, contractors):
+    existing = db.scalar(select(func.count()).select_from(models.User).filter(models.User.username.like(f"{PREFIX}-%")))
+    if existing:
+        return
+    print(f"產生 {projects} 筆專案與對應的報價、退件紀錄、檔案...")
+    db.execute(text("""
+        INSERT INTO users (username, email, hashed_password, role)
+        SELECT :prefix || '-' || role || '-' || n, :prefix || '-' || role || '-' || n || '@example.com', '-', role
+        FROM (SELECT 'client' AS role, generate_series(1, :clients) AS n
+              UNION ALL SELECT 'contractor', generate_series(1, :contractors)) AS u
+    """), {"prefix": PREFIX, "clients": clients, "contractors": contractors})
+    db.execute(text("CREATE TEMP TABLE plan_users ON COMMIT DROP AS SELECT id, role, row_number() OVER (PARTITION BY role ORDER BY id) AS n FROM users WHERE username LIKE :pattern"),
+               {"pattern": f"{PREFIX}-%"})
+    db.execute(text("""
+        INSERT INTO projects (title, description, client_id, assigned_contractor_id, status, close_requested, version, create_time, proposal_deadline)
+        SELECT 'plan ' || g, 'plan project ' || g, client.id,
+               CASE WHEN s.status IN ('in_process', 'closed') THEN contractor.id END,
+               s.status, false, 0,
+               now() - random() * interval '365 days', now() + (random() * 60 - 30) * interval '1 day'
+        FROM generate_series(1, :projects) AS g
+        CROSS JOIN LATERAL (SELECT (ARRAY['open', 'in_process', 'closed', 'closed', 'noBid'])[1 + (g % 5)] AS status) AS s
+        JOIN plan_users AS client ON client.role = 'client' AND client.n = 1 + g % :clients
+        JOIN plan_users AS contractor ON contractor.role = 'contractor' AND contractor.n = 1 + g % :contractors
+    """), {"projects": projects, "clients": clients, "contractors": contractors})
+    db.execute(text("CREATE TEMP TABLE plan_projects ON COMMIT DROP AS SELECT p.id, p.assigned_contractor_id FROM projects p JOIN plan_users u ON u.id = p.client_id"))
+    db.execute(text("""
+        INSERT INTO bids (project_id, contractor_id, price, status)
+        SELECT p.id, contractor.id, 1000 + k * 10, 'pending'
+        FROM plan_projects AS p
+        CROSS JOIN generate_series(1, 3) AS k
+        JOIN plan_users AS contractor ON contractor.role = 'contractor' AND contractor.n = 1 + (p.id * 7 + k) % :contractors
+    """), {"contractors": contractors})
+    db.execute(text("""
+        INSERT INTO project_rejections (project_id, rejection_date, explanation)
+        SELECT id, now() - random() * interval '90 days', 'plan' FROM plan_projects WHERE id % 4 = 0
+    """))
+    db.execute(text("""
+        INSERT INTO project_files (project_id, stage, folder, filename, size, sha256, uploader_id, upload_time)
+        SELECT id, 'in_process', '2025-01-01', 'file.bin', 1, repeat('0', 64), assigned_contractor_id, now()
+        FROM plan_projects WHERE assigned_contractor_id IS NOT NULL
+    """))
+    db.commit()
+    db.execute(text("ANALYZE"))
+    db.commit()
+
+def hot_queries(db):
+    """(名稱, 查詢)；參數取自產生的資料中最典型的使用者與專案"""
+    client_id = db.scalar(select(models.User.id).filter(models.User.username == f"{PREFIX}-client-1"))
+    contractor_id = db.scalar(select(models.User.id).filter(models.User.username == f"{PREFIX}-contractor-1"))
+    project_id = db.scalar(select(models.Project.id).filter(models.Project.client_id == client_id).limit(1))
+    project_ids = list(db.scalars(select(models.Project.id).filter(models.Project.client_id == client_id).limit(20)))
+    now = datetime.now()
+    available = select(models.Project).filter(models.Project.status == "open", models.Project.proposal_deadline >= now)
+    own_bid = aliased(models.Bid)
+    return [
+        ("可承接列表(最新)", paginate(available, "newest")),
+        ("可承接列表(截止日)", paginate(available, "deadline")),
+        ("委託人的專案", paginate(select(models.Project).filter(models.Project.client_id == client_id), "newest")),
+        ("接案人的報價列表", paginate(select(models.Project).join(own_bid, and_(own_bid.project_id == models.Project.id, own_bid.contractor_id == contractor_id)), "newest")),
+        ("列表頁載入報價", select(models.Bid).filter(models.Bid.project_id.in_(project_ids))),
+        ("指派時讀取專案報價", select(models.Bid).filter(models.Bid.project_id == project_id)),
+        ("最近的退件紀錄", select(models.ProjectRejection).filter(models.ProjectRejection.project_id == project_id)
+            .order_by(models.ProjectRejection.rejection_date.desc()).limit(1)),
+        ("專案檔案", select(models.ProjectFile).filter(models.ProjectFile.project_id == project_id)),
+        ("被指派的專案", select(models.Project).filter(models.Project.assigned_contractor_id == contractor_id)),
+        ("上傳者的檔案", select(models.ProjectFile).filter(models.ProjectFile.uploader_id == contractor_id)),
+        ("截止排程", update(models.Project)
+            .where(models.Project.status == "open", models.Project.proposal_deadline < now)
+            .values(status="noBid", version=models.Project.version + 1)),
+    ]
+
+def seq_scans(plan):
+    """回傳計畫中對檢查資料表的 Seq Scan"""
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in CHECKED_TABLES:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found += seq_scans(child)
+    return found
+
+def explain(db, stmt):
+    compiled = stmt.compile(dialect=engine.dialect, compile_kwargs={"render_postcompile": True})
+    raw = db.connection().exec_driver_sql("EXPLAIN (FORMAT JSON) " + compiled.string, compiled.params).scalar()
+    plan = (raw if isinstance(raw, list) else json.loads(raw))[0]["Plan"]
+    return plan
+
+def run(projects, clients, contractors):
+    migrate.upgrade()
+    failed = []
+    with SessionLocal() as db:
+        generate(db, projects, clients, contractors)
+        for name, stmt in hot_queries(db):
+            plan = explain(db, stmt)
+            scans = seq_scans(plan)
+            node = plan["Plans"][0] if plan["Node Type"] in ("Limit", "ModifyTable") and plan.get("Plans") else plan
+            summary = node.get("Index Name") or node["Node Type"]
+            print(f"{'FAIL' if scans else 'ok':4s} {name}: {summary} (cost {plan['Total Cost']:.0f})"
+                  + (f"  Seq Scan on {', '.join(scans)}" if scans else ""))
+            if scans:
+                failed.append(name)
+        db.rollback()
+    if failed:
+        sys.exit(f"{len(failed)} 個查詢退化為 Seq Scan: {', '.join(failed)}")
+
+def cleanup():
+    with SessionLocal() as db:
+        users = select(models.User.id).filter(models.User.username.like(f"{PREFIX}-%"))
+        plan_projects = select(models.Project.id).filter(models.Project.client_id.in_(users))
+        for model in (models.Bid, models.ProjectRejection, models.ProjectFile):
+            db.query(model).filter(model.project_id.in_(plan_projects)).delete(synchronize_session=False)
+        db.query(models.Project).filter(models.Project.client_id.in_(users)).delete(synchronize_session=False)
+        db.query(models.User).filter(models.User.username.like(f"{PREFIX}-%")).delete(synchronize_session=False)
+        db.commit()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--projects", type=int, default=200_000)
+    parser.add_argument("--clients", type=int, default=2_000)
+    parser.add_argument("--contractors", type=int, default=5_000)
+    parser.add_argument("--cleanup", action="store_true")
+    args = parser.parse_args()
+    if args.cleanup:
+        cleanup()
+    else:
+        run(args.projects, args.clients, args.contractors)
@@ -0,0 +1,85 @@
+# 背景工作佇列: 以 thread / process 模式處理 --jobs 筆刪除資料夾的工作，量測吞吐量、等待與執行時間
+# 每筆工作送出兩次(相同 key)，檢查只建立一筆；結果不符時以非 0 結束
+#   DATABASE_URL=... python benchmarks/job_queue.py --jobs 500 --workers 4
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import select, func, delete
+
+import database
+import jobs
+import migrate
+import models
+
+PREFIX = "job-bench"
+
+def enqueue_all(root, count):
+    with database.SessionLocal() as db:
+        for i in range(count):
+            path = os.path.join(root, str(i))
+            os.makedirs(path)
+            open(os.path.join(path, "file.bin"), "wb").close()
+            for _ in range(2):
+                jobs.enqueue(db, "remove_tree", {"path": path}, key=f"{PREFIX}:{root}:{i}")
+        db.commit()
+        return db.scalar(select(func.count()).select_from(models.Job).filter(models.Job.key.like(f"{PREFIX}:{root}:%")))
+
+def pending(root):
+    with database.SessionLocal() as db:
+        return db.scalar(select(func.count()).select_from(models.Job)
+                         .filter(models.Job.key.like(f"{PREFIX}:{root}:%"), models.Job.status != "done"))
+
+def cleanup():
+    with database.SessionLocal() as db:
+        db.execute(delete(models.Job).where(models.Job.key.like(f"{PREFIX}:%")))
+        db.commit()
+
+async def run_mode(mode, count, workers):
+    root = tempfile.mkdtemp(prefix=f"{PREFIX}-")
+    for name in ("succeeded", "failed", "retried", "wait_ms_total", "wait_ms_max", "run_ms_total", "run_ms_max"):
+        jobs.stats[name] = 0
+    created = await asyncio.to_thread(enqueue_all, root, count)
+    start = time.perf_counter()
+    worker = asyncio.create_task(jobs.work_forever(workers, mode))
+    while await asyncio.to_thread(pending, root):
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    worker.cancel()
+    try:
+        await worker
+    except asyncio.CancelledError:
+        pass
+    status = jobs.queue_status()
+    left = os.listdir(root)
+    shutil.rmtree(root, ignore_errors=True)
+    print(f"{mode:7s} workers={workers}: {count} 筆 {elapsed:.2f}s ({count / elapsed:.0f} 筆/s)  "
+          f"等待 avg={status['wait_avg_ms']:.1f}ms max={status['wait_max_ms']:.1f}ms  "
+          f"執行 avg={status['run_avg_ms']:.1f}ms  建立 {created} 筆  剩下資料夾 {len(left)}")
+    return created == count and not left and status["failed"] == 0
+
+async def run(count, workers, modes):
+    migrate.upgrade()
+    jobs.JOB_POLL_INTERVAL = 0.01
+    ok = True
+    try:
+        for mode in modes:
+            ok &= await run_mode(mode, count, workers)
+    finally:
+        await asyncio.to_thread(cleanup)
+    if not ok:
+        sys.exit("結果不符")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--modes", default="thread,process")
+    args = parser.parse_args()
+    asyncio.run(run(args.jobs, args.workers, args.modes.split(",")))
@@ -0,0 +1,64 @@
+# 併發混合流量延遲測試
+# 用法: 先啟動 uvicorn main:app，再執行
+#   python benchmarks/latency.py --base http://127.0.0.1:8000 --username c1 --password pw --concurrency 50 --requests 2000
+# 切換 async / sync 版本各跑一次，比較 p50 / p95 / p99
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+
+# 混合流量: (權重, 路徑)
+MIXED_ROUTES = [
+    (5, "/projects/available_page"),
+    (2, "/projects/my_bids"),
+    (2, "/projects/my_projects"),
+    (1, "/"),
+]
+
+def percentile(samples, p):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    k = min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))
+    return samples[k]
+
+async def run(base, username, password, concurrency, total):
+    latencies = []
+    errors = 0
+    paths = [path for weight, path in MIXED_ROUTES for _ in range(weight)]
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(random.choice(paths))
+
+    async with httpx.AsyncClient(base_url=base, follow_redirects=False, timeout=60) as client:
+        await client.post("/auth/login", data={"username": username, "password": password})
+
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                path = queue.get_nowait()
+                start = time.perf_counter()
+                response = await client.get(path)
+                latencies.append((time.perf_counter() - start) * 1000)
+                if response.status_code >= 400:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    print(f"requests={total} concurrency={concurrency} errors={errors} rps={total / elapsed:.1f}")
+    for p in (50, 95, 99):
+        print(f"p{p}={percentile(latencies, p):.1f}ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base", default="http://127.0.0.1:8000")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(run(args.base, args.username, args.password, args.concurrency, args.requests))
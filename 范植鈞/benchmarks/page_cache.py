@@ -0,0 +1,109 @@
+# 可承接專案列表快取的命中率與資料庫查詢量
+# 直接呼叫 ASGI app(不經過網路)，以多個接案人併發瀏覽列表頁，其中一部分請求是委託人建立專案(會讓快取失效)
+# 快取開啟與關閉(PAGE_CACHE_TTL=0)各跑一次，比較每秒請求數與每個請求平均的 SQL 查詢數
+# 用法: 指向一個測試用的 Postgres 資料庫後執行
+#   DATABASE_URL=... ASYNC_DATABASE_URL=... python benchmarks/page_cache.py --requests 5000 --write-ratio 0.01
+import argparse
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+from sqlalchemy import event, select, func
+
+import database
+import models
+import page_cache
+from main import app
+from passwords import hash_password
+
+PREFIX = "pagecache-bench"
+PASSWORD = "pw"
+
+def setup(contractors, projects):
+    with database.SessionLocal() as db:
+        def ensure_user(username, role):
+            user = db.scalar(select(models.User).filter(models.User.username == username))
+            if user is None:
+                user = models.User(username=username, email=f"{username}@example.com", hashed_password=hash_password(PASSWORD), role=role)
+                db.add(user)
+                db.commit()
+            return user
+        client = ensure_user(f"{PREFIX}-client", "client")
+        for i in range(contractors):
+            ensure_user(f"{PREFIX}-contractor{i}", "contractor")
+        existing = db.scalar(select(func.count()).select_from(models.Project).filter(models.Project.client_id == client.id))
+        now = time.time()
+        for i in range(existing, projects):
+            deadline = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now + random.randint(7, 60) * 86400))
+            db.add(models.Project(title=f"{PREFIX} {i}", description="效能測試專案", client_id=client.id, proposal_deadline=deadline))
+        db.commit()
+
+async def login(username):
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+    await client.post("/auth/login", data={"username": username, "password": PASSWORD})
+    return client
+
+async def run_mode(ttl, contractors, total, concurrency, write_ratio, queries):
+    page_cache.PAGE_CACHE_TTL = ttl
+    page_cache.invalidate(page_cache.AVAILABLE_PROJECTS)
+    for key in page_cache.stats:
+        page_cache.stats[key] = 0
+    readers = [await login(f"{PREFIX}-contractor{i}") for i in range(contractors)]
+    writer = await login(f"{PREFIX}-client")
+    remaining = total
+    writes = 0
+
+    async def worker():
+        nonlocal remaining, writes
+        while remaining > 0:
+            remaining -= 1
+            if random.random() < write_ratio:
+                writes += 1
+                await writer.post("/projects/create", data={
+                    "title": f"{PREFIX} new", "description": "效能測試專案", "proposal_deadline": "2099-01-01T10:00"})
+                continue
+            response = await random.choice(readers).get("/projects/available_page", params={"sort": random.choice(["newest", "deadline"])})
+            response.raise_for_status()
+
+    queries["n"] = 0
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    for client in readers + [writer]:
+        await client.aclose()
+    status = page_cache.cache_status()
+    label = f"快取 TTL={ttl:g}s" if ttl > 0 else "不快取"
+    print(f"{label:12s} {total / elapsed:7.1f} req/s  SQL {queries['n'] / elapsed:7.1f} 次/s "
+          f"({queries['n'] / total:.2f} 次/請求)  寫入 {writes}  命中率 {status['hit_ratio']:.1%}  "
+          f"stale {status['stale_serves']}  失效 {status['invalidations']}")
+
+async def run(contractors, projects, total, concurrency, write_ratio, ttl):
+    await asyncio.to_thread(setup, contractors, projects)
+    queries = {"n": 0}
+    lock = threading.Lock()
+
+    def count(*args):
+        with lock:
+            queries["n"] += 1
+
+    event.listen(database.engine, "before_cursor_execute", count)
+    event.listen(database.async_engine.sync_engine, "before_cursor_execute", count)
+    for mode_ttl in (0, ttl):
+        await run_mode(mode_ttl, contractors, total, concurrency, write_ratio, queries)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--contractors", type=int, default=20)
+    parser.add_argument("--projects", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--write-ratio", type=float, default=0.01)
+    parser.add_argument("--ttl", type=float, default=30)
+    args = parser.parse_args()
+    asyncio.run(run(args.contractors, args.projects, args.requests, args.concurrency, args.write_ratio, args.ttl))
@@ -0,0 +1,34 @@
+# 不同 bcrypt cost 下，每個 worker 每秒可處理的登入數
+# 用法: python benchmarks/password_hashing.py --rounds 10 11 12 13 --workers 1 4
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from passlib.context import CryptContext
+
+
+def _verify(rounds, password, hashed):
+    return CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=rounds).verify(password, hashed)
+
+def run(rounds_list, workers_list, logins):
+    for rounds in rounds_list:
+        context = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=rounds)
+        hashed = context.hash("benchmark-password")
+        for workers in workers_list:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # 暖機，讓子行程先啟動
+                list(pool.map(_verify, [rounds] * workers, ["benchmark-password"] * workers, [hashed] * workers))
+                start = time.perf_counter()
+                results = list(pool.map(_verify, [rounds] * logins, ["benchmark-password"] * logins, [hashed] * logins))
+                elapsed = time.perf_counter() - start
+            assert all(results)
+            print(f"rounds={rounds} workers={workers} logins/s={logins / elapsed:.1f} per_worker={logins / elapsed / workers:.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 11, 12, 13])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--logins", type=int, default=64)
+    args = parser.parse_args()
+    run(args.rounds, args.workers, args.logins)
@@ -0,0 +1,89 @@
+# 專案全文檢索在大量資料下的查詢時間
+# 用法: 指向一個測試用的 Postgres 資料庫後執行，第一次會產生 --rows 筆專案(可重複執行，已足量時不再新增)
+#   DATABASE_URL=postgresql://user:pw@localhost/bench python benchmarks/search.py --rows 1000000
+#   python benchmarks/search.py --cleanup   # 刪除產生的資料
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import select, text, func
+
+from database import SessionLocal
+import migrate
+import models
+from pagination import paginate, RELEVANCE
+from search import search_statement
+
+BENCH_USER = "search-benchmark"
+TITLE_WORDS = ["網站", "開發", "設計", "維護", "App", "後台", "行銷", "資料", "分析", "系統", "電商", "React", "Python", "影片", "剪輯", "翻譯"]
+DESCRIPTION_WORDS = TITLE_WORDS + ["需要", "協助", "製作", "前端", "後端", "API", "資料庫", "介面", "專案", "預算", "時程", "node.js", "iOS", "Android"]
+QUERIES = ["網站", "網站 開發", "react", "pyth", "影片剪輯", "node.js 後端", "android 介面 設計", "不存在的詞"]
+
+def _random_words(words, count):
+    array = "ARRAY[" + ", ".join(f"'{word}'" for word in words) + "]"
+    return " || ' ' || ".join(f"({array})[1 + floor(random() * {len(words)})::int]" for _ in range(count))
+
+def generate(db, rows, batch):
+    user = db.scalar(select(models.User).filter(models.User.username == BENCH_USER))
+    if user is None:
+        user = models.User(username=BENCH_USER, email=f"{BENCH_USER}@example.com", hashed_password="-", role="client")
+        db.add(user)
+        db.commit()
+    existing = db.scalar(select(func.count()).select_from(models.Project).filter(models.Project.client_id == user.id))
+    for start in range(existing, rows, batch):
+        count = min(batch, rows - start)
+        began = time.perf_counter()
+        db.execute(text(f"""
+            INSERT INTO projects (title, description, client_id, status, close_requested, version, create_time, proposal_deadline)
+            SELECT {_random_words(TITLE_WORDS, 3)}, {_random_words(DESCRIPTION_WORDS, 12)}, :client_id,
+                   (ARRAY['open', 'open', 'in_process', 'closed', 'noBid'])[1 + floor(random() * 5)::int], false, 0,
+                   now() - random() * interval '365 days', now() + random() * interval '60 days'
+            FROM generate_series(1, :count)
+        """), {"client_id": user.id, "count": count})
+        db.commit()
+        print(f"已新增 {start + count}/{rows} 筆 ({time.perf_counter() - began:.1f}s)")
+    db.execute(text("ANALYZE projects"))
+    db.commit()
+    return user
+
+def run(rows, batch, repeat):
+    migrate.upgrade()
+    with SessionLocal() as db:
+        user = generate(db, rows, batch)
+        viewer = {"id": user.id, "role": "contractor"}
+        for sort in (RELEVANCE, "newest"):
+            for q in QUERIES:
+                stmt, rank = search_statement(select(models.Project), q, viewer, ["open"], ranked=sort == RELEVANCE)
+                query = paginate(stmt, sort, rank=rank)
+                timings = []
+                for _ in range(repeat):
+                    began = time.perf_counter()
+                    found = len(db.scalars(query).all())
+                    timings.append((time.perf_counter() - began) * 1000)
+                matches = db.scalar(select(func.count()).select_from(stmt.subquery()))
+                timings.sort()
+                print(f"sort={sort:9s} q={q!r:22s} 符合 {matches:8d} 筆  第一頁 {found:2d} 筆  "
+                      f"p50={timings[len(timings) // 2]:.1f}ms  max={timings[-1]:.1f}ms")
+
+def cleanup():
+    with SessionLocal() as db:
+        user = db.scalar(select(models.User).filter(models.User.username == BENCH_USER))
+        if user:
+            db.execute(text("DELETE FROM projects WHERE client_id = :id"), {"id": user.id})
+            db.delete(user)
+            db.commit()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--batch", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--cleanup", action="store_true")
+    args = parser.parse_args()
+    if args.cleanup:
+        cleanup()
+    else:
+        run(args.rows, args.batch, args.repeat)
@@ -0,0 +1,94 @@
+# cookie 簽章 session(SessionMiddleware) 與伺服器端 session(memory / sqlite) 的 cookie 大小與每個請求的額外耗時
+# 直接呼叫 ASGI app，不經過網路，只量 middleware 本身的成本
+# 用法: python benchmarks/session_overhead.py --requests 20000
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.sessions import SessionMiddleware
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+import sessions
+
+USER = {"id": 123, "username": "contractor_user", "role": "contractor"}
+FLASH = "已上傳結案檔案!按下 '請求結案' 按鈕通知委託人"
+
+
+async def login(request):
+    request.session["user"] = USER
+    request.session["flash"] = FLASH
+    return PlainTextResponse("ok")
+
+async def read_only(request):
+    # 大部分頁面只讀取登入資訊
+    return PlainTextResponse(request.session.get("user", {}).get("username", ""))
+
+async def write(request):
+    # 每次內容都不同，一定要寫回 session
+    request.session["flash"] = f"{FLASH} {time.perf_counter_ns()}"
+    return PlainTextResponse("ok")
+
+async def noop(request):
+    return PlainTextResponse("ok")
+
+ROUTES = [Route("/login", login), Route("/read", read_only), Route("/write", write), Route("/noop", noop)]
+
+
+async def call(app, path, cookie=None):
+    headers = [(b"cookie", f"session={cookie}".encode())] if cookie else []
+    scope = {"type": "http", "method": "GET", "path": path, "raw_path": path.encode(), "query_string": b"",
+             "headers": headers, "http_version": "1.1", "scheme": "http", "server": ("bench", 80),
+             "client": ("bench", 1), "root_path": ""}
+    set_cookie = None
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal set_cookie
+        if message["type"] == "http.response.start":
+            for name, value in message["headers"]:
+                if name == b"set-cookie":
+                    set_cookie = value.decode().split(";", 1)[0].split("=", 1)[1]
+
+    await app(scope, receive, send)
+    return set_cookie
+
+async def time_path(app, path, cookie, requests):
+    start = time.perf_counter()
+    for _ in range(requests):
+        await call(app, path, cookie)
+    return (time.perf_counter() - start) / requests * 1e6
+
+async def run(requests):
+    baseline = Starlette(routes=ROUTES)
+    tmp_dir = tempfile.mkdtemp()
+    variants = {
+        "cookie": Starlette(routes=ROUTES, middleware=[Middleware(SessionMiddleware, secret_key="bench")]),
+        "server-memory": Starlette(routes=ROUTES, middleware=[
+            Middleware(sessions.ServerSessionMiddleware, store=sessions.MemorySessionStore(), secret_key="bench")]),
+        "server-sqlite": Starlette(routes=ROUTES, middleware=[
+            Middleware(sessions.ServerSessionMiddleware, store=sessions.SQLiteSessionStore(os.path.join(tmp_dir, "s.db")), secret_key="bench")]),
+    }
+    base_us = await time_path(baseline, "/noop", None, requests)
+    print(f"無 session middleware: {base_us:.1f} us/request")
+    for name, app in variants.items():
+        cookie = await call(app, "/login")
+        read_us = await time_path(app, "/read", cookie, requests)
+        write_us = await time_path(app, "/write", cookie, requests)
+        print(f"{name:14s} cookie={len(cookie):4d} bytes  "
+              f"讀取 +{read_us - base_us:6.1f} us/request  寫入 +{write_us - base_us:6.1f} us/request")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests))
@@ -0,0 +1,75 @@
+# 上傳存檔的記憶體用量: 整檔 read() 與分塊串流比較
+# 每種寫法、每個大小各在一個子行程中執行，量測行程的 RSS 峰值(ru_maxrss)，含 C 層與 Python 物件以外的記憶體
+# 串流寫法的 RSS 增量應與檔案大小無關
+# 用法: python benchmarks/upload_memory.py --sizes 10 100 500   (單位 MB)
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from fastapi import UploadFile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 測試大檔時不套用上傳大小上限
+os.environ.setdefault("UPLOAD_MAX_BYTES", "0")
+from uploads import save_upload
+
+def make_source(path, size_mb):
+    block = os.urandom(1024 * 1024)
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(block)
+
+async def read_all(upload, dest_dir):
+    # 舊寫法
+    with open(os.path.join(dest_dir, upload.filename), "wb") as f:
+        f.write(await upload.read())
+
+METHODS = {"read_all": read_all, "streamed": save_upload}
+
+def max_rss_mb():
+    # Linux 的單位是 KB，macOS 是 bytes
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+async def child(method, source, dest_dir):
+    """子行程: 執行一次上傳，輸出耗時與 RSS(JSON)"""
+    baseline = max_rss_mb()
+    with open(source, "rb") as src:
+        upload = UploadFile(src, filename="bench.bin", size=os.path.getsize(source))
+        start = time.perf_counter()
+        await METHODS[method](upload, dest_dir)
+        elapsed = time.perf_counter() - start
+    peak = max_rss_mb()
+    print(json.dumps({"elapsed": elapsed, "baseline_mb": baseline, "peak_mb": peak}))
+
+def measure(method, source, dest_dir):
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", method, source, dest_dir],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main(sizes):
+    with tempfile.TemporaryDirectory() as tmp:
+        for size_mb in sizes:
+            source = os.path.join(tmp, f"src_{size_mb}.bin")
+            make_source(source, size_mb)
+            for method in METHODS:
+                result = measure(method, source, tmp)
+                print(f"{method:9s} size={size_mb}MB time={result['elapsed'] * 1000:.0f}ms "
+                      f"peak_rss={result['peak_mb']:.1f}MB rss_growth={result['peak_mb'] - result['baseline_mb']:.1f}MB")
+            os.remove(source)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--child", nargs=3, metavar=("METHOD", "SOURCE", "DEST_DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        asyncio.run(child(*args.child))
+    else:
+        main(args.sizes)
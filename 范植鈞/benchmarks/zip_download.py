@@ -0,0 +1,82 @@
+# zip 下載: 整包放進 BytesIO 與串流產生的比較(首位元組時間、吞吐量、記憶體峰值)
+# 每種寫法、每個大小各在一個子行程中執行，量測行程的 RSS 峰值(ru_maxrss)；串流寫法的 RSS 增量應與資料夾大小無關
+# 用法: python benchmarks/zip_download.py --size-mb 256 2048
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from zipstream import iter_folder_zip
+
+def make_folder(path, size_mb):
+    # 一半可壓縮的文字檔，一半已壓縮的 pdf/jpg(隨機內容)
+    os.makedirs(path, exist_ok=True)
+    text = (b"progress report line\n" * 50000)[:1024 * 1024]
+    for i in range(size_mb):
+        name, block = (f"part{i}.txt", text) if i % 2 else (f"scan{i}.pdf" if i % 4 else f"photo{i}.jpg", os.urandom(1024 * 1024))
+        with open(os.path.join(path, name), "wb") as f:
+            f.write(block)
+
+def bytesio_zip(base_path):
+    # 舊寫法
+    zip_stream = io.BytesIO()
+    with zipfile.ZipFile(zip_stream, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for root, dirs, files in os.walk(base_path):
+            for file in files:
+                file_path = os.path.join(root, file)
+                zf.write(file_path, arcname=os.path.relpath(file_path, base_path))
+    zip_stream.seek(0)
+    while True:
+        chunk = zip_stream.read(64 * 1024)
+        if not chunk:
+            break
+        yield chunk
+
+METHODS = {"bytesio": bytesio_zip, "streamed": iter_folder_zip}
+
+def max_rss_mb():
+    # Linux 的單位是 KB，macOS 是 bytes
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+def child(method, base_path):
+    """子行程: 讀完整個 zip，輸出首位元組時間、耗時、大小與 RSS(JSON)"""
+    baseline = max_rss_mb()
+    start = time.perf_counter()
+    first = None
+    total = 0
+    for chunk in METHODS[method](base_path):
+        if first is None:
+            first = time.perf_counter() - start
+        total += len(chunk)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"ttfb": first, "elapsed": elapsed, "total": total, "baseline_mb": baseline, "peak_mb": max_rss_mb()}))
+
+def measure(method, base_path, size_mb):
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", method, base_path],
+                            check=True, capture_output=True, text=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    print(f"{method:9s} size={size_mb}MB ttfb={result['ttfb'] * 1000:.0f}ms total={result['elapsed']:.2f}s "
+          f"throughput={size_mb / result['elapsed']:.0f}MB/s zip_size={result['total'] / 1024 / 1024:.0f}MB "
+          f"peak_rss={result['peak_mb']:.1f}MB rss_growth={result['peak_mb'] - result['baseline_mb']:.1f}MB")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, nargs="+", default=[256])
+    parser.add_argument("--child", nargs=2, metavar=("METHOD", "FOLDER"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(*args.child)
+    else:
+        for size_mb in args.size_mb:
+            with tempfile.TemporaryDirectory() as tmp:
+                make_folder(tmp, size_mb)
+                for method in METHODS:
+                    measure(method, tmp, size_mb)
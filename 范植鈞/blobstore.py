@@ -0,0 +1,178 @@
+# blobstore.py
+# 以 sha256 為 key 的檔案庫: 相同內容只存一份，upload_file / upload_proposal 裡的檔案是指向它的 hard link
+# 參照數即 hard link 數(st_nlink - 1)，沒有任何資料夾參照且超過寬限期的 blob 由 gc 回收(scheduler 定期執行，也可手動執行)
+# 用法: python blobstore.py report | gc | migrate
+import argparse
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+
+# blob 存放位置，需與 upload_file 在同一個檔案系統才能建立 hard link
+BLOB_ROOT = os.getenv("BLOB_ROOT", "blobs")
+BLOB_CHUNK_SIZE = 1024 * 1024
+# 剛寫入(或剛被重複上傳)的 blob 在這段時間內不回收: stage_upload 存好 blob 到 link_upload 建立參照之間還沒有任何參照
+BLOB_GC_GRACE_SECONDS = int(os.getenv("BLOB_GC_GRACE_SECONDS", str(60 * 60)))
+# 需轉換成 blob 參照的上傳資料夾
+UPLOAD_DIRS = ("upload_file", "upload_proposal")
+
+_lock = threading.Lock()
+stats = {"stored": 0, "deduplicated": 0, "bytes_written": 0, "bytes_saved": 0, "link_fallbacks": 0}
+
+def _count(**deltas):
+    with _lock:
+        for name, value in deltas.items():
+            stats[name] += value
+
+def blob_path(digest):
+    return os.path.join(BLOB_ROOT, digest[:2], digest[2:4], digest)
+
+def exists(digest):
+    return os.path.exists(blob_path(digest))
+
+def _atomic_target(dest_path):
+    return os.path.join(os.path.dirname(dest_path) or ".", f".{uuid.uuid4().hex}.part")
+
+def _reuse(path, size):
+    """內容已存在: 更新存取時間(atime)，讓 gc 的寬限期從這次上傳重新起算
+    blob 與各資料夾的參照是同一個 inode，不能動 mtime: 那是下載的 Last-Modified 與 zip 快取內容清單的依據"""
+    try:
+        st = os.stat(path)
+        os.utime(path, ns=(time.time_ns(), st.st_mtime_ns))
+    except FileNotFoundError:
+        return False
+    _count(deduplicated=1, bytes_saved=size)
+    return True
+
+def put_stream(src, digest, size):
+    """把已算好雜湊的內容存成 blob；已存在時不寫入任何資料。回傳是否為新的 blob"""
+    path = blob_path(digest)
+    if os.path.exists(path) and _reuse(path, size):
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = _atomic_target(path)
+    try:
+        with open(tmp_path, "wb") as out:
+            shutil.copyfileobj(src, out, BLOB_CHUNK_SIZE)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    _count(stored=1, bytes_written=size)
+    return True
+
+def put_file(path, digest, size):
+    """把已寫好且算好雜湊的檔案直接 rename 成 blob(同檔案系統時不複製)；已存在時刪除該檔。回傳是否為新的 blob"""
+    blob = blob_path(digest)
+    if os.path.exists(blob) and _reuse(blob, size):
+        os.remove(path)
+        return False
+    os.makedirs(os.path.dirname(blob), exist_ok=True)
+    try:
+        os.replace(path, blob)
+    except OSError:
+        # 跨檔案系統無法 rename，改為複製
+        with open(path, "rb") as src:
+            put_stream(src, digest, size)
+        os.remove(path)
+        return True
+    _count(stored=1, bytes_written=size)
+    return True
+
+def link_to(digest, dest_path):
+    """在 dest_path 建立指向 blob 的參照(hard link，不支援時改為複製)，以 rename 取代舊檔"""
+    tmp_path = _atomic_target(dest_path)
+    try:
+        try:
+            os.link(blob_path(digest), tmp_path)
+        except OSError:
+            shutil.copyfile(blob_path(digest), tmp_path)
+            _count(link_fallbacks=1)
+        os.replace(tmp_path, dest_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def hash_file(path):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(BLOB_CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+def adopt_file(path):
+    """把既有的一般檔案轉為 blob 參照，回傳節省的位元組數"""
+    st = os.stat(path)
+    digest = hash_file(path)
+    blob = blob_path(digest)
+    if os.path.exists(blob):
+        if os.path.samefile(blob, path):
+            return 0
+        link_to(digest, path)
+        return st.st_size
+    os.makedirs(os.path.dirname(blob), exist_ok=True)
+    os.link(path, blob)
+    return 0
+
+def _iter_blobs():
+    if not os.path.isdir(BLOB_ROOT):
+        return
+    for root, dirs, files in os.walk(BLOB_ROOT):
+        for name in files:
+            if not name.startswith("."):
+                yield os.path.join(root, name)
+
+def report():
+    """統計 blob 數、參照數、實際佔用與因去重節省的空間"""
+    blobs = references = stored_bytes = saved_bytes = 0
+    for path in _iter_blobs():
+        st = os.stat(path)
+        refs = max(st.st_nlink - 1, 0)
+        blobs += 1
+        references += refs
+        stored_bytes += st.st_size
+        saved_bytes += max(refs - 1, 0) * st.st_size
+    return {"blobs": blobs, "references": references, "stored_bytes": stored_bytes, "saved_bytes": saved_bytes}
+
+def gc(grace_seconds=None):
+    """刪除沒有任何資料夾參照、且超過寬限期沒有寫入或重複上傳(atime)的 blob，回傳刪除數"""
+    cutoff = time.time() - (BLOB_GC_GRACE_SECONDS if grace_seconds is None else grace_seconds)
+    removed = 0
+    for path in list(_iter_blobs()):
+        try:
+            st = os.stat(path)
+            if st.st_nlink <= 1 and max(st.st_mtime, st.st_atime) < cutoff:
+                os.remove(path)
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
+
+def migrate():
+    """把 upload_file / upload_proposal 裡既有的檔案轉為 blob 參照"""
+    saved = 0
+    for upload_dir in UPLOAD_DIRS:
+        for root, dirs, files in os.walk(upload_dir):
+            for name in files:
+                if not name.startswith("."):
+                    saved += adopt_file(os.path.join(root, name))
+    return saved
+
+def store_status():
+    with _lock:
+        return dict(stats)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["report", "gc", "migrate"])
+    parser.add_argument("--grace-seconds", type=int, help=f"gc: 未滿這個秒數的 blob 不回收(預設 {BLOB_GC_GRACE_SECONDS})")
+    args = parser.parse_args()
+    if args.command == "report":
+        print(report())
+    elif args.command == "gc":
+        print(f"已刪除 {gc(args.grace_seconds)} 個未被參照的 blob")
+    else:
+        print(f"轉換完成，節省 {migrate()} bytes")
+        print(report())
@@ -1,7 +1,16 @@
 # database.py
-from sqlalchemy import create_engine
+import logging
+import os
+import threading
+import time
+import traceback
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+logger = logging.getLogger(__name__)
 
 # PostgreSQL連線字串
 defaultDB="Mid_Project"
@@ -10,11 +19,144 @@ dbPassword="pw940418"
 dbHost="localhost"
 dbPort=5432
 
-SQLALCHEMY_DATABASE_URL = f"postgresql://{dbUser}:{dbPassword}@{dbHost}:{dbPort}/{defaultDB}"
+# 可用環境變數覆寫連線字串
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", f"postgresql://{dbUser}:{dbPassword}@{dbHost}:{dbPort}/{defaultDB}")
+# async 路由使用的連線字串(asyncpg 驅動)
+ASYNC_SQLALCHEMY_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", f"postgresql+asyncpg://{dbUser}:{dbPassword}@{dbHost}:{dbPort}/{defaultDB}")
+
+# 連線池設定(每個 worker 的 sync 與 async engine 各有一個池)
+# 每個 worker 最多佔用 2 * (DB_POOL_SIZE + DB_MAX_OVERFLOW) 條連線，需小於 Postgres max_connections / worker 數
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# 連線被借出超過幾秒視為洩漏並記錄借出時的 stack，0 代表關閉
+DB_LEAK_THRESHOLD = float(os.getenv("DB_LEAK_THRESHOLD", "30"))
+
+class PoolStats:
+    """記錄單一連線池的等待時間與借出中的連線，供 /internal/db-pool 與洩漏偵測使用"""
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+        # id(connection record) -> (借出時間, 借出時的 stack)
+        self.held = {}
+        self.leak_reported = set()
+
+    def record_wait(self, seconds, timed_out=False):
+        with self.lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def on_checkout(self, record):
+        stack = traceback.extract_stack()[:-1] if DB_LEAK_THRESHOLD > 0 else None
+        with self.lock:
+            self.held[id(record)] = (time.monotonic(), stack)
+
+    def on_checkin(self, record):
+        with self.lock:
+            self.held.pop(id(record), None)
+            self.leak_reported.discard(id(record))
+
+    def find_leaks(self):
+        """回傳借出超過門檻的連線，第一次發現時記錄借出的 stack"""
+        if DB_LEAK_THRESHOLD <= 0:
+            return []
+        now = time.monotonic()
+        leaks = []
+        with self.lock:
+            for key, (since, stack) in self.held.items():
+                held_for = now - since
+                if held_for < DB_LEAK_THRESHOLD:
+                    continue
+                leaks.append({"held_seconds": round(held_for, 3)})
+                if key not in self.leak_reported:
+                    self.leak_reported.add(key)
+                    logger.warning(
+                        "[%s] 連線已借出 %.1f 秒未歸還，借出位置:\n%s",
+                        self.name, held_for, "".join(traceback.format_list(stack or [])),
+                    )
+        return leaks
+
+    def snapshot(self, pool):
+        leaks = self.find_leaks()
+        with self.lock:
+            checkouts = self.checkouts
+            return {
+                "pool_size": pool.size(),
+                "max_overflow": DB_MAX_OVERFLOW,
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "checkouts": checkouts,
+                "checkout_wait_avg_ms": round(self.wait_total / checkouts * 1000, 3) if checkouts else 0.0,
+                "checkout_wait_max_ms": round(self.wait_max * 1000, 3),
+                "checkout_timeouts": self.timeouts,
+                "leaks": leaks,
+            }
+
+def _instrumented(pool_cls, stats):
+    # 取得連線前後計時，得到在池中排隊等待的時間
+    # stats 放在類別上，dispose() 重建的池也會沿用
+    class InstrumentedPool(pool_cls):
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                conn = super()._do_get()
+            except Exception:
+                self.stats.record_wait(0, timed_out=True)
+                raise
+            self.stats.record_wait(time.perf_counter() - start)
+            if DB_LEAK_THRESHOLD > 0:
+                self.stats.find_leaks()
+            return conn
+
+    InstrumentedPool.stats = stats
+    InstrumentedPool.__name__ = f"Instrumented{pool_cls.__name__}"
+    return InstrumentedPool
+
+def _listen_pool(sync_engine, stats):
+    event.listen(sync_engine, "checkout", lambda dbapi_conn, record, proxy: stats.on_checkout(record))
+    event.listen(sync_engine, "checkin", lambda dbapi_conn, record: stats.on_checkin(record))
+
+POOL_OPTIONS = dict(
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+)
+
+pool_stats = {"sync": PoolStats("sync"), "async": PoolStats("async")}
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, poolclass=_instrumented(QueuePool, pool_stats["sync"]), **POOL_OPTIONS)
+_listen_pool(engine, pool_stats["sync"])
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+# async engine: 查詢時不會卡住 event loop
+async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, poolclass=_instrumented(AsyncAdaptedQueuePool, pool_stats["async"]), **POOL_OPTIONS)
+_listen_pool(async_engine.sync_engine, pool_stats["async"])
+# commit 後不 expire，讓模板還能讀取已載入的欄位
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+def pool_status():
+    """目前兩個連線池的狀態"""
+    return {
+        "sync": pool_stats["sync"].snapshot(engine.pool),
+        "async": pool_stats["async"].snapshot(async_engine.sync_engine.pool),
+        "max_connections_per_worker": 2 * (DB_POOL_SIZE + DB_MAX_OVERFLOW),
+    }
+
 Base = declarative_base()
 
 # Dependency
@@ -24,3 +166,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Dependency (給 async def 路由使用)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
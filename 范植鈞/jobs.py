@@ -0,0 +1,337 @@
+# jobs.py
+# 背景工作佇列: 工作存在資料庫的 jobs 資料表，路由只負責寫入一筆工作(可與其他資料在同一個 transaction commit)後立即回應
+# worker 以 FOR UPDATE SKIP LOCKED 取出工作，交給 thread 或 process pool 執行；失敗時依指數退避重試，超過次數標為 failed
+# 相同 key 的工作只會建立一次；執行逾時(worker 中斷)的工作會重新排入佇列，所以 handler 需可重複執行
+# 用法: python jobs.py status | list [--status failed] | retry <id> | retry-failed | worker
+import argparse
+import asyncio
+import logging
+import os
+import shutil
+import socket
+import sys
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from database import SessionLocal
+import models
+
+logger = logging.getLogger(__name__)
+
+# 同時執行的工作數，0 代表這個程序不執行工作(只寫入佇列，由 python jobs.py worker 執行)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# thread: 與 web 程序共用；process: 各自的子程序，適合 CPU 密集的工作
+JOB_WORKER_MODE = os.getenv("JOB_WORKER_MODE", "thread")
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+# 第 n 次失敗後等待 JOB_RETRY_BASE_SECONDS * 2^(n-1) 秒再重試，最多 JOB_RETRY_MAX_SECONDS
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "5"))
+JOB_RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "3600"))
+# running 超過這個秒數視為 worker 已中斷，重新排入佇列
+JOB_TIMEOUT_SECONDS = float(os.getenv("JOB_TIMEOUT_SECONDS", "600"))
+# 完成的工作保留天數
+JOB_RETENTION_DAYS = float(os.getenv("JOB_RETENTION_DAYS", "7"))
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+_lock = threading.Lock()
+stats = {"succeeded": 0, "failed": 0, "retried": 0, "reclaimed": 0,
+         "wait_ms_total": 0.0, "wait_ms_max": 0.0, "run_ms_total": 0.0, "run_ms_max": 0.0}
+_tasks = []
+
+# --- 工作內容 ---
+
+def build_archive(payload):
+    import archive_cache
+    archive_cache.build(payload["path"])
+
+def move_files(payload):
+    """把 files({檔名: sha256})從 src 搬到 dest；已搬過或內容不同(之後重新上傳)的檔案略過，src 空了就刪除"""
+    from blobstore import hash_file
+    src, dest = payload["src"], payload["dest"]
+    for name, sha256 in payload["files"].items():
+        path = os.path.join(src, name)
+        if not os.path.isfile(path) or hash_file(path) != sha256:
+            continue
+        os.makedirs(dest, exist_ok=True)
+        os.replace(path, os.path.join(dest, name))
+    try:
+        os.rmdir(src)
+    except OSError:
+        pass
+
+def remove_tree(payload):
+    shutil.rmtree(payload["path"], ignore_errors=True)
+
+def remove_files(payload):
+    """刪除 paths 裡的檔案或資料夾(報價的 proposal_file 是放計劃書的資料夾)，並往上刪除因此變空的資料夾
+    (不刪最上層的 upload_file、upload_proposal)"""
+    for path in payload["paths"]:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        parent = os.path.dirname(path)
+        while os.path.dirname(parent):
+            try:
+                os.rmdir(parent)
+            except OSError:
+                break
+            parent = os.path.dirname(parent)
+
+HANDLERS = {
+    "build_archive": build_archive,
+    "move_files": move_files,
+    "remove_tree": remove_tree,
+    "remove_files": remove_files,
+}
+
+def run_handler(kind, payload):
+    # process 模式下在子程序執行，只傳名稱與 payload
+    HANDLERS[kind](payload)
+
+# --- 寫入佇列 ---
+
+def enqueue_statement(kind, payload, key=None, delay=0, max_attempts=JOB_MAX_ATTEMPTS):
+    if kind not in HANDLERS:
+        raise ValueError(f"未知的工作種類: {kind}")
+    now = datetime.now()
+    stmt = pg_insert(models.Job).values(
+        kind=kind, key=key, payload=payload, status="queued", attempts=0, max_attempts=max_attempts,
+        run_at=now + timedelta(seconds=delay), created_at=now,
+    )
+    return stmt.on_conflict_do_nothing(index_elements=["key"])
+
+def enqueue(db, kind, payload, key=None, delay=0):
+    """加入一筆工作，由呼叫端 commit；同一個 key 已存在時不會重複建立"""
+    db.execute(enqueue_statement(kind, payload, key, delay))
+
+async def aenqueue(db, kind, payload, key=None, delay=0):
+    await db.execute(enqueue_statement(kind, payload, key, delay))
+
+# --- worker ---
+
+def claim():
+    """取出一筆可執行的工作並標為 running，沒有時回傳 None"""
+    now = datetime.now()
+    with SessionLocal() as db:
+        next_job = (
+            select(models.Job.id)
+            .filter(models.Job.status == "queued", models.Job.run_at <= now)
+            .order_by(models.Job.run_at, models.Job.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        # 回傳資料列而不是 ORM 物件，commit 後仍可讀取欄位
+        job = db.execute(
+            update(models.Job)
+            .where(models.Job.id == next_job)
+            .values(status="running", attempts=models.Job.attempts + 1, started_at=now, locked_by=WORKER_ID)
+            .returning(models.Job.__table__)
+        ).one_or_none()
+        db.commit()
+        return job
+
+def _record_timing(job, finished):
+    wait_ms = (job.started_at - job.run_at).total_seconds() * 1000
+    run_ms = (finished - job.started_at).total_seconds() * 1000
+    with _lock:
+        stats["wait_ms_total"] += max(wait_ms, 0)
+        stats["wait_ms_max"] = max(stats["wait_ms_max"], wait_ms)
+        stats["run_ms_total"] += run_ms
+        stats["run_ms_max"] = max(stats["run_ms_max"], run_ms)
+
+def complete(job, error=None):
+    """記錄執行結果；失敗且還有重試次數時依指數退避重新排入佇列"""
+    now = datetime.now()
+    values = {"finished_at": now, "locked_by": None}
+    if error is None:
+        values["status"] = "done"
+        outcome = "succeeded"
+    elif job.attempts < job.max_attempts:
+        delay = min(JOB_RETRY_BASE_SECONDS * 2 ** (job.attempts - 1), JOB_RETRY_MAX_SECONDS)
+        values.update(status="queued", run_at=now + timedelta(seconds=delay), last_error=error)
+        outcome = "retried"
+    else:
+        values.update(status="failed", last_error=error)
+        outcome = "failed"
+    with SessionLocal() as db:
+        # 只更新仍由自己持有的工作；逾時被重新排入佇列後，舊的結果不覆蓋
+        db.execute(update(models.Job).where(models.Job.id == job.id, models.Job.status == "running",
+                                           models.Job.locked_by == WORKER_ID).values(**values))
+        db.commit()
+    with _lock:
+        stats[outcome] += 1
+    _record_timing(job, now)
+    if error is not None:
+        logger.warning("背景工作 %s #%d 第 %d 次執行失敗(%s):\n%s", job.kind, job.id, job.attempts, outcome, error)
+
+def reclaim_stale():
+    """running 超過 JOB_TIMEOUT_SECONDS 的工作重新排入佇列，回傳筆數"""
+    with SessionLocal() as db:
+        result = db.execute(
+            update(models.Job)
+            .where(models.Job.status == "running", models.Job.started_at < datetime.now() - timedelta(seconds=JOB_TIMEOUT_SECONDS))
+            .values(status="queued", locked_by=None, last_error="執行逾時，重新排入佇列")
+        )
+        db.commit()
+    if result.rowcount:
+        with _lock:
+            stats["reclaimed"] += result.rowcount
+    return result.rowcount
+
+def purge_finished():
+    """刪除超過保留天數的已完成工作，回傳筆數"""
+    with SessionLocal() as db:
+        result = db.execute(delete(models.Job).where(
+            models.Job.status == "done", models.Job.finished_at < datetime.now() - timedelta(days=JOB_RETENTION_DAYS)))
+        db.commit()
+    return result.rowcount
+
+def _create_executor(workers, mode):
+    if mode == "process":
+        return ProcessPoolExecutor(max_workers=workers)
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+
+async def _execute(executor, job):
+    loop = asyncio.get_running_loop()
+    error = None
+    try:
+        await loop.run_in_executor(executor, run_handler, job.kind, job.payload)
+    except Exception:
+        error = traceback.format_exc()
+    try:
+        await asyncio.to_thread(complete, job, error)
+    except Exception:
+        # 結果沒有寫入時，工作會在逾時後重新排入佇列
+        logger.exception("記錄背景工作 #%d 的結果失敗", job.id)
+
+async def work_forever(workers=JOB_WORKERS, mode=JOB_WORKER_MODE):
+    """持續取出工作執行，同時最多 workers 個"""
+    executor = _create_executor(workers, mode)
+    running = set()
+    last_reclaim = 0.0
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            try:
+                if loop.time() - last_reclaim > min(JOB_TIMEOUT_SECONDS, 60):
+                    await asyncio.to_thread(reclaim_stale)
+                    last_reclaim = loop.time()
+                while len(running) < workers:
+                    job = await asyncio.to_thread(claim)
+                    if job is None:
+                        break
+                    task = asyncio.create_task(_execute(executor, job))
+                    running.add(task)
+                    task.add_done_callback(running.discard)
+            except Exception:
+                logger.exception("取出背景工作失敗")
+            if len(running) >= workers:
+                # 執行數已滿，等任一工作完成就繼續取出
+                await asyncio.wait(running, timeout=JOB_POLL_INTERVAL, return_when=asyncio.FIRST_COMPLETED)
+            else:
+                await asyncio.sleep(JOB_POLL_INTERVAL)
+    finally:
+        for task in running:
+            task.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def start():
+    if _tasks or JOB_WORKERS <= 0:
+        return
+    _tasks.append(asyncio.get_running_loop().create_task(work_forever()))
+
+async def stop():
+    for task in _tasks:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    _tasks.clear()
+
+# --- 狀態與管理 ---
+
+def queue_status():
+    now = datetime.now()
+    with SessionLocal() as db:
+        by_status = dict(db.execute(select(models.Job.status, func.count()).group_by(models.Job.status)).all())
+        oldest = db.scalar(select(func.min(models.Job.run_at)).filter(models.Job.status == "queued", models.Job.run_at <= now))
+    with _lock:
+        counters = dict(stats)
+    finished = counters["succeeded"] + counters["failed"] + counters["retried"]
+    return {
+        "depth": by_status.get("queued", 0),
+        "by_status": by_status,
+        "oldest_ready_seconds": round((now - oldest).total_seconds(), 3) if oldest else 0.0,
+        "workers": JOB_WORKERS,
+        "mode": JOB_WORKER_MODE,
+        "succeeded": counters["succeeded"],
+        "failed": counters["failed"],
+        "retried": counters["retried"],
+        "reclaimed": counters["reclaimed"],
+        "wait_avg_ms": round(counters["wait_ms_total"] / finished, 3) if finished else 0.0,
+        "wait_max_ms": round(counters["wait_ms_max"], 3),
+        "run_avg_ms": round(counters["run_ms_total"] / finished, 3) if finished else 0.0,
+        "run_max_ms": round(counters["run_ms_max"], 3),
+    }
+
+def retry(job_ids=None):
+    """把 failed 的工作重新排入佇列(未指定 id 時重試全部)，回傳筆數"""
+    stmt = update(models.Job).where(models.Job.status == "failed")
+    if job_ids:
+        stmt = stmt.where(models.Job.id.in_(job_ids))
+    with SessionLocal() as db:
+        result = db.execute(stmt.values(status="queued", attempts=0, run_at=datetime.now(), finished_at=None))
+        db.commit()
+    return result.rowcount
+
+def _list(status, limit):
+    with SessionLocal() as db:
+        stmt = select(models.Job).order_by(models.Job.id.desc()).limit(limit)
+        if status:
+            stmt = stmt.filter(models.Job.status == status)
+        for job in db.scalars(stmt):
+            error = (job.last_error or "").strip().splitlines()
+            print(f"#{job.id} {job.kind} {job.status} 嘗試 {job.attempts}/{job.max_attempts} "
+                  f"建立 {job.created_at:%Y-%m-%d %H:%M:%S} key={job.key or '-'} {job.payload}"
+                  + (f"\n    {error[-1]}" if error else ""))
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status")
+    list_parser = sub.add_parser("list")
+    list_parser.add_argument("--status", choices=["queued", "running", "done", "failed"])
+    list_parser.add_argument("--limit", type=int, default=50)
+    retry_parser = sub.add_parser("retry")
+    retry_parser.add_argument("ids", type=int, nargs="+")
+    sub.add_parser("retry-failed")
+    worker_parser = sub.add_parser("worker")
+    worker_parser.add_argument("--workers", type=int, default=max(JOB_WORKERS, 1))
+    worker_parser.add_argument("--mode", choices=["thread", "process"], default=JOB_WORKER_MODE)
+    args = parser.parse_args()
+
+    if args.command == "status":
+        for name, value in queue_status().items():
+            print(f"{name}: {value}")
+    elif args.command == "list":
+        _list(args.status, args.limit)
+    elif args.command == "retry":
+        print(f"已重新排入 {retry(args.ids)} 筆")
+    elif args.command == "retry-failed":
+        print(f"已重新排入 {retry()} 筆")
+    elif args.command == "worker":
+        try:
+            asyncio.run(work_forever(args.workers, args.mode))
+        except KeyboardInterrupt:
+            sys.exit(0)
@@ -1,30 +1,49 @@
 from fastapi import FastAPI, Request, Form, Depends
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.middleware.sessions import SessionMiddleware
 from sqlalchemy.orm import Session
-from database import Base, engine, get_db
+from database import get_db
 from auth import router as auth_router, get_current_user, login_user, hash_password
-from routers import projects, bids, upload
+from routers import projects, bids, upload, internal, files, api
 import models
 from models import User
 import schemas
-
-templates = Jinja2Templates(directory="templates")
+import passwords
+import migrate
+import scheduler
+import jobs
+from sessions import ServerSessionMiddleware
+from uploads import reject_oversized_uploads
+from templating import templates
 
 app = FastAPI(title="Freelance Platform (Session Only)")
 app.include_router(bids.router)
 app.include_router(upload.router)
 
-app.add_middleware(SessionMiddleware, secret_key="super-secret-session-key")
+# session 內容存在伺服器端，cookie 只帶 session id
+app.add_middleware(ServerSessionMiddleware)
+app.middleware("http")(reject_oversized_uploads)
+
+# 套用尚未執行的 migration(空資料庫時建立所有資料表)
+migrate.upgrade()
+
+@app.on_event("startup")
+async def startup():
+    scheduler.start()
+    jobs.start()
 
-# 建立資料表
-Base.metadata.create_all(bind=engine)
+@app.on_event("shutdown")
+async def shutdown():
+    await jobs.stop()
+    await scheduler.stop()
+    passwords.shutdown_pool()
 
 # 註冊路由
 app.include_router(auth_router)
 app.include_router(projects.router)
+app.include_router(internal.router)
+app.include_router(files.router)
+app.include_router(api.router)
 
 # GET 根目錄
 @app.get("/", response_class=HTMLResponse)
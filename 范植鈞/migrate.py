@@ -0,0 +1,100 @@
+# migrate.py
+# 資料庫 schema 版本管理: migrations/ 下的 NNNN_名稱.py 依編號套用一次，已套用的版本記錄在 schema_migrations
+# 0001 建立 create_all 時代的資料表，之後的變更由後面的 migration 依序加上；migration 不 import models，
+# DDL 固定在各檔案中，之後修改 models 不會改變已有 migration 的結果
+# 舊的 create_all 資料庫可能已有部分變更，migration 都要可以重複執行(IF NOT EXISTS)，讓新舊資料庫升級到同一個狀態
+# 每個 migration 預設在一個 transaction 中執行；TRANSACTIONAL = False 時以 autocommit 執行(CREATE INDEX CONCURRENTLY 需要)
+# 用法: python migrate.py            # 套用尚未執行的 migration
+#       python migrate.py status     # 列出已套用與待套用的版本
+import importlib.util
+import logging
+import os
+import re
+import sys
+from sqlalchemy import text
+from database import engine
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+# 多個 worker 同時啟動時，只有拿到 advisory lock 的會執行 migration，其他等待完成
+MIGRATION_LOCK_ID = 7265011
+
+def discover():
+    """回傳 [(版本, 名稱, module)]，依版本排序"""
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = re.fullmatch(r"(\d{4})_(\w+)\.py", filename)
+        if not match:
+            continue
+        spec = importlib.util.spec_from_file_location(f"migrations.{filename[:-3]}", os.path.join(MIGRATIONS_DIR, filename))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        migrations.append((int(match.group(1)), match.group(2), module))
+    return migrations
+
+def _ensure_table(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, name VARCHAR NOT NULL, applied_at TIMESTAMP NOT NULL DEFAULT now())"
+    ))
+
+def applied_versions(conn):
+    return set(conn.scalars(text("SELECT version FROM schema_migrations")))
+
+def _record(conn, version, name):
+    conn.execute(text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"), {"version": version, "name": name})
+
+def upgrade(bind=engine):
+    """套用所有尚未執行的 migration，回傳這次套用的版本"""
+    applied = []
+    with bind.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        try:
+            _ensure_table(conn)
+            done = applied_versions(conn)
+            for version, name, module in discover():
+                if version in done:
+                    continue
+                logger.info("套用 migration %04d_%s", version, name)
+                if getattr(module, "TRANSACTIONAL", True):
+                    with bind.begin() as tx:
+                        module.upgrade(tx)
+                        _record(tx, version, name)
+                else:
+                    module.upgrade(conn)
+                    _record(conn, version, name)
+                applied.append(version)
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+    return applied
+
+def status(bind=engine):
+    """回傳 [(版本, 名稱, 是否已套用)]"""
+    with bind.begin() as conn:
+        _ensure_table(conn)
+        done = applied_versions(conn)
+    return [(version, name, version in done) for version, name, _ in discover()]
+
+def create_index_concurrently(conn, name, definition, unique=False):
+    """不鎖住寫入地建立索引，definition 例如 "ON bids (project_id)"
+    上次建立中斷時會留下無效(indisvalid = false)的索引，IF NOT EXISTS 會跳過它，需先刪除再重建"""
+    invalid = conn.scalar(text(
+        "SELECT NOT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+    ), {"name": name})
+    if invalid:
+        conn.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    conn.exec_driver_sql(f"CREATE {'UNIQUE ' if unique else ''}INDEX CONCURRENTLY IF NOT EXISTS {name} {definition}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    command = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+    if command == "status":
+        for version, name, is_applied in status():
+            print(f"{version:04d}_{name}: {'已套用' if is_applied else '待套用'}")
+    elif command == "upgrade":
+        applied = upgrade()
+        print(f"已套用 {len(applied)} 個 migration" if applied else "資料庫已是最新版本")
+    else:
+        sys.exit(f"未知的指令: {command}，可用 upgrade / status")
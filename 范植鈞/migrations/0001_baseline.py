@@ -0,0 +1,75 @@
+# 初始資料表: migration 機制出現前以 create_all 建立的 schema(使用者、專案、退件紀錄、報價、檔案清單)
+# DDL 固定在這裡，不依賴 models；之後加入的欄位、索引與約束由後面的 migration 補上
+# 以 IF NOT EXISTS 建立，先前以 create_all 建好的資料表不會變動
+
+STATEMENTS = [
+    """CREATE TABLE IF NOT EXISTS users (
+        id SERIAL NOT NULL,
+        username VARCHAR(50) NOT NULL,
+        email VARCHAR(100) NOT NULL,
+        hashed_password VARCHAR NOT NULL,
+        role VARCHAR NOT NULL,
+        PRIMARY KEY (id),
+        UNIQUE (username),
+        UNIQUE (email)
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_users_id ON users (id)",
+    """CREATE TABLE IF NOT EXISTS projects (
+        id SERIAL NOT NULL,
+        title VARCHAR NOT NULL,
+        description TEXT NOT NULL,
+        client_id INTEGER,
+        assigned_contractor_id INTEGER,
+        status VARCHAR,
+        close_requested BOOLEAN,
+        create_time TIMESTAMP WITHOUT TIME ZONE,
+        close_time TIMESTAMP WITHOUT TIME ZONE,
+        close_explanation TEXT,
+        proposal_deadline TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY(client_id) REFERENCES users (id),
+        FOREIGN KEY(assigned_contractor_id) REFERENCES users (id)
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_projects_id ON projects (id)",
+    """CREATE TABLE IF NOT EXISTS project_rejections (
+        id SERIAL NOT NULL,
+        project_id INTEGER,
+        rejection_date TIMESTAMP WITHOUT TIME ZONE,
+        explanation TEXT,
+        PRIMARY KEY (id),
+        FOREIGN KEY(project_id) REFERENCES projects (id)
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_project_rejections_id ON project_rejections (id)",
+    """CREATE TABLE IF NOT EXISTS bids (
+        id SERIAL NOT NULL,
+        project_id INTEGER,
+        contractor_id INTEGER,
+        price FLOAT NOT NULL,
+        proposal_file VARCHAR,
+        status VARCHAR,
+        PRIMARY KEY (id),
+        FOREIGN KEY(project_id) REFERENCES projects (id),
+        FOREIGN KEY(contractor_id) REFERENCES users (id)
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_bids_id ON bids (id)",
+    """CREATE TABLE IF NOT EXISTS project_files (
+        id SERIAL NOT NULL,
+        project_id INTEGER NOT NULL,
+        stage VARCHAR NOT NULL,
+        folder VARCHAR NOT NULL,
+        filename VARCHAR NOT NULL,
+        size BIGINT NOT NULL,
+        sha256 VARCHAR(64) NOT NULL,
+        uploader_id INTEGER,
+        upload_time TIMESTAMP WITHOUT TIME ZONE,
+        PRIMARY KEY (id),
+        CONSTRAINT uq_project_files_path UNIQUE (project_id, stage, folder, filename),
+        FOREIGN KEY(project_id) REFERENCES projects (id),
+        FOREIGN KEY(uploader_id) REFERENCES users (id)
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_project_files_id ON project_files (id)",
+]
+
+def upgrade(conn):
+    for statement in STATEMENTS:
+        conn.exec_driver_sql(statement)
@@ -0,0 +1,17 @@
+# projects 加上列表卡片快取版本(version)與全文檢索向量(search_vector)及其 GIN 索引
+# search_vector 是 STORED 的 generated column，加入時會重寫整張 projects 資料表
+# 產生運算式固定在這裡(與加入時的 models._search_document 相同)，之後修改 models 不會改變這個 migration
+
+# 中日韓文字範圍；這些文字之間沒有空白，建索引時每個字各自成為一個詞彙
+SEARCH_CJK_PATTERN = r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]"
+
+def _search_document(column, weight):
+    return f"setweight(to_tsvector('simple', regexp_replace(coalesce({column}, ''), '({SEARCH_CJK_PATTERN})', ' \\1 ', 'g')), '{weight}')"
+
+def upgrade(conn):
+    conn.exec_driver_sql("ALTER TABLE projects ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 0")
+    conn.exec_driver_sql(
+        "ALTER TABLE projects ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS ({_search_document('title', 'A')} || {_search_document('description', 'B')}) STORED"
+    )
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_projects_search_vector ON projects USING gin (search_vector)")
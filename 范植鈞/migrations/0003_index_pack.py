@@ -0,0 +1,25 @@
+# 各列表與外鍵查詢用的索引，以 CONCURRENTLY 建立，不會鎖住寫入
+# - 可承接列表(依截止日排序)與截止排程只看 open 專案: 部分索引 (proposal_deadline, id) WHERE status = 'open'，
+#   取代原本的 (status, proposal_deadline, id)；依最新排序沿用 (status, create_time, id)
+# - 既有資料庫補上 create_all 時代沒有的列表索引
+# - 外鍵欄位: 依專案讀取報價、退件紀錄，以及刪除專案或使用者時的外鍵檢查
+from migrate import create_index_concurrently
+
+TRANSACTIONAL = False
+
+INDEXES = {
+    "ix_projects_open_deadline": "ON projects (proposal_deadline, id) WHERE status = 'open'",
+    "ix_projects_status_create_time": "ON projects (status, create_time, id)",
+    "ix_projects_client_create_time": "ON projects (client_id, create_time, id)",
+    "ix_projects_assigned_contractor": "ON projects (assigned_contractor_id) WHERE assigned_contractor_id IS NOT NULL",
+    "ix_bids_contractor_project": "ON bids (contractor_id, project_id)",
+    "ix_bids_project": "ON bids (project_id)",
+    "ix_project_rejections_project_date": "ON project_rejections (project_id, rejection_date)",
+    "ix_project_files_uploader": "ON project_files (uploader_id) WHERE uploader_id IS NOT NULL",
+}
+
+def upgrade(conn):
+    for name, definition in INDEXES.items():
+        create_index_concurrently(conn, name, definition)
+    conn.exec_driver_sql("DROP INDEX CONCURRENTLY IF EXISTS ix_projects_status_deadline")
+    conn.exec_driver_sql("ANALYZE projects, bids, project_rejections, project_files")
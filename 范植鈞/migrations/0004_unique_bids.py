@@ -0,0 +1,25 @@
+# bids 加上 UNIQUE (project_id, contractor_id)，報價以 INSERT ... ON CONFLICT DO NOTHING 寫入
+# 先刪除同時送出造成的重複報價(保留已被接受的，其次是最早的一筆)，再以 CONCURRENTLY 建唯一索引並轉為約束
+# 唯一索引以 project_id 開頭，可取代 ix_bids_project
+from sqlalchemy import text
+from migrate import create_index_concurrently
+
+TRANSACTIONAL = False
+
+def upgrade(conn):
+    exists = conn.scalar(text("SELECT 1 FROM pg_constraint WHERE conname = 'uq_bids_project_contractor'"))
+    if not exists:
+        conn.exec_driver_sql("""
+            DELETE FROM bids WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, row_number() OVER (
+                        PARTITION BY project_id, contractor_id ORDER BY (status = 'accepted') DESC, id
+                    ) AS n
+                    FROM bids
+                ) AS ranked
+                WHERE n > 1
+            )
+        """)
+        create_index_concurrently(conn, "uq_bids_project_contractor", "ON bids (project_id, contractor_id)", unique=True)
+        conn.exec_driver_sql("ALTER TABLE bids ADD CONSTRAINT uq_bids_project_contractor UNIQUE USING INDEX uq_bids_project_contractor")
+    conn.exec_driver_sql("DROP INDEX CONCURRENTLY IF EXISTS ix_bids_project")
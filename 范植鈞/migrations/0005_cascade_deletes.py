@@ -0,0 +1,34 @@
+# 外鍵加上 ON DELETE: 刪除使用者或專案時由資料庫一併刪除報價、退件紀錄與檔案清單(CASCADE)，
+# 被指派的接案人與上傳者刪除時改為 NULL(SET NULL)；ORM 關聯設定 passive_deletes，不再先載入關聯資料
+# 以 autocommit 逐條執行: 每張表的 DROP + ADD ... NOT VALID 是一條語句(短暫鎖表)，之後的 VALIDATE 驗證既有資料時不會擋住寫入
+from sqlalchemy import text
+
+TRANSACTIONAL = False
+
+# (資料表, 欄位, 參照的資料表, ON DELETE)
+FOREIGN_KEYS = [
+    ("projects", "client_id", "users", "CASCADE"),
+    ("projects", "assigned_contractor_id", "users", "SET NULL"),
+    ("bids", "project_id", "projects", "CASCADE"),
+    ("bids", "contractor_id", "users", "CASCADE"),
+    ("project_rejections", "project_id", "projects", "CASCADE"),
+    ("project_files", "project_id", "projects", "CASCADE"),
+    ("project_files", "uploader_id", "users", "SET NULL"),
+]
+
+def _constraint_names(conn, table, column):
+    return list(conn.scalars(text("""
+        SELECT con.conname FROM pg_constraint con
+        JOIN pg_attribute att ON att.attrelid = con.conrelid AND att.attnum = ANY (con.conkey)
+        WHERE con.contype = 'f' AND con.conrelid = CAST(:table AS regclass) AND att.attname = :column
+    """), {"table": table, "column": column}))
+
+def upgrade(conn):
+    for table, column, referred, on_delete in FOREIGN_KEYS:
+        name = f"{table}_{column}_fkey"
+        drops = "".join(f"DROP CONSTRAINT {existing}, " for existing in _constraint_names(conn, table, column))
+        conn.exec_driver_sql(
+            f"ALTER TABLE {table} {drops}ADD CONSTRAINT {name} FOREIGN KEY ({column}) "
+            f"REFERENCES {referred} (id) ON DELETE {on_delete} NOT VALID"
+        )
+        conn.exec_driver_sql(f"ALTER TABLE {table} VALIDATE CONSTRAINT {name}")
@@ -0,0 +1,25 @@
+# 背景工作佇列資料表 jobs(見 jobs.py)；DDL 固定在這裡，不依賴 models
+
+def upgrade(conn):
+    conn.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id BIGSERIAL NOT NULL,
+            kind VARCHAR NOT NULL,
+            key VARCHAR,
+            payload JSON NOT NULL,
+            status VARCHAR NOT NULL,
+            attempts INTEGER NOT NULL,
+            max_attempts INTEGER NOT NULL,
+            run_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            started_at TIMESTAMP WITHOUT TIME ZONE,
+            finished_at TIMESTAMP WITHOUT TIME ZONE,
+            locked_by VARCHAR,
+            last_error TEXT,
+            PRIMARY KEY (id),
+            UNIQUE (key)
+        )
+    """)
+    # worker 取出下一筆工作；清除舊的已完成工作、找出逾時的工作
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_jobs_ready ON jobs (run_at, id) WHERE status = 'queued'")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_jobs_status_finished ON jobs (status, finished_at)")
@@ -1,8 +1,15 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Float, Text, DateTime
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Float, Text, DateTime, Index, BigInteger, UniqueConstraint, Computed, JSON, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, deferred, query_expression
 from datetime import datetime
 from database import Base
 
+# 全文檢索的中日韓文字範圍；這些文字之間沒有空白，建索引時每個字各自成為一個詞彙
+SEARCH_CJK_PATTERN = r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]"
+
+def _search_document(column, weight):
+    return f"setweight(to_tsvector('simple', regexp_replace(coalesce({column}, ''), '({SEARCH_CJK_PATTERN})', ' \\1 ', 'g')), '{weight}')"
+
 class User(Base):# 使用者屬性
     __tablename__ = "users"
 
@@ -13,21 +20,26 @@ class User(Base):# 使用者屬性
     role = Column(String, nullable=False)# client or conctractor
 
     # 如果是委託人建立的專案
-    client_projects = relationship("Project", back_populates="client", foreign_keys="Project.client_id")
+    # 刪除帳號時由資料庫的 ON DELETE 處理關聯資料(passive_deletes: 不先把專案載入記憶體)
+    client_projects = relationship("Project", back_populates="client", foreign_keys="Project.client_id", cascade="all, delete", passive_deletes=True)
 
     # 如果是接案人承接的專案
-    contractor_projects = relationship("Project", back_populates="contractor", foreign_keys="Project.assigned_contractor_id")
+    contractor_projects = relationship("Project", back_populates="contractor", foreign_keys="Project.assigned_contractor_id", passive_deletes=True)
 
 class Project(Base):# 專案屬性
     __tablename__ = "projects"
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
     description = Column(Text, nullable=False)
-    client_id = Column(Integer, ForeignKey("users.id"))
-    assigned_contractor_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    client_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
+    assigned_contractor_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
 
     status = Column(String, default="open")# open(未承包) or in_process(進行中) or closed(結案) or noBid(不可報價)
     close_requested = Column(Boolean, default=False)# 是否已請求結案
+    version = Column(Integer, nullable=False, default=0, server_default="0")# 列表卡片快取版本，報價、指派、狀態改變時遞增
+    # 全文檢索向量，由資料庫依標題(權重 A)與描述(權重 B)產生；一般查詢不載入
+    search_vector = deferred(Column(TSVECTOR, Computed(f"{_search_document('title', 'A')} || {_search_document('description', 'B')}", persisted=True)))
+    search_rank = query_expression()# 搜尋時的相關度，由 search.py 以 with_expression 填入
 
     create_time = Column(DateTime, default=datetime.now)
     close_time = Column(DateTime, nullable=True)
@@ -38,28 +50,98 @@ class Project(Base):# 專案屬性
     #定義資料表之間的關係
     client = relationship("User", foreign_keys=[client_id])
     contractor = relationship("User", foreign_keys=[assigned_contractor_id])
-    bids = relationship("Bid", back_populates="project")
-    rejections = relationship("ProjectRejection", back_populates="project", order_by="ProjectRejection.rejection_date.desc()")
+    # 刪除專案時報價、退件紀錄與檔案清單由資料庫一併刪除
+    bids = relationship("Bid", back_populates="project", cascade="all, delete", passive_deletes=True)
+    rejections = relationship("ProjectRejection", back_populates="project", order_by="ProjectRejection.rejection_date.desc()", cascade="all, delete", passive_deletes=True)
+    files = relationship("ProjectFile", back_populates="project", cascade="all, delete", passive_deletes=True)
+
+    __table_args__ = (
+        # 可承接列表(依截止日排序)與截止排程只看 open 專案，用部分索引
+        Index("ix_projects_open_deadline", "proposal_deadline", "id", postgresql_where=text("status = 'open'")),
+        # 列表頁 keyset 分頁: (篩選欄位, 排序欄位, id)
+        Index("ix_projects_status_create_time", "status", "create_time", "id"),
+        Index("ix_projects_client_create_time", "client_id", "create_time", "id"),
+        Index("ix_projects_assigned_contractor", "assigned_contractor_id", postgresql_where=text("assigned_contractor_id IS NOT NULL")),
+        Index("ix_projects_search_vector", "search_vector", postgresql_using="gin"),
+    )
 
 class ProjectRejection(Base):
     __tablename__ = "project_rejections"
     id = Column(Integer, primary_key=True, index=True)
-    project_id = Column(Integer, ForeignKey("projects.id"))
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"))
     rejection_date = Column(DateTime, default=datetime.now)
     explanation = Column(Text)
 
     #定義資料表之間的關係
     project = relationship("Project", back_populates="rejections")
 
+    __table_args__ = (
+        # 依專案讀取最近的退件紀錄
+        Index("ix_project_rejections_project_date", "project_id", "rejection_date"),
+    )
+
 class Bid(Base):
     __tablename__ = "bids"
     id = Column(Integer, primary_key=True, index=True)
-    project_id = Column(Integer, ForeignKey("projects.id"))
-    contractor_id = Column(Integer, ForeignKey("users.id"))
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"))
+    contractor_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
     price = Column(Float, nullable=False)
     proposal_file = Column(String, nullable=True)
     status = Column(String, default="pending")# pending(接受報價) or accept(同意報價) or rejected(拒絕報價)
 
     #定義資料表之間的關係
     project = relationship("Project", back_populates="bids")
-    contractor = relationship("User")
\ No newline at end of file
+    contractor = relationship("User")
+
+    __table_args__ = (
+        # 我的報價列表以 contractor_id 篩選再連到專案
+        Index("ix_bids_contractor_project", "contractor_id", "project_id"),
+        # 每個接案人對同一專案只能報價一次；也是依專案讀取報價(委託人列表、指派、刪除專案)用的索引
+        UniqueConstraint("project_id", "contractor_id", name="uq_bids_project_contractor"),
+    )
+
+class ProjectFile(Base):# 專案上傳檔案清單，管理頁面直接查詢，不需讀取檔案系統
+    __tablename__ = "project_files"
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    stage = Column(String, nullable=False)# in_process(進度) or final(結案) or rejected(被退件)
+    folder = Column(String, nullable=False)# 上傳日期資料夾
+    filename = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    sha256 = Column(String(64), nullable=False)
+    uploader_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    upload_time = Column(DateTime, default=datetime.now)
+
+    #定義資料表之間的關係
+    project = relationship("Project", back_populates="files")
+    uploader = relationship("User")
+
+    __table_args__ = (
+        # 同一資料夾同名檔案會覆蓋，只保留一筆；也是管理頁面查詢用的索引
+        UniqueConstraint("project_id", "stage", "folder", "filename", name="uq_project_files_path"),
+        # 刪除使用者時的外鍵檢查
+        Index("ix_project_files_uploader", "uploader_id", postgresql_where=text("uploader_id IS NOT NULL")),
+    )
+
+class Job(Base):# 背景工作佇列，由 jobs.py 的 worker 取出執行
+    __tablename__ = "jobs"
+    id = Column(BigInteger, primary_key=True)
+    kind = Column(String, nullable=False)
+    key = Column(String, unique=True, nullable=True)# 相同 key 的工作只建立一次
+    payload = Column(JSON, nullable=False)
+    status = Column(String, nullable=False, default="queued")# queued / running / done / failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    run_at = Column(DateTime, nullable=False)# 最早可執行的時間，重試時往後延
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    locked_by = Column(String, nullable=True)
+    last_error = Column(Text, nullable=True)
+
+    __table_args__ = (
+        # worker 取出下一筆工作
+        Index("ix_jobs_ready", "run_at", "id", postgresql_where=text("status = 'queued'")),
+        # 清除舊的已完成工作、找出逾時的工作
+        Index("ix_jobs_status_finished", "status", "finished_at"),
+    )
@@ -0,0 +1,206 @@
+# page_cache.py
+# 公開列表頁的資料快取: 可承接專案列表對每個使用者都相同，只快取專案欄位；報價因檢視者而異(且不應寫進共用快取)，由各請求另外查詢
+# 以 (namespace, 世代, 篩選條件, 游標) 為 key；建立專案、報價、指派、刪除與截止排程會呼叫 invalidate() 遞增世代，舊 key 不會再被讀到
+# PAGE_CACHE_BACKEND: memory(每個 worker 各自的 LRU)、sqlite(同一台機器的多個 worker 共用快取與世代，失效會立即同步)
+# memory 模式下其他 worker 的失效要等 PAGE_CACHE_TTL 到期；TTL 到期後同一個 key 只有一個請求重新查詢，其他請求先回傳舊資料(stale serve)
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+PAGE_CACHE_BACKEND = os.getenv("PAGE_CACHE_BACKEND", "memory")
+# 快取資料的有效秒數，0 代表停用快取
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", "30"))
+# TTL 到期後，正在重新查詢期間最多還能回傳舊資料幾秒
+PAGE_CACHE_STALE_SECONDS = float(os.getenv("PAGE_CACHE_STALE_SECONDS", "10"))
+PAGE_CACHE_MAX_ENTRIES = int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "1000"))
+PAGE_CACHE_SQLITE_PATH = os.getenv("PAGE_CACHE_SQLITE_PATH", "page_cache.sqlite3")
+
+AVAILABLE_PROJECTS = "available-projects"
+
+_lock = threading.Lock()
+stats = {"hits": 0, "misses": 0, "stale_serves": 0, "invalidations": 0}
+# 正在重新查詢的 key(每個 worker)
+_refreshing = set()
+
+class MemoryPageStore:
+    blocking = False
+
+    def __init__(self, max_entries=PAGE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._generations = {}
+
+    def generation(self, namespace):
+        return self._generations.get(namespace, 0)
+
+    def bump(self, namespace):
+        with _lock:
+            self._generations[namespace] = self.generation(namespace) + 1
+            for key in [key for key in self._data if key.startswith(namespace + ":")]:
+                del self._data[key]
+
+    def load(self, key):
+        """回傳 (內容 JSON, 寫入時間, 內容失效時間) 或 None"""
+        with _lock:
+            item = self._data.get(key)
+            if item is not None:
+                self._data.move_to_end(key)
+            return item
+
+    def save(self, key, data, stored_at, expires):
+        with _lock:
+            self._data[key] = (data, stored_at, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+class SQLitePageStore:
+    blocking = True
+
+    def __init__(self, path=PAGE_CACHE_SQLITE_PATH, max_entries=PAGE_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS pages (key TEXT PRIMARY KEY, data TEXT NOT NULL, stored_at REAL NOT NULL, expires REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_pages_stored_at ON pages (stored_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS generations (namespace TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def _connect(self):
+        # 每個 thread 一條連線；WAL 讓多個 worker 可以同時讀
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def generation(self, namespace):
+        row = self._connect().execute("SELECT value FROM generations WHERE namespace = ?", (namespace,)).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, namespace):
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO generations (namespace, value) VALUES (?, 1) "
+            "ON CONFLICT(namespace) DO UPDATE SET value = value + 1",
+            (namespace,),
+        )
+        conn.execute("DELETE FROM pages WHERE key LIKE ?", (namespace + ":%",))
+
+    def load(self, key):
+        return self._connect().execute("SELECT data, stored_at, expires FROM pages WHERE key = ?", (key,)).fetchone()
+
+    def save(self, key, data, stored_at, expires):
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO pages (key, data, stored_at, expires) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET data = excluded.data, stored_at = excluded.stored_at, expires = excluded.expires",
+            (key, data, stored_at, expires),
+        )
+        # 超過上限時刪掉最舊的
+        conn.execute(
+            "DELETE FROM pages WHERE key IN (SELECT key FROM pages ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def __len__(self):
+        return self._connect().execute("SELECT count(*) FROM pages").fetchone()[0]
+
+def create_store(backend=PAGE_CACHE_BACKEND):
+    if backend == "sqlite":
+        return SQLitePageStore()
+    return MemoryPageStore()
+
+store = create_store()
+
+def _count(name):
+    with _lock:
+        stats[name] += 1
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    raise TypeError(f"無法序列化 {type(value).__name__}")
+
+def _decode(obj):
+    if "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+def invalidate(namespace):
+    """資料變動並 commit 之後呼叫；遞增世代，之後的請求都會重新查詢"""
+    store.bump(namespace)
+    _count("invalidations")
+
+async def ainvalidate(namespace):
+    if store.blocking:
+        await asyncio.to_thread(invalidate, namespace)
+    else:
+        invalidate(namespace)
+
+def _lookup(namespace, parts):
+    generation = store.generation(namespace)
+    key = f"{namespace}:{generation}:" + json.dumps(parts, default=str)
+    return key, store.load(key)
+
+async def get_or_load(namespace, parts, loader):
+    """以 parts(篩選條件、游標等)查快取，未命中時 await loader()
+    loader 回傳 (可 JSON 序列化的資料, 資料失效時間 datetime 或 None)，例如頁面上最早的報價截止時間"""
+    if PAGE_CACHE_TTL <= 0:
+        return (await loader())[0]
+    if store.blocking:
+        key, item = await asyncio.to_thread(_lookup, namespace, parts)
+    else:
+        key, item = _lookup(namespace, parts)
+
+    now = time.time()
+    if item is not None:
+        data, stored_at, expires = item
+        if now < expires:
+            age = now - stored_at
+            if age < PAGE_CACHE_TTL:
+                _count("hits")
+                return json.loads(data, object_hook=_decode)
+            # TTL 到期: 已有其他請求在重新查詢時先回傳舊資料
+            if age < PAGE_CACHE_TTL + PAGE_CACHE_STALE_SECONDS and key in _refreshing:
+                _count("stale_serves")
+                return json.loads(data, object_hook=_decode)
+
+    _count("misses")
+    _refreshing.add(key)
+    try:
+        value, valid_until = await loader()
+        expires = now + PAGE_CACHE_TTL + PAGE_CACHE_STALE_SECONDS
+        if valid_until is not None:
+            expires = min(expires, valid_until.timestamp())
+        data = json.dumps(value, default=_encode, ensure_ascii=False)
+        # key 含查詢前的世代，查詢期間若被 invalidate，存下的資料不會再被讀到
+        if store.blocking:
+            await asyncio.to_thread(store.save, key, data, now, expires)
+        else:
+            store.save(key, data, now, expires)
+    finally:
+        _refreshing.discard(key)
+    return value
+
+def cache_status():
+    with _lock:
+        snapshot = dict(stats)
+    lookups = snapshot["hits"] + snapshot["misses"] + snapshot["stale_serves"]
+    return {
+        **snapshot,
+        "hit_ratio": round((snapshot["hits"] + snapshot["stale_serves"]) / lookups, 4) if lookups else 0.0,
+        "entries": len(store),
+        "backend": PAGE_CACHE_BACKEND,
+        "ttl_seconds": PAGE_CACHE_TTL,
+    }
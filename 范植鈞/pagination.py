@@ -0,0 +1,73 @@
+# pagination.py
+# 專案列表的 keyset 分頁: 以 (排序欄位, id) 作為游標，不使用 OFFSET，頁數再深查詢成本也固定
+import base64
+import json
+import os
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy import tuple_, literal, Float
+import models
+
+# 每頁專案數
+PROJECT_PAGE_SIZE = int(os.getenv("PROJECT_PAGE_SIZE", "20"))
+
+# 排序選項: 名稱 -> (排序欄位, 是否遞減)
+SORTS = {
+    "newest": (models.Project.create_time, True),
+    "deadline": (models.Project.proposal_deadline, False),
+}
+# 搜尋結果依相關度排序，排序欄位是每次查詢的 rank 運算式，值存在 Project.search_rank
+RELEVANCE = "relevance"
+
+def encode_cursor(project, sort):
+    if sort == RELEVANCE:
+        value = project.search_rank
+    else:
+        column, _ = SORTS[sort]
+        value = getattr(project, column.key).isoformat()
+    raw = json.dumps([value, project.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor, sort="newest"):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, project_id = json.loads(raw)
+        value = float(value) if sort == RELEVANCE else datetime.fromisoformat(value)
+        return value, int(project_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="無效的分頁參數")
+
+def paginate(stmt, sort="newest", after=None, before=None, page_size=PROJECT_PAGE_SIZE, rank=None):
+    """替 select(Project) 加上游標條件、排序與 limit；回傳的查詢會多取一筆用來判斷是否還有下一頁
+    sort 為 relevance 時以 rank 運算式(遞減)排序"""
+    if sort == RELEVANCE and rank is not None:
+        column, descending = rank, True
+    elif sort in SORTS:
+        column, descending = SORTS[sort]
+    else:
+        raise HTTPException(status_code=400, detail="無效的排序方式")
+    key = tuple_(column, models.Project.id)
+
+    # 往前翻頁時反向排序，取出後再反轉回來
+    ascending = descending == bool(before)
+    cursor = before or after
+    if cursor:
+        value, project_id = decode_cursor(cursor, sort)
+        bound = tuple_(literal(value, Float) if sort == RELEVANCE else value, project_id)
+        stmt = stmt.filter(key > bound if ascending else key < bound)
+    order = (column.asc(), models.Project.id.asc()) if ascending else (column.desc(), models.Project.id.desc())
+    return stmt.order_by(*order).limit(page_size + 1)
+
+def make_page(projects, sort="newest", after=None, before=None, page_size=PROJECT_PAGE_SIZE):
+    """把 paginate() 查出的資料切成一頁，回傳 (本頁專案, {"next": 游標, "prev": 游標})"""
+    projects = list(projects)
+    has_more = len(projects) > page_size
+    projects = projects[:page_size]
+    if before:
+        projects.reverse()
+        next_cursor = encode_cursor(projects[-1], sort) if projects else None
+        prev_cursor = encode_cursor(projects[0], sort) if has_more else None
+    else:
+        next_cursor = encode_cursor(projects[-1], sort) if has_more else None
+        prev_cursor = encode_cursor(projects[0], sort) if after and projects else None
+    return projects, {"next": next_cursor, "prev": prev_cursor, "sort": sort}
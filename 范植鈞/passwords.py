@@ -0,0 +1,63 @@
+# passwords.py
+# bcrypt 計算很吃 CPU，放到獨立的 process pool 執行，避免卡住 event loop
+# 此模組不 import 資料庫或 FastAPI，spawn 出來的子行程只需要載入這裡
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from passlib.context import CryptContext
+
+# bcrypt cost，調整後舊密碼會在下次登入時自動重新雜湊
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# 負責雜湊的子行程數
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+# 同時排隊等待雜湊的請求上限，超過的請求在 event loop 上等待
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", str(PASSWORD_HASH_WORKERS * 4)))
+
+# min/max 與 default 相同，cost 不同的舊雜湊會被判定需要更新
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+_pool = None
+_slots = None
+
+def hash_password(password):
+    return pwd_context.hash(password)
+
+def verify_password(plain, hashed):
+    return pwd_context.verify(plain, hashed)
+
+def verify_and_update(plain, hashed):
+    """回傳 (是否正確, 新雜湊或 None)"""
+    return pwd_context.verify_and_update(plain, hashed)
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        # 明確使用 spawn: Linux 預設的 fork 會複製正在執行 event loop、連線池 thread 與 socket 的行程
+        _pool = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+async def _run(fn, *args):
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(PASSWORD_HASH_QUEUE)
+    async with _slots:
+        return await asyncio.get_running_loop().run_in_executor(_get_pool(), fn, *args)
+
+async def hash_password_async(password):
+    return await _run(hash_password, password)
+
+async def verify_and_update_async(plain, hashed):
+    return await _run(verify_and_update, plain, hashed)
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,146 @@
+# project_files.py
+# 專案上傳檔案清單(ProjectFile)的讀寫，以及從磁碟重建清單的指令
+# 用法: python project_files.py reconcile [--project-id 1]
+import argparse
+import os
+from datetime import datetime
+from sqlalchemy import select, update, delete, func
+from blobstore import hash_file
+import jobs
+import models
+
+UPLOAD_ROOT = "upload_file"
+STAGES = ("in_process", "final", "rejected")
+
+async def record_project_file(db, project_id, stage, folder, filename, size, digest, uploader_id):
+    """新增或更新一筆檔案紀錄(同資料夾同名檔案會被覆蓋)，由呼叫端 commit"""
+    project_file = await db.scalar(select(models.ProjectFile).filter(
+        models.ProjectFile.project_id == project_id,
+        models.ProjectFile.stage == stage,
+        models.ProjectFile.folder == folder,
+        models.ProjectFile.filename == filename,
+    ))
+    if project_file is None:
+        project_file = models.ProjectFile(project_id=project_id, stage=stage, folder=folder, filename=filename)
+        db.add(project_file)
+    project_file.size = size
+    project_file.sha256 = digest
+    project_file.uploader_id = uploader_id
+    project_file.upload_time = datetime.now()
+    return project_file
+
+async def load_stage_files(db, project_id):
+    """一次查出進度與結案檔案，回傳 (in_process_data, final_data)，格式為 {日期資料夾: [檔名]}"""
+    result = await db.execute(
+        select(models.ProjectFile.stage, models.ProjectFile.folder, models.ProjectFile.filename)
+        .filter(models.ProjectFile.project_id == project_id, models.ProjectFile.stage.in_(("in_process", "final")))
+        .order_by(models.ProjectFile.stage, models.ProjectFile.folder, models.ProjectFile.filename)
+    )
+    data = {"in_process": {}, "final": {}}
+    for stage, folder, filename in result:
+        data[stage].setdefault(folder, []).append(filename)
+    return data["in_process"], data["final"]
+
+async def reject_latest_final(db, project, rejected_at):
+    """把最新的結案資料夾標為被退件，並排入移到 rejected 的背景工作，由呼叫端 commit；回傳退件資料夾名稱
+    同一個結案資料夾可能被退件不只一次，退件資料夾名稱與工作 key 都加上退件時間(rejected_at)"""
+    folder = await db.scalar(
+        select(func.max(models.ProjectFile.folder))
+        .filter(models.ProjectFile.project_id == project.id, models.ProjectFile.stage == "final")
+    )
+    if folder is None:
+        return None
+    rejected_folder = f"{folder}_{rejected_at:%Y-%m-%d_%H-%M-%S-%f}"
+    # 退件資料夾裡已有的紀錄(不應發生)先刪除，避免違反 uq_project_files_path
+    await db.execute(delete(models.ProjectFile).where(
+        models.ProjectFile.project_id == project.id, models.ProjectFile.stage == "rejected", models.ProjectFile.folder == rejected_folder,
+    ))
+    rejected = await db.execute(
+        update(models.ProjectFile)
+        .where(models.ProjectFile.project_id == project.id, models.ProjectFile.stage == "final", models.ProjectFile.folder == folder)
+        .values(stage="rejected", folder=rejected_folder)
+        .returning(models.ProjectFile.filename, models.ProjectFile.sha256)
+    )
+    # 只搬被退件的檔案(以雜湊確認)；同一分鐘內重新上傳的結案檔案會放進同名資料夾，不能整個搬走
+    base_dir = os.path.join(UPLOAD_ROOT, project.title)
+    await jobs.aenqueue(db, "move_files", {
+        "src": os.path.join(base_dir, "final", folder),
+        "dest": os.path.join(base_dir, "rejected", rejected_folder),
+        "files": dict(rejected.all()),
+    }, key=f"reject:{project.id}:{rejected_folder}")
+    return rejected_folder
+
+def owned_paths(db, project):
+    """專案自己的計劃書資料夾(Bid.proposal_file)與上傳檔案路徑；資料夾以專案名稱命名，同名的其他專案也參照的路徑不列入"""
+    paths = set(db.scalars(
+        select(models.Bid.proposal_file).filter(models.Bid.project_id == project.id, models.Bid.proposal_file.isnot(None))
+    ))
+    rows = select(models.ProjectFile.project_id, models.ProjectFile.stage, models.ProjectFile.folder, models.ProjectFile.filename)
+    namesakes = select(models.Project.id).filter(models.Project.title == project.title, models.Project.id != project.id)
+    paths.update(
+        os.path.join(UPLOAD_ROOT, project.title, stage, folder, filename)
+        for _, stage, folder, filename in db.execute(rows.filter(models.ProjectFile.project_id == project.id))
+    )
+    shared = set(db.scalars(
+        select(models.Bid.proposal_file).filter(models.Bid.project_id.in_(namesakes), models.Bid.proposal_file.in_(paths))
+    ))
+    shared.update(
+        os.path.join(UPLOAD_ROOT, project.title, stage, folder, filename)
+        for _, stage, folder, filename in db.execute(rows.filter(models.ProjectFile.project_id.in_(namesakes)))
+    )
+    return sorted(paths - shared)
+
+def reconcile_project(db, project):
+    """以磁碟上的 upload_file/{title} 為準，重建該專案的檔案紀錄，回傳檔案數"""
+    existing = {
+        (f.stage, f.folder, f.filename): f
+        for f in db.query(models.ProjectFile).filter(models.ProjectFile.project_id == project.id)
+    }
+    seen = set()
+    base_dir = os.path.join(UPLOAD_ROOT, project.title)
+    for stage in STAGES:
+        stage_dir = os.path.join(base_dir, stage)
+        if not os.path.isdir(stage_dir):
+            continue
+        for folder in os.listdir(stage_dir):
+            folder_path = os.path.join(stage_dir, folder)
+            if not os.path.isdir(folder_path):
+                continue
+            for filename in os.listdir(folder_path):
+                file_path = os.path.join(folder_path, filename)
+                if filename.startswith(".") or not os.path.isfile(file_path):
+                    continue
+                key = (stage, folder, filename)
+                seen.add(key)
+                project_file = existing.get(key)
+                if project_file is None:
+                    project_file = models.ProjectFile(
+                        project_id=project.id, stage=stage, folder=folder, filename=filename,
+                        uploader_id=project.assigned_contractor_id,
+                        upload_time=datetime.fromtimestamp(os.path.getmtime(file_path)),
+                    )
+                    db.add(project_file)
+                project_file.size = os.path.getsize(file_path)
+                project_file.sha256 = hash_file(file_path)
+    for key, project_file in existing.items():
+        if key not in seen:
+            db.delete(project_file)
+    db.commit()
+    return len(seen)
+
+def reconcile(project_id=None):
+    from database import SessionLocal
+    with SessionLocal() as db:
+        query = db.query(models.Project)
+        if project_id is not None:
+            query = query.filter(models.Project.id == project_id)
+        for project in query.all():
+            count = reconcile_project(db, project)
+            print(f"專案 {project.id} ({project.title}): {count} 個檔案")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["reconcile"])
+    parser.add_argument("--project-id", type=int)
+    args = parser.parse_args()
+    reconcile(args.project_id)
@@ -0,0 +1,196 @@
+# resumable.py
+# 可續傳的分段上傳(仿 tus 協定): 建立上傳工作階段後以 PATCH 依 offset 送出各段，中斷後查詢 offset 接續，全部收齊再放進專案資料夾
+# 每段寫成 parts/{起點}-{終點} 的獨立檔案，不同段可平行上傳；連線中斷時已收到的部分仍會保留
+# 用法: python resumable.py gc
+import argparse
+import base64
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+import blobstore
+
+# 工作階段存放位置，需與 BLOB_ROOT 在同一個檔案系統，組合完成的檔案才能直接 rename 成 blob
+RESUMABLE_DIR = os.getenv("RESUMABLE_DIR", "upload_sessions")
+# 超過這段時間(秒)沒有收到任何資料的工作階段會被回收
+RESUMABLE_EXPIRE_SECONDS = int(os.getenv("RESUMABLE_EXPIRE_SECONDS", str(24 * 60 * 60)))
+RESUMABLE_CHUNK_SIZE = 1024 * 1024
+
+_PART_NAME = re.compile(r"(\d{16})-(\d{16})")
+
+class SessionNotFound(Exception):
+    pass
+
+class UploadIncomplete(Exception):
+    pass
+
+def parse_metadata(header):
+    """解析 tus 的 Upload-Metadata 標頭，格式為以逗號分隔的 key 與 base64 值"""
+    metadata = {}
+    for pair in filter(None, (item.strip() for item in (header or "").split(","))):
+        key, _, value = pair.partition(" ")
+        try:
+            metadata[key] = base64.b64decode(value).decode("utf-8")
+        except (ValueError, UnicodeDecodeError):
+            raise ValueError(f"Upload-Metadata 格式錯誤: {key}")
+    return metadata
+
+def _session_dir(upload_id):
+    if not re.fullmatch(r"[0-9a-f]{32}", upload_id):
+        raise SessionNotFound()
+    return os.path.join(RESUMABLE_DIR, upload_id)
+
+def create(user_id, project_id, stage, filename, length):
+    """建立工作階段，回傳 upload_id"""
+    upload_id = uuid.uuid4().hex
+    session_dir = _session_dir(upload_id)
+    os.makedirs(os.path.join(session_dir, "parts"))
+    info = {
+        "user_id": user_id,
+        "project_id": project_id,
+        "stage": stage,
+        "filename": os.path.basename(filename),
+        "length": length,
+        "created": time.time(),
+    }
+    with open(os.path.join(session_dir, "info.json"), "w", encoding="utf-8") as f:
+        json.dump(info, f, ensure_ascii=False)
+    return upload_id
+
+def load(upload_id):
+    try:
+        with open(os.path.join(_session_dir(upload_id), "info.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise SessionNotFound()
+
+def received_ranges(upload_id):
+    """已收到的位元組區間(合併重疊後)，格式為 [(start, end)]，end 不含"""
+    parts_dir = os.path.join(_session_dir(upload_id), "parts")
+    try:
+        names = os.listdir(parts_dir)
+    except FileNotFoundError:
+        raise SessionNotFound()
+    ranges = []
+    for start, end in sorted((int(m[1]), int(m[2])) for m in map(_PART_NAME.fullmatch, names) if m):
+        if ranges and start <= ranges[-1][1]:
+            ranges[-1] = (ranges[-1][0], max(ranges[-1][1], end))
+        else:
+            ranges.append((start, end))
+    return ranges
+
+def current_offset(upload_id):
+    """從 0 開始連續收到的位元組數，即 tus 的 Upload-Offset"""
+    ranges = received_ranges(upload_id)
+    return ranges[0][1] if ranges and ranges[0][0] == 0 else 0
+
+def _part_path(upload_id, start, end):
+    return os.path.join(_session_dir(upload_id), "parts", f"{start:016d}-{end:016d}")
+
+def open_part(upload_id):
+    """開始寫入一段資料，回傳 (暫存檔路徑, 檔案物件)；寫完後呼叫 close_part"""
+    tmp_path = os.path.join(_session_dir(upload_id), "parts", f".{uuid.uuid4().hex}.part")
+    try:
+        return tmp_path, open(tmp_path, "wb")
+    except FileNotFoundError:
+        raise SessionNotFound()
+
+def close_part(upload_id, offset, tmp_path, out):
+    """關閉暫存檔並依實際寫入長度改名為正式的段落；連線中途斷掉時已寫入的部分也會保留"""
+    out.close()
+    written = os.path.getsize(tmp_path)
+    if written:
+        os.replace(tmp_path, _part_path(upload_id, offset, offset + written))
+    else:
+        os.remove(tmp_path)
+    return written
+
+def _assemble(session_dir, length, dest):
+    """依序串接各段(跳過重疊)寫入 dest，回傳 sha256"""
+    sha256 = hashlib.sha256()
+    position = 0
+    parts_dir = os.path.join(session_dir, "parts")
+    parts = sorted((int(m[1]), int(m[2]), m[0]) for m in map(_PART_NAME.fullmatch, os.listdir(parts_dir)) if m)
+    with open(dest, "wb") as out:
+        for start, end, name in parts:
+            if end <= position:
+                continue
+            if start > position:
+                raise UploadIncomplete()
+            with open(os.path.join(parts_dir, name), "rb") as src:
+                src.seek(position - start)
+                remaining = end - position
+                while remaining:
+                    chunk = src.read(min(RESUMABLE_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise UploadIncomplete()
+                    out.write(chunk)
+                    sha256.update(chunk)
+                    remaining -= len(chunk)
+            position = end
+    if position != length:
+        raise UploadIncomplete()
+    return sha256.hexdigest()
+
+def finalize(upload_id, dest_path):
+    """組合所有段落存進 blobstore，在 dest_path 建立參照並刪除工作階段，回傳 (位元組數, sha256)
+    先把資料夾改名來取得處理權，同時送出的 finalize 只有一個會成功；組合失敗時改回原名以便續傳"""
+    session_dir = _session_dir(upload_id)
+    claimed_dir = os.path.join(RESUMABLE_DIR, f".{upload_id}.finalizing")
+    try:
+        os.rename(session_dir, claimed_dir)
+    except FileNotFoundError:
+        raise SessionNotFound()
+    try:
+        with open(os.path.join(claimed_dir, "info.json"), encoding="utf-8") as f:
+            length = json.load(f)["length"]
+        assembled = os.path.join(claimed_dir, "assembled")
+        digest = _assemble(claimed_dir, length, assembled)
+    except Exception:
+        os.rename(claimed_dir, session_dir)
+        raise
+    blobstore.put_file(assembled, digest, length)
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    blobstore.link_to(digest, dest_path)
+    shutil.rmtree(claimed_dir, ignore_errors=True)
+    return length, digest
+
+def delete(upload_id):
+    session_dir = _session_dir(upload_id)
+    if not os.path.isdir(session_dir):
+        raise SessionNotFound()
+    shutil.rmtree(session_dir, ignore_errors=True)
+
+def _last_activity(session_dir):
+    latest = os.stat(session_dir).st_mtime
+    for root, dirs, files in os.walk(session_dir):
+        for name in files:
+            latest = max(latest, os.stat(os.path.join(root, name)).st_mtime)
+    return latest
+
+def gc_stale(max_age=None):
+    """刪除超過 max_age 秒沒有任何寫入的工作階段(含中途失敗的 finalize)，回傳刪除數"""
+    max_age = RESUMABLE_EXPIRE_SECONDS if max_age is None else max_age
+    if not os.path.isdir(RESUMABLE_DIR):
+        return 0
+    removed = 0
+    deadline = time.time() - max_age
+    for name in os.listdir(RESUMABLE_DIR):
+        session_dir = os.path.join(RESUMABLE_DIR, name)
+        try:
+            if _last_activity(session_dir) < deadline:
+                shutil.rmtree(session_dir)
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["gc"])
+    parser.add_argument("--max-age", type=int, default=None, help="秒數，預設為 RESUMABLE_EXPIRE_SECONDS")
+    args = parser.parse_args()
+    print(f"已刪除 {gc_stale(args.max_age)} 個過期的上傳工作階段")
@@ -0,0 +1,214 @@
+# JSON API(v1): 專案、報價、退件紀錄與上傳檔案，輸出格式沿用 schemas.py
+# 列表皆為 keyset 分頁；fields=id,title,... 只回傳需要的欄位；有安裝 orjson 時以 orjson 序列化
+from fastapi import APIRouter, Depends, HTTPException, Request, Query
+from fastapi.responses import JSONResponse, ORJSONResponse
+from sqlalchemy import select, and_, exists
+from sqlalchemy.orm import aliased
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+import models
+import schemas
+from pagination import paginate, make_page, RELEVANCE
+from search import search_statement, rank_truncated, PROJECT_STATUSES
+from datetime import datetime
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 路由直接回傳 APIResponse，不經過 FastAPI 的 jsonable_encoder；orjson 可直接序列化 datetime，model_dump 不必先轉成字串
+APIResponse = ORJSONResponse if orjson else JSONResponse
+DUMP_MODE = "python" if orjson else "json"
+# 報價、退件、檔案列表每頁筆數上限
+API_MAX_LIMIT = 100
+
+router = APIRouter(prefix="/api/v1", tags=["API"], default_response_class=APIResponse)
+
+def require_user(request: Request):
+    user = request.session.get("user")
+    if not user:
+        raise HTTPException(status_code=401, detail="未登入")
+    return user
+
+def parse_fields(schema, fields, extra=()):
+    """fields 參數轉為 model_dump 的 include；未指定時回傳 None(全部欄位)
+    extra 為 schema 以外、由路由另外加上的欄位(例如搜尋的 rank)"""
+    if not fields:
+        return None
+    selected = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = selected - set(schema.model_fields) - set(extra)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"未知的欄位: {', '.join(sorted(unknown))}")
+    return selected
+
+def dump(schema, rows, include):
+    return [schema.model_validate(row, from_attributes=True).model_dump(mode=DUMP_MODE, include=include) for row in rows]
+
+async def id_page(db, stmt, model, after, limit):
+    """以 id 遞增分頁，回傳 (本頁資料, 下一頁游標)"""
+    limit = max(1, min(limit, API_MAX_LIMIT))
+    if after is not None:
+        stmt = stmt.filter(model.id > after)
+    rows = (await db.scalars(stmt.order_by(model.id).limit(limit + 1))).all()
+    return rows[:limit], (rows[limit - 1].id if len(rows) > limit else None)
+
+async def get_visible_project(db, project_id, user, participants_only=False):
+    """委託人、被指派的接案人可看；報價過的接案人與開放中的專案也可看基本資料"""
+    project = await db.scalar(select(models.Project).filter(models.Project.id == project_id))
+    if not project:
+        raise HTTPException(status_code=404, detail="專案不存在")
+    if user["id"] in (project.client_id, project.assigned_contractor_id):
+        return project
+    if not participants_only and user["role"] == "contractor":
+        if project.status == "open":
+            return project
+        has_bid = await db.scalar(select(exists().where(
+            models.Bid.project_id == project.id, models.Bid.contractor_id == user["id"]
+        )))
+        if has_bid:
+            return project
+    raise HTTPException(status_code=403, detail="無權限檢視此專案")
+
+# GET 目前登入的使用者
+@router.get("/me")
+async def me(request: Request, fields: str = None, db: AsyncSession = Depends(get_async_db)):
+    user = require_user(request)
+    db_user = await db.scalar(select(models.User).filter(models.User.id == user["id"]))
+    if not db_user:
+        raise HTTPException(status_code=404, detail="使用者不存在")
+    return APIResponse(schemas.UserOut.model_validate(db_user, from_attributes=True).model_dump(mode=DUMP_MODE, include=parse_fields(schemas.UserOut, fields)))
+
+# GET 專案列表
+# scope: available(可報價的專案) / mine(委託人: 自己的專案，接案人: 報價過的專案)
+@router.get("/projects")
+async def list_projects(
+        request: Request,
+        scope: str = "available",
+        sort: str = "newest",
+        after: str = None,
+        before: str = None,
+        fields: str = None,
+        db: AsyncSession = Depends(get_async_db)):
+    user = require_user(request)
+    include = parse_fields(schemas.ProjectOut, fields)
+    if scope == "available":
+        stmt = select(models.Project).filter(models.Project.status == "open", models.Project.proposal_deadline >= datetime.now())
+    elif scope == "mine" and user["role"] == "contractor":
+        own_bid = aliased(models.Bid)
+        stmt = select(models.Project).join(own_bid, and_(own_bid.project_id == models.Project.id, own_bid.contractor_id == user["id"]))
+    elif scope == "mine":
+        stmt = select(models.Project).filter(models.Project.client_id == user["id"])
+    else:
+        raise HTTPException(status_code=400, detail="無效的 scope")
+
+    projects = (await db.scalars(paginate(stmt, sort, after, before))).all()
+    projects, pager = make_page(projects, sort, after, before)
+    return APIResponse({"items": dump(schemas.ProjectOut, projects, include), **pager})
+
+# GET 搜尋專案，結果附上相關度 rank
+# 依相關度排序只涵蓋最新的 SEARCH_RANK_CANDIDATES 筆符合結果，超過時 truncated 為 true(改用 newest 排序可看到全部)
+@router.get("/projects/search")
+async def search_projects(
+        request: Request,
+        q: str = "",
+        status: list[str] = Query(None),
+        sort: str = RELEVANCE,
+        after: str = None,
+        before: str = None,
+        fields: str = None,
+        db: AsyncSession = Depends(get_async_db)):
+    user = require_user(request)
+    include = parse_fields(schemas.ProjectOut, fields, extra=("rank",))
+    with_rank = include is None or "rank" in include
+    if include is not None:
+        include.discard("rank")
+    unknown = set(status or []) - set(PROJECT_STATUSES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"未知的狀態: {', '.join(sorted(unknown))}")
+    stmt, rank = search_statement(select(models.Project), q, user, status, ranked=sort == RELEVANCE)
+    if rank is None:
+        return APIResponse({"items": [], "next": None, "prev": None, "sort": sort, "truncated": False})
+
+    projects = (await db.scalars(paginate(stmt, sort, after, before, rank=rank))).all()
+    projects, pager = make_page(projects, sort, after, before)
+    items = dump(schemas.ProjectOut, projects, include)
+    if with_rank:
+        for item, project in zip(items, projects):
+            item["rank"] = project.search_rank
+    truncated = sort == RELEVANCE and await rank_truncated(db, q, user, status)
+    return APIResponse({"items": items, **pager, "truncated": truncated})
+
+# GET 單一專案
+@router.get("/projects/{project_id}")
+async def get_project(project_id: int, request: Request, fields: str = None, db: AsyncSession = Depends(get_async_db)):
+    user = require_user(request)
+    project = await get_visible_project(db, project_id, user)
+    return APIResponse(schemas.ProjectOut.model_validate(project, from_attributes=True).model_dump(mode=DUMP_MODE, include=parse_fields(schemas.ProjectOut, fields)))
+
+# GET 專案的報價(委託人看全部，接案人只看自己的)
+@router.get("/projects/{project_id}/bids")
+async def list_project_bids(
+        project_id: int,
+        request: Request,
+        after: int = None,
+        limit: int = 50,
+        fields: str = None,
+        db: AsyncSession = Depends(get_async_db)):
+    user = require_user(request)
+    include = parse_fields(schemas.BidOut, fields)
+    project = await get_visible_project(db, project_id, user)
+    stmt = select(models.Bid).filter(models.Bid.project_id == project.id)
+    if user["id"] != project.client_id:
+        stmt = stmt.filter(models.Bid.contractor_id == user["id"])
+    bids, next_cursor = await id_page(db, stmt, models.Bid, after, limit)
+    return APIResponse({"items": dump(schemas.BidOut, bids, include), "next": next_cursor})
+
+# GET 專案的退件紀錄
+@router.get("/projects/{project_id}/rejections")
+async def list_project_rejections(
+        project_id: int,
+        request: Request,
+        after: int = None,
+        limit: int = 50,
+        fields: str = None,
+        db: AsyncSession = Depends(get_async_db)):
+    user = require_user(request)
+    include = parse_fields(schemas.ProjectRejectionOut, fields)
+    project = await get_visible_project(db, project_id, user, participants_only=True)
+    stmt = select(models.ProjectRejection).filter(models.ProjectRejection.project_id == project.id)
+    rejections, next_cursor = await id_page(db, stmt, models.ProjectRejection, after, limit)
+    return APIResponse({"items": dump(schemas.ProjectRejectionOut, rejections, include), "next": next_cursor})
+
+# GET 專案的上傳檔案，可用 stage 篩選
+@router.get("/projects/{project_id}/files")
+async def list_project_files(
+        project_id: int,
+        request: Request,
+        stage: str = None,
+        after: int = None,
+        limit: int = 50,
+        fields: str = None,
+        db: AsyncSession = Depends(get_async_db)):
+    user = require_user(request)
+    include = parse_fields(schemas.ProjectFileOut, fields)
+    project = await get_visible_project(db, project_id, user, participants_only=True)
+    stmt = select(models.ProjectFile).filter(models.ProjectFile.project_id == project.id)
+    if stage:
+        stmt = stmt.filter(models.ProjectFile.stage == stage)
+    files, next_cursor = await id_page(db, stmt, models.ProjectFile, after, limit)
+    return APIResponse({"items": dump(schemas.ProjectFileOut, files, include), "next": next_cursor})
+
+# GET 自己的報價(接案人)
+@router.get("/bids")
+async def list_my_bids(
+        request: Request,
+        after: int = None,
+        limit: int = 50,
+        fields: str = None,
+        db: AsyncSession = Depends(get_async_db)):
+    user = require_user(request)
+    include = parse_fields(schemas.BidOut, fields)
+    stmt = select(models.Bid).filter(models.Bid.contractor_id == user["id"])
+    bids, next_cursor = await id_page(db, stmt, models.Bid, after, limit)
+    return APIResponse({"items": dump(schemas.BidOut, bids, include), "next": next_cursor})
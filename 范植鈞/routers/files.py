@@ -0,0 +1,13 @@
+from fastapi import APIRouter, HTTPException, Request
+import mimetypes
+import storage
+
+router = APIRouter(prefix="/files", tags=["Files"])
+
+# GET 以簽章網址下載檔案(本機儲存後端)；權限已在產生網址時檢查過
+@router.get("/{key:path}")
+def signed_download(key: str, expires: int, sig: str, filename: str, request: Request):
+    if not isinstance(storage.backend, storage.LocalStorage) or not storage.verify_signature(key, expires, sig):
+        raise HTTPException(status_code=403, detail="下載連結無效或已過期")
+    media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    return storage.backend.send(key, filename, media_type, request)
@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends
+from database import pool_status
+from archive_cache import cache_status
+from blobstore import store_status
+from templating import template_status
+import page_cache
+import jobs
+from auth import get_admin_user
+
+router = APIRouter(prefix="/internal", tags=["Internal"])
+
+# GET 資料庫連線池狀態(管理者)
+@router.get("/db-pool")
+def db_pool(admin: dict = Depends(get_admin_user)):
+    return pool_status()
+
+# GET zip 快取命中率與大小(管理者)
+@router.get("/archive-cache")
+def archive_cache_status(admin: dict = Depends(get_admin_user)):
+    return cache_status()
+
+# GET 檔案去重統計(管理者)
+@router.get("/blob-store")
+def blob_store_status(admin: dict = Depends(get_admin_user)):
+    return store_status()
+
+# GET 各模板渲染耗時與片段快取命中率(管理者)
+@router.get("/templates")
+def templates_status(admin: dict = Depends(get_admin_user)):
+    return template_status()
+
+# GET 列表頁快取命中率與舊資料回傳次數(管理者)
+@router.get("/page-cache")
+def page_cache_status(admin: dict = Depends(get_admin_user)):
+    return page_cache.cache_status()
+
+# GET 背景工作佇列長度、等待與執行時間(管理者)
+@router.get("/jobs")
+def jobs_status(admin: dict = Depends(get_admin_user)):
+    return jobs.queue_status()
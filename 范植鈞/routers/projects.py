@@ -1,22 +1,104 @@
 from fastapi import APIRouter, Depends, Request, HTTPException, Form, status, Query, UploadFile
 from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse, StreamingResponse
-from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session, joinedload
-from database import get_db
+from sqlalchemy import select, update, and_, literal, exists, case
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session, joinedload, selectinload, aliased
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, get_async_db
 import models
 import schemas
 from auth import get_current_user
-from urllib.parse import quote
+from pagination import paginate, make_page, RELEVANCE
+from search import search_statement, rank_truncated, PROJECT_STATUSES, SEARCH_RANK_CANDIDATES
+from uploads import stage_upload, link_upload
+import archive_cache
+import page_cache
+import storage
+from project_files import load_stage_files, reject_latest_final, owned_paths, UPLOAD_ROOT, STAGES
+import jobs
+from templating import templates
+from urllib.parse import quote, urlencode
 from datetime import datetime
-import shutil
+from types import SimpleNamespace
+import asyncio
 import os
-import zipfile
-import io
-
-templates = Jinja2Templates(directory="templates")
 
 router = APIRouter(prefix="/projects", tags=["Projects"])
 
+# 報價計劃書存放的資料夾
+PROPOSAL_ROOT = "upload_proposal"
+
+# 委託人看 list_projects.html 時會讀取的關聯; async session 不能 lazy load，查詢時需一併載入
+# 報價與報價人用一次 selectin 查詢，指派的接案人併入主查詢
+CLIENT_LIST_OPTIONS = (
+    selectinload(models.Project.bids).joinedload(models.Bid.contractor),
+    joinedload(models.Project.contractor),
+)
+
+async def fetch_project_page(db, stmt, user, sort, after, before, own_bid=None, rank=None):
+    """執行專案列表查詢並分頁，回傳 (專案, 接案人自己的報價 {project_id: bid}, 分頁游標)
+    接案人只需要自己的報價，用 join 一起查出，不載入其他人的報價；rank 為搜尋時的相關度運算式"""
+    is_contractor = bool(user) and user["role"] == "contractor"
+    if is_contractor:
+        if own_bid is None:
+            own_bid = aliased(models.Bid)
+            stmt = stmt.outerjoin(own_bid, and_(own_bid.project_id == models.Project.id, own_bid.contractor_id == user["id"]))
+        stmt = stmt.add_columns(own_bid)
+    else:
+        stmt = stmt.options(*CLIENT_LIST_OPTIONS)
+    result = await db.execute(paginate(stmt, sort, after, before, rank=rank))
+    rows = result.all()
+    own_bids = {row[0].id: row[1] for row in rows if is_contractor and row[1] is not None}
+    projects, pager = make_page([row[0] for row in rows], sort, after, before)
+    return projects, own_bids, pager
+
+def project_snapshot(project):
+    """把列表頁用到的專案欄位轉成可快取的 dict；快取由所有使用者共用，不放報價(價格、計劃書路徑)"""
+    return {
+        "id": project.id,
+        "title": project.title,
+        "description": project.description,
+        "status": project.status,
+        "client_id": project.client_id,
+        "assigned_contractor_id": project.assigned_contractor_id,
+        "create_time": project.create_time,
+        "proposal_deadline": project.proposal_deadline,
+        "version": project.version,
+    }
+
+def snapshot_to_project(data):
+    """快取的 dict 轉回模板可用屬性存取的物件；可承接專案尚未指派，報價由各請求另外查詢"""
+    return SimpleNamespace(**data, contractor=None, bids=[])
+
+async def load_available_page(db, sort, after, before):
+    """查詢一頁可承接專案，回傳 (可快取的頁面資料, 資料失效時間)"""
+    # 過期專案由 scheduler 改為 noBid，這裡只讀取，並直接排除排程尚未處理到的過期專案
+    stmt = select(models.Project).filter(models.Project.status=="open", models.Project.proposal_deadline >= datetime.now())
+    rows = (await db.scalars(paginate(stmt, sort, after, before))).all()
+    # 頁面上(含判斷下一頁的那一筆)任一專案截止時，這一頁的內容就會改變
+    valid_until = min((project.proposal_deadline for project in rows), default=None)
+    projects, pager = make_page(rows, sort, after, before)
+    return {"projects": [project_snapshot(project) for project in projects], "pager": pager}, valid_until
+
+async def load_viewer_bids(db, user, projects):
+    """可承接專案頁的報價: 接案人只查自己的報價，委託人只查自己專案的報價(含報價人)，各 1 條 SQL
+    回傳接案人自己的報價 {project_id: bid}；委託人的報價直接填入 project.bids"""
+    if user["role"] == "contractor":
+        ids = [project.id for project in projects]
+        if not ids:
+            return {}
+        bids = await db.scalars(select(models.Bid).filter(models.Bid.contractor_id == user["id"], models.Bid.project_id.in_(ids)))
+        return {bid.project_id: bid for bid in bids}
+    own = {project.id: project for project in projects if project.client_id == user["id"]}
+    if own:
+        bids = await db.scalars(
+            select(models.Bid).options(joinedload(models.Bid.contractor))
+            .filter(models.Bid.project_id.in_(own)).order_by(models.Bid.id)
+        )
+        for bid in bids:
+            own[bid.project_id].bids.append(bid)
+    return {}
+
 # GET 建立專案頁面
 @router.get("/create_page", response_class=HTMLResponse)
 async def create_project_page(request: Request):
@@ -43,6 +125,7 @@ def create_project(
     db.add(new_project)
     db.commit()
     db.refresh(new_project)
+    page_cache.invalidate(page_cache.AVAILABLE_PROJECTS)
 
     request.session["flash"] = "專案建立成功！"
     return RedirectResponse(url="/", status_code=302)
@@ -54,68 +137,135 @@ async def submit_bid(
         price: float = Form(...), 
         file: UploadFile = None,
         request: Request = None, 
-        db: Session = Depends(get_db),):
+        db: AsyncSession = Depends(get_async_db),):
     user = request.session.get("user")
-    project = db.query(models.Project).filter(models.Project.id == project_id).first()
-    project_title = project.title
     if not user or user["role"] != "contractor":
         raise HTTPException(status_code=403, detail="無權限報價")
-    
-    # 檢查是否已經對這個專案報價過
-    existing_bid = db.query(models.Bid).filter(
-        models.Bid.project_id == project_id,
-        models.Bid.contractor_id == user["id"]
-    ).first()
-    if existing_bid:
+    if not file or not file.filename:
+        raise HTTPException(status_code=400, detail="請上傳計劃書")
+
+    # 計劃書內容先存進 blobstore，報價寫入成功後才放到 upload_proposal 底下
+    size, digest = await stage_upload(file)
+
+    # 一條 SQL: 專案仍開放報價時新增報價(同一接案人重複報價由唯一約束擋下)，成功時遞增專案卡片快取版本
+    proposal_path = literal("upload_proposal/") + models.Project.title + "/" + user["username"] + "/" + file.filename
+    new_bid = (
+        pg_insert(models.Bid)
+        .from_select(
+            ["project_id", "contractor_id", "price", "proposal_file", "status"],
+            select(models.Project.id, literal(user["id"]), literal(price), proposal_path, literal("pending"))
+            .filter(models.Project.id == project_id, models.Project.status == "open", models.Project.proposal_deadline >= datetime.now())
+            # FOR SHARE: 同時進行的指派或截止更新先 commit 時，等它完成後重新檢查專案狀態，不會對已指派的專案報價
+            .with_for_update(read=True),
+        )
+        .on_conflict_do_nothing(index_elements=["project_id", "contractor_id"])
+        .returning(models.Bid.id, models.Bid.project_id, models.Bid.proposal_file)
+        .cte("new_bid")
+    )
+    bump_version = (
+        update(models.Project)
+        .where(models.Project.id.in_(select(new_bid.c.project_id)))
+        .values(version=models.Project.version + 1)
+        .cte("bump_version")
+    )
+    inserted = (await db.execute(select(new_bid.c.id, new_bid.c.proposal_file).add_cte(bump_version))).first()
+
+    if inserted is None:
+        await db.rollback()
+        project = await db.scalar(select(models.Project).filter(models.Project.id == project_id))
+        if not project:
+            raise HTTPException(status_code=404, detail="專案不存在")
+        if project.status != "open" or project.proposal_deadline < datetime.now():
+            raise HTTPException(status_code=400, detail="已超過報價時間無法提案")
         raise HTTPException(status_code=400, detail="你已經對此專案報價過，不能再次提交")
-    
-    proposal_path = f"upload_proposal/{project_title}/{user["username"]}/{file.filename}"
-    os.makedirs(proposal_path, exist_ok=True)
 
-    # 儲存檔案
-    file_path = os.path.join(proposal_path, file.filename)
-    with open(file_path, "wb") as f:
-        f.write(await file.read())
-    
-    new_bid = models.Bid(project_id=project_id, contractor_id=user["id"], price=price, proposal_file=proposal_path)
-    db.add(new_bid)
-    db.commit()
-    db.refresh(new_bid)
+    # 檔案放好後才 commit；放置失敗時報價會隨 session 關閉而 rollback
+    await asyncio.to_thread(link_upload, digest, inserted.proposal_file, file.filename)
+    await db.commit()
+    await page_cache.ainvalidate(page_cache.AVAILABLE_PROJECTS)
 
     request.session["flash"] = "報價成功！"
     return RedirectResponse(url="/projects/my_bids", status_code=302)
 
 # GET 可承接專案列表(接案人)
 @router.get("/available_page", response_class=HTMLResponse)
-async def available_projects_page(request: Request, db: Session = Depends(get_db)):
-    now = datetime.now()
+async def available_projects_page(
+        request: Request,
+        sort: str = "newest",
+        after: str = None,
+        before: str = None,
+        db: AsyncSession = Depends(get_async_db)):
     user = request.session.get("user")
-    projects = db.query(models.Project).filter(models.Project.status=="open").all()
-
-    for project in projects:
-        if project.proposal_deadline and (now > project.proposal_deadline):
-            project.status = "noBid"
-            db.commit()            
-            
-    return templates.TemplateResponse("list_projects.html", {"request": request, "projects": projects, "user": user})
+    # 所有人看到的專案都相同，專案資料走快取；報價依檢視者另外查詢
+    page = await page_cache.get_or_load(
+        page_cache.AVAILABLE_PROJECTS, [sort, after, before],
+        lambda: load_available_page(db, sort, after, before),
+    )
+    projects = [snapshot_to_project(data) for data in page["projects"]]
+    pager = page["pager"]
+    own_bids = await load_viewer_bids(db, user, projects) if user else {}
+
+    return templates.TemplateResponse("list_projects.html", {"request": request, "projects": projects, "own_bids": own_bids, "user": user, "pager": pager})
+
+# GET 搜尋專案(標題、描述全文檢索)，可依相關度、最新或截止日排序，status 可複選
+@router.get("/search", response_class=HTMLResponse)
+async def search_projects_page(
+        request: Request,
+        q: str = "",
+        status: list[str] = Query(None),
+        sort: str = RELEVANCE,
+        after: str = None,
+        before: str = None,
+        db: AsyncSession = Depends(get_async_db)):
+    user = request.session.get("user")
+    if not user:
+        raise HTTPException(status_code=401, detail="請先登入")
+    statuses = [s for s in status or [] if s in PROJECT_STATUSES]
+    stmt, rank = search_statement(select(models.Project), q, user, statuses, ranked=sort == RELEVANCE)
+    if rank is None and sort == RELEVANCE:
+        sort = "newest"
+    projects, own_bids, pager = await fetch_project_page(db, stmt, user, sort, after, before, rank=rank)
+    # 換頁與排序連結需帶上搜尋條件
+    pager["extra"] = "&" + urlencode({"q": q, "status": statuses}, doseq=True)
+    # 相關度排序只涵蓋最新的候選結果，超過時在頁面上提示
+    truncated = sort == RELEVANCE and await rank_truncated(db, q, user, statuses)
+
+    return templates.TemplateResponse("list_projects.html", {
+        "request": request, "projects": projects, "own_bids": own_bids, "user": user, "pager": pager, "q": q,
+        "rank_limit": SEARCH_RANK_CANDIDATES if truncated else None,
+    })
 
 # GET 專案列表(委託人)
 @router.get("/my_projects", response_class=HTMLResponse)
-async def my_projects_page(request: Request, db: Session = Depends(get_db)):
+async def my_projects_page(
+        request: Request,
+        sort: str = "newest",
+        after: str = None,
+        before: str = None,
+        db: AsyncSession = Depends(get_async_db)):
     user = request.session.get("user")
-    projects = db.query(models.Project).filter(models.Project.client_id==user["id"]).all()
+    stmt = select(models.Project).filter(models.Project.client_id==user["id"])
+    projects, own_bids, pager = await fetch_project_page(db, stmt, user, sort, after, before)
     flash = request.session.pop("flash", None)
 
-    return templates.TemplateResponse("list_projects.html", {"request": request, "projects": projects, "user": user, "flash": flash})
+    return templates.TemplateResponse("list_projects.html", {"request": request, "projects": projects, "own_bids": own_bids, "user": user, "flash": flash, "pager": pager})
 
 # GET 承包專案(接案人)
 @router.get("/my_bids", response_class=HTMLResponse)
-async def my_bids_page(request: Request, db: Session = Depends(get_db)):
+async def my_bids_page(
+        request: Request,
+        sort: str = "newest",
+        after: str = None,
+        before: str = None,
+        db: AsyncSession = Depends(get_async_db)):
     user = request.session.get("user")
-    bids = db.query(models.Bid).filter(models.Bid.contractor_id==user["id"]).all()
+    # 直接查詢有報價的專案，才能以專案欄位分頁；join 到的報價就是自己的報價
+    own_bid = aliased(models.Bid)
+    stmt = select(models.Project).join(own_bid, and_(own_bid.project_id == models.Project.id, own_bid.contractor_id == user["id"]))
+    projects, own_bids, pager = await fetch_project_page(db, stmt, user, sort, after, before, own_bid=own_bid)
     flash = request.session.pop("flash", None)
 
-    return templates.TemplateResponse("list_projects.html", {"request": request, "projects": [b.project for b in bids], "user": user, "flash": flash})
+    return templates.TemplateResponse("list_projects.html", {"request": request, "projects": projects, "own_bids": own_bids, "user": user, "flash": flash, "pager": pager})
 
 # POST 被選接案人資訊
 @router.post("/assign")
@@ -124,7 +274,8 @@ def assign_contractor(project_id: int = Form(...), contractor_id: int = Form(...
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="未登入")
 
-    project = db.query(models.Project).filter(models.Project.id == project_id).first()
+    # 鎖住專案列到 commit 為止，同時送出的指派會等前一個完成後再檢查 assigned_contractor_id
+    project = db.query(models.Project).filter(models.Project.id == project_id).with_for_update().first()
     if not project:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="專案不存在")
 
@@ -134,33 +285,36 @@ def assign_contractor(project_id: int = Form(...), contractor_id: int = Form(...
     if project.assigned_contractor_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="此專案已指派接案人")
 
+    has_bid = db.query(exists().where(models.Bid.project_id == project_id, models.Bid.contractor_id == contractor_id)).scalar()
+    if not has_bid:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="此接案人沒有對專案報價")
+
     # 更新專案狀態與指派接案人
     project.assigned_contractor_id = contractor_id
     project.status = "in_process"
+    project.version = models.Project.version + 1
 
-    # 接受被選中者，拒絕其他人
-    bids = db.query(models.Bid).filter(models.Bid.project_id == project_id).all()
-    for bid in bids:
-        if bid.contractor_id == contractor_id:
-            bid.status = "accepted"
-        else:
-            bid.status = "rejected"
+    # 接受被選中者，拒絕其他人: 一條 UPDATE，不把報價逐筆載入
+    db.query(models.Bid).filter(models.Bid.project_id == project_id).update(
+        {models.Bid.status: case((models.Bid.contractor_id == contractor_id, "accepted"), else_="rejected")},
+        synchronize_session=False,
+    )
 
     db.commit()
+    page_cache.invalidate(page_cache.AVAILABLE_PROJECTS)
 
     request.session["flash"] = "已選擇接案人!"
 
-    project = db.query(models.Project).filter(models.Project.id == project_id).first()
     return RedirectResponse(url=f"/projects/my_projects", status_code=303)
 
 # GET 管理專案(委託人)
 @router.get("/manage_client/{project_id}", response_class=HTMLResponse)
-async def manage_project_client(project_id: int, request: Request, db: Session = Depends(get_db)):
+async def manage_project_client(project_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
     user = request.session.get("user")
     if not user:
         raise HTTPException(status_code=401, detail="請先登入")
 
-    project = db.query(models.Project).filter(models.Project.id == project_id).first()
+    project = await db.scalar(select(models.Project).options(selectinload(models.Project.contractor)).filter(models.Project.id == project_id))
     if not project:
         raise HTTPException(status_code=404, detail="專案不存在")
 
@@ -169,27 +323,8 @@ async def manage_project_client(project_id: int, request: Request, db: Session =
     
     flash = request.session.pop("flash", None)
 
-    base_dir = os.path.join("upload_file", project.title)
-    
-    # 讀進度檔案資料夾與裡面檔案
-    in_process_dir = os.path.join(base_dir, "in_process")
-    in_process_data = {}
-    if os.path.exists(in_process_dir):
-        for date_folder in os.listdir(in_process_dir):
-            folder_path = os.path.join(in_process_dir, date_folder)
-            if os.path.isdir(folder_path):
-                files = [f for f in os.listdir(folder_path) if not f.startswith('.')]
-                in_process_data[date_folder] = files
-
-    # 讀結案檔案資料夾與裡面檔案
-    final_dir = os.path.join(base_dir, "final")
-    final_data = {}
-    if os.path.exists(final_dir):
-        for date_folder in os.listdir(final_dir):
-            folder_path = os.path.join(final_dir, date_folder)
-            if os.path.isdir(folder_path):
-                files = [f for f in os.listdir(folder_path) if not f.startswith('.')]
-                final_data[date_folder] = files
+    # 由檔案紀錄一次查出進度與結案檔案
+    in_process_data, final_data = await load_stage_files(db, project.id)
 
     return templates.TemplateResponse("manage_client.html", {
         "request": request,
@@ -203,12 +338,12 @@ async def manage_project_client(project_id: int, request: Request, db: Session =
 
 # GET 專案管理(接案人)
 @router.get("/manage_contractor/{project_id}", response_class=HTMLResponse)
-async def manage_contractor_page(project_id: int, request: Request, db: Session = Depends(get_db)):
+async def manage_contractor_page(project_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
     user = request.session.get("user")
     if not user:
         raise HTTPException(status_code=401, detail="請先登入")
 
-    project = db.query(models.Project).filter(models.Project.id == project_id).first()
+    project = await db.scalar(select(models.Project).filter(models.Project.id == project_id))
     if not project:
         raise HTTPException(status_code=404, detail="專案不存在")
 
@@ -217,29 +352,10 @@ async def manage_contractor_page(project_id: int, request: Request, db: Session
     
     flash = request.session.pop("flash", None)
 
-    base_dir = os.path.join("upload_file", project.title)
+    latest_rejection = await db.scalar(select(models.ProjectRejection).filter(models.ProjectRejection.project_id == project_id).order_by(models.ProjectRejection.rejection_date.desc()))
 
-    latest_rejection = db.query(models.ProjectRejection).filter(models.ProjectRejection.project_id == project_id).order_by(models.ProjectRejection.rejection_date.desc()).first()
-    
-    # 讀進度檔案資料夾與裡面檔案
-    in_process_dir = os.path.join(base_dir, "in_process")
-    in_process_data = {}
-    if os.path.exists(in_process_dir):
-        for date_folder in os.listdir(in_process_dir):
-            folder_path = os.path.join(in_process_dir, date_folder)
-            if os.path.isdir(folder_path):
-                files = [f for f in os.listdir(folder_path) if not f.startswith('.')]
-                in_process_data[date_folder] = files
-
-    # 讀結案檔案資料夾與裡面檔案
-    final_dir = os.path.join(base_dir, "final")
-    final_data = {}
-    if os.path.exists(final_dir):
-        for date_folder in os.listdir(final_dir):
-            folder_path = os.path.join(final_dir, date_folder)
-            if os.path.isdir(folder_path):
-                files = [f for f in os.listdir(folder_path) if not f.startswith('.')]
-                final_data[date_folder] = files
+    # 由檔案紀錄一次查出進度與結案檔案
+    in_process_data, final_data = await load_stage_files(db, project.id)
 
     return templates.TemplateResponse("manage_contractor.html", {
         "request": request,
@@ -252,63 +368,76 @@ async def manage_contractor_page(project_id: int, request: Request, db: Session
         }
     )
 
-# GET 下載並打包成zip
+def inside(root, path):
+    """路徑含專案名稱與使用者上傳的檔名，確認仍在 root 底下才使用"""
+    root = os.path.abspath(root)
+    if os.path.commonpath([root, os.path.abspath(path)]) != root:
+        raise HTTPException(status_code=400, detail="無效的檔案路徑")
+    return path
+
+# GET 下載並打包成zip(委託人與被指派的接案人)
 @router.get("/download_zip")
-def download_zip(project_title: str, folder: str, stage: str = "in_process"):
-    base_path = f"upload_file/{project_title}/{stage}/{folder}"
-    if not os.path.exists(base_path):
-        print(base_path)
+def download_zip(request: Request, project_id: int, folder: str, stage: str = "in_process", db: Session = Depends(get_db)):
+    user = request.session.get("user")
+    if not user:
+        raise HTTPException(status_code=401, detail="未登入")
+    if stage not in STAGES:
+        raise HTTPException(status_code=400, detail="無效的階段")
+    # 一條查詢完成權限檢查；路徑由專案名稱與資料庫中的檔案紀錄組成，不接受任意路徑
+    has_files = exists().where(
+        models.ProjectFile.project_id == models.Project.id, models.ProjectFile.stage == stage, models.ProjectFile.folder == folder,
+    )
+    project = db.execute(
+        select(models.Project.title, models.Project.client_id, models.Project.assigned_contractor_id, has_files.label("has_files"))
+        .filter(models.Project.id == project_id)
+    ).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="專案不存在")
+    if user["id"] not in (project.client_id, project.assigned_contractor_id):
+        raise HTTPException(status_code=403, detail="無權限下載此專案的檔案")
+    base_path = inside(UPLOAD_ROOT, os.path.join(UPLOAD_ROOT, project.title, stage, folder))
+    if not project.has_files or not os.path.isdir(base_path):
         raise HTTPException(status_code=404, detail="檔案不存在")
 
-    # 將資料夾打包成 zip
-    zip_stream = io.BytesIO()
-    with zipfile.ZipFile(zip_stream, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
-        for root, dirs, files in os.walk(base_path):
-            for file in files:
-                file_path = os.path.join(root, file)
-                # 加入 zip 時，讓路徑相對於 base_path
-                zf.write(file_path, arcname=os.path.relpath(file_path, base_path))
-    zip_stream.seek(0)
-
     # 支援中文檔名
-    zip_filename = f"{folder}_{project_title}_{stage}.zip"
-    encoded_filename = quote(zip_filename)
-
-    return StreamingResponse(
-        zip_stream,
-        media_type="application/zip",
-        headers={
-            "Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}"
-        }
-    )
+    zip_filename = f"{folder}_{project.title}_{stage}.zip"
+    return send_folder_zip(request, base_path, zip_filename)
 
+# GET 下載計劃書(專案的委託人與報價的接案人)
 @router.get("/proposal_download_zip")
-def download_zip(path):
-    base_path = path
-    if not os.path.exists(base_path):
-        print(base_path)
+def proposal_download_zip(request: Request, bid_id: int, db: Session = Depends(get_db)):
+    user = request.session.get("user")
+    if not user:
+        raise HTTPException(status_code=401, detail="未登入")
+    bid = db.execute(
+        select(models.Bid.proposal_file, models.Bid.contractor_id, models.Project.client_id)
+        .join(models.Project, models.Project.id == models.Bid.project_id)
+        .filter(models.Bid.id == bid_id)
+    ).first()
+    if not bid:
+        raise HTTPException(status_code=404, detail="報價不存在")
+    if user["id"] not in (bid.client_id, bid.contractor_id):
+        raise HTTPException(status_code=403, detail="無權限下載此計劃書")
+    base_path = inside(PROPOSAL_ROOT, bid.proposal_file or "")
+    if not os.path.isdir(base_path):
         raise HTTPException(status_code=404, detail="檔案不存在")
 
-    # 將資料夾打包成 zip
-    zip_stream = io.BytesIO()
-    with zipfile.ZipFile(zip_stream, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
-        for root, dirs, files in os.walk(base_path):
-            for file in files:
-                file_path = os.path.join(root, file)
-                # 加入 zip 時，讓路徑相對於 base_path
-                zf.write(file_path, arcname=os.path.relpath(file_path, base_path))
-    zip_stream.seek(0)
-
     # 支援中文檔名
-    zip_filename = f"{base_path}.zip"
-    encoded_filename = quote(zip_filename).replace("upload_", "")
+    zip_filename = f"{base_path}.zip".replace("upload_", "")
+    return send_folder_zip(request, base_path, zip_filename)
 
+def send_folder_zip(request, base_path, zip_filename):
+    # 內容沒變就由儲存後端送出快取的 zip(X-Accel-Redirect / 簽章網址 / 直接送檔)
+    key = archive_cache.manifest_key(base_path)
+    cached_path = archive_cache.lookup(key)
+    if cached_path:
+        return storage.backend.serve(storage.backend.key_for(cached_path), zip_filename, "application/zip", request)
+
+    # 邊打包邊送出，同時寫入快取；內容尚未產生，這次無法支援 Range
     return StreamingResponse(
-        zip_stream,
+        archive_cache.iter_and_store(base_path, key),
         media_type="application/zip",
-        headers={
-            "Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}"
-        }
+        headers={"Content-Disposition": storage.content_disposition(zip_filename), "Accept-Ranges": "none"}
     )
 
 # POST 專案狀態
@@ -328,6 +457,7 @@ def request_close(project_id: int, request: Request, db: Session = Depends(get_d
     # 更新狀態
     project.close_requested = True
     project.status = "request_close"
+    project.version = models.Project.version + 1
     db.commit()
 
     request.session["flash"] = "請求成功!"
@@ -348,20 +478,22 @@ def delete_project(project_id: int, request: Request, db: Session = Depends(get_
     if project.client_id != user["id"]:
         raise HTTPException(status_code=403, detail="您沒有權限刪除這個專案")
     
-    db.query(models.Bid).filter(models.Bid.project_id == project_id).delete()
-    
+    # 報價、退件紀錄與檔案清單由資料庫的 ON DELETE CASCADE 刪除，只需一條 DELETE
+    # 刪除前先查出這個專案自己的計劃書與上傳檔案，在背景刪除；資料夾以專案名稱命名，不能整個刪除
+    paths = owned_paths(db, project)
     db.delete(project)
+    if paths:
+        jobs.enqueue(db, "remove_files", {"paths": paths})
     db.commit()
-    if os.path.exists(f"upload_proposal/{project.title}"):
-        os.remove(f"upload_proposal/{project.title}")
+    page_cache.invalidate(page_cache.AVAILABLE_PROJECTS)
     request.session["flash"] = "成功刪除專案!"
 
     return RedirectResponse(url="/projects/my_projects", status_code=302)
 
 # GET 審核頁面
 @router.get("/decision/{project_id}")
-async def decision_page(project_id: int, request: Request, db: Session = Depends(get_db)):
-    project = db.query(models.Project).filter(models.Project.id == project_id).first()
+async def decision_page(project_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    project = await db.scalar(select(models.Project).filter(models.Project.id == project_id))
     if not project:
         raise HTTPException(status_code=404, detail="專案不存在")
     return templates.TemplateResponse("project_decision.html", {"request": request, "project": project})
@@ -373,25 +505,27 @@ async def submit_decision(
     project_id: int = Form(...),
     decision: str = Form(...),
     explanation: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     user = request.session.get("user")
     if not user:
         raise HTTPException(status_code=401, detail="未登入")
 
-    project = db.query(models.Project).filter(models.Project.id == project_id).first()
+    project = await db.scalar(select(models.Project).filter(models.Project.id == project_id))
     if not project:
         raise HTTPException(status_code=404, detail="專案不存在")
 
     if project.client_id != user["id"]:
         raise HTTPException(status_code=403, detail="無權限操作")
 
+    if decision in ("close", "reject"):
+        project.version = models.Project.version + 1
     if decision == "close":
         project.status = "closed"
         project.close_explanation = explanation
         project.close_time = datetime.now()
         project.close_requested = False
-        db.commit()
+        await db.commit()
         request.session["flash"] = "成功送出! 已結案"
     elif decision == "reject":
         project.close_requested = False
@@ -402,37 +536,11 @@ async def submit_decision(
             explanation=explanation
         )
         db.add(rejection)
-        db.commit()
+        # 最新的結案資料夾與退件紀錄一起 commit，檔案在背景移到 rejected
+        await reject_latest_final(db, project, rejection.rejection_date)
+        await db.commit()
         request.session["flash"] = "成功送出! 已退件"
-        move_latest_final_to_rejected(project.title)
     else:
         raise HTTPException(status_code=400, detail="無效的操作")
 
     return RedirectResponse(url=f"/projects/manage_client/{project.id}", status_code=303)
-
-#定義一個函數，移動被退件的資料夾
-def move_latest_final_to_rejected(project_title: str):
-    base_dir = os.path.join("upload_file", project_title)
-    final_dir = os.path.join(base_dir, "final")
-    rejected_dir = os.path.join(base_dir, "rejected")
-
-    os.makedirs(base_dir, exist_ok=True)
-
-    # 取得所有日期資料夾（排除 'rejected'）
-    date_folders = [
-        f for f in os.listdir(final_dir)
-        if os.path.isdir(os.path.join(final_dir, f)) and f != "rejected"
-    ]
-
-    if not date_folders:
-        return False
-
-    # 找出最新上傳的結案資料夾（依照字母排序或日期格式）
-    latest_folder = max(date_folders)
-    src_path = os.path.join(final_dir, latest_folder)
-    dest_path = os.path.join(rejected_dir, latest_folder)
-
-    # 移動資料夾（含檔案）
-    shutil.move(src_path, dest_path)
-
-    return True
\ No newline at end of file
@@ -1,14 +1,19 @@
 from fastapi import APIRouter, UploadFile, Form, Request, Depends, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-from database import get_db
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
+from starlette.requests import ClientDisconnect
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
 import models
+from uploads import save_upload, UPLOAD_CHUNK_SIZE, UPLOAD_MAX_BYTES
+import jobs
+import resumable
+from project_files import record_project_file
+from templating import templates
+import asyncio
 import os
 from datetime import datetime
 
-templates = Jinja2Templates(directory="templates")
-
 router = APIRouter(prefix="/upload", tags=["Upload"])
 
 #POST 上傳進度檔案
@@ -18,24 +23,24 @@ async def upload_project_file(
     project_id: int = Form(...),
     description: str = Form(""),
     file: UploadFile = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     user = request.session.get("user")
     if not user:
         raise HTTPException(status_code=401, detail="未登入")
 
-    project = db.query(models.Project).filter(models.Project.id == project_id).first()
+    project = await db.scalar(select(models.Project).filter(models.Project.id == project_id))
     if not project:
         raise HTTPException(status_code=404, detail="專案不存在")
 
     # 建立路徑：upload_file/{project.title}/in_process/{日期}/
-    in_process_path = f"upload_file/{project.title}/in_process/{datetime.now().strftime("%Y-%m-%d_%H-%M")}"
-    os.makedirs(in_process_path, exist_ok=True)
+    folder = datetime.now().strftime("%Y-%m-%d_%H-%M")
+    in_process_path = f"upload_file/{project.title}/in_process/{folder}"
 
-    # 儲存檔案
-    file_path = os.path.join(in_process_path, file.filename)
-    with open(file_path, "wb") as f:
-        f.write(await file.read())
+    # 儲存檔案並寫入檔案紀錄
+    file_path, size, digest = await save_upload(file, in_process_path)
+    await record_project_file(db, project.id, "in_process", folder, os.path.basename(file_path), size, digest, user["id"])
+    await db.commit()
 
     request.session["flash"] = "已上傳檔案!"
 
@@ -48,22 +53,24 @@ async def upload_final_file(
     project_id: int = Form(...),
     description: str = Form(""),
     file: UploadFile = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):    
     user = request.session.get("user")
     if not user:
         raise HTTPException(status_code=401, detail="未登入")
 
-    project = db.query(models.Project).filter(models.Project.id == project_id).first()
+    project = await db.scalar(select(models.Project).filter(models.Project.id == project_id))
     if not project:
         raise HTTPException(status_code=404, detail="專案不存在")
     
-    final_path = f"upload_file/{project.title}/final/{datetime.now().strftime("%Y-%m-%d_%H-%M")}"
-    os.makedirs(final_path, exist_ok=True)
+    folder = datetime.now().strftime("%Y-%m-%d_%H-%M")
+    final_path = f"upload_file/{project.title}/final/{folder}"
 
-    file_path = os.path.join(final_path, file.filename)
-    with open(file_path, "wb") as f:
-        f.write(await file.read())
+    file_path, size, digest = await save_upload(file, final_path)
+    await record_project_file(db, project.id, "final", folder, os.path.basename(file_path), size, digest, user["id"])
+    # 委託人審核時多半會下載結案檔案，先在背景打包好
+    await jobs.aenqueue(db, "build_archive", {"path": final_path}, key=f"build_archive:{final_path}:{digest}")
+    await db.commit()
 
     request.session["flash"] = "已上傳結案檔案!按下 '請求結案' 按鈕通知委託人"    
 
@@ -71,17 +78,17 @@ async def upload_final_file(
 
 # GET 上傳頁面
 @router.get("/upload_project/{project_id}", response_class=HTMLResponse)
-async def manage_project_contractor(project_id: int, request: Request, db: Session = Depends(get_db)):
+async def manage_project_contractor(project_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
     user = request.session.get("user")
     if not user:
         raise HTTPException(status_code=401, detail="請先登入")
 
-    project = db.query(models.Project).filter(models.Project.id == project_id).first()
+    project = await db.scalar(select(models.Project).filter(models.Project.id == project_id))
     if not project:
         raise HTTPException(status_code=404, detail="專案不存在")
 
     # 確認只有承包人可看
-    if project.contractor.id != user["id"]:
+    if project.assigned_contractor_id != user["id"]:
         raise HTTPException(status_code=403, detail="無權限檢視此頁面")
     
     if project.status == "closed":
@@ -90,3 +97,162 @@ async def manage_project_contractor(project_id: int, request: Request, db: Sessi
     flash = request.session.pop("flash", None)
 
     return templates.TemplateResponse("upload_project.html", {"request": request, "project": project, "user": user, "flash": flash})
+
+
+# =========================
+# 可續傳上傳(仿 tus 1.0): 建立 → PATCH 各段 → HEAD 查詢 offset → finalize
+# =========================
+TUS_HEADERS = {"Tus-Resumable": "1.0.0"}
+RESUMABLE_STAGES = ("in_process", "final")
+
+async def get_uploadable_project(db, project_id, user):
+    project = await db.scalar(select(models.Project).filter(models.Project.id == project_id))
+    if not project:
+        raise HTTPException(status_code=404, detail="專案不存在")
+    if project.assigned_contractor_id != user["id"]:
+        raise HTTPException(status_code=403, detail="無權限上傳此專案")
+    if project.status == "closed":
+        raise HTTPException(status_code=403, detail="專案已結案，無法上傳")
+    return project
+
+def load_upload_session(upload_id, user):
+    try:
+        info = resumable.load(upload_id)
+    except resumable.SessionNotFound:
+        raise HTTPException(status_code=404, detail="上傳工作階段不存在或已過期")
+    if info["user_id"] != user["id"]:
+        raise HTTPException(status_code=404, detail="上傳工作階段不存在或已過期")
+    return info
+
+def require_user(request: Request):
+    user = request.session.get("user")
+    if not user:
+        raise HTTPException(status_code=401, detail="未登入")
+    return user
+
+# POST 建立上傳工作階段
+# 標頭: Upload-Length、Upload-Metadata(project_id、stage、filename，值以 base64 編碼)
+@router.post("/resumable")
+async def create_resumable_upload(request: Request, db: AsyncSession = Depends(get_async_db)):
+    user = require_user(request)
+
+    length = request.headers.get("upload-length", "")
+    if not length.isdigit():
+        raise HTTPException(status_code=400, detail="缺少 Upload-Length")
+    length = int(length)
+    if UPLOAD_MAX_BYTES and length > UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="檔案過大")
+
+    try:
+        metadata = resumable.parse_metadata(request.headers.get("upload-metadata"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not metadata.get("project_id", "").isdigit() or metadata.get("stage") not in RESUMABLE_STAGES or not metadata.get("filename"):
+        raise HTTPException(status_code=400, detail="Upload-Metadata 需包含 project_id、stage、filename")
+
+    project = await get_uploadable_project(db, int(metadata["project_id"]), user)
+    upload_id = await asyncio.to_thread(resumable.create, user["id"], project.id, metadata["stage"], metadata["filename"], length)
+
+    return Response(status_code=201, headers={"Location": f"/upload/resumable/{upload_id}", **TUS_HEADERS})
+
+# HEAD 查詢目前 offset(中斷後從這裡接續)；Upload-Ranges 列出平行上傳時已收到的所有區間
+@router.head("/resumable/{upload_id}")
+def resumable_upload_offset(upload_id: str, request: Request):
+    user = require_user(request)
+    info = load_upload_session(upload_id, user)
+    try:
+        ranges = resumable.received_ranges(upload_id)
+    except resumable.SessionNotFound:
+        raise HTTPException(status_code=404, detail="上傳工作階段不存在或已過期")
+    offset = ranges[0][1] if ranges and ranges[0][0] == 0 else 0
+
+    return Response(headers={
+        "Upload-Offset": str(offset),
+        "Upload-Length": str(info["length"]),
+        "Upload-Ranges": ",".join(f"{start}-{end - 1}" for start, end in ranges),
+        "Cache-Control": "no-store",
+        **TUS_HEADERS,
+    })
+
+# PATCH 從 Upload-Offset 開始寫入一段資料；不同 offset 的段落可以同時上傳
+@router.patch("/resumable/{upload_id}")
+async def patch_resumable_upload(upload_id: str, request: Request):
+    user = require_user(request)
+    info = load_upload_session(upload_id, user)
+
+    if request.headers.get("content-type") != "application/offset+octet-stream":
+        raise HTTPException(status_code=415, detail="Content-Type 需為 application/offset+octet-stream")
+    offset = request.headers.get("upload-offset", "")
+    if not offset.isdigit() or int(offset) > info["length"]:
+        raise HTTPException(status_code=400, detail="Upload-Offset 錯誤")
+    offset = int(offset)
+    limit = info["length"] - offset
+
+    try:
+        tmp_path, out = await asyncio.to_thread(resumable.open_part, upload_id)
+    except resumable.SessionNotFound:
+        raise HTTPException(status_code=404, detail="上傳工作階段不存在或已過期")
+
+    # 收到的資料累積到 UPLOAD_CHUNK_SIZE 才交給 thread 寫入；連線中斷時已收到的部分照樣保留
+    received = 0
+    buffer = bytearray()
+    try:
+        async for chunk in request.stream():
+            if received + len(chunk) > limit:
+                buffer += chunk[:limit - received]
+                raise HTTPException(status_code=400, detail="超過宣告的檔案長度")
+            received += len(chunk)
+            buffer += chunk
+            if len(buffer) >= UPLOAD_CHUNK_SIZE:
+                await asyncio.to_thread(out.write, buffer)
+                buffer = bytearray()
+    except ClientDisconnect:
+        pass
+    finally:
+        if buffer:
+            await asyncio.to_thread(out.write, buffer)
+        await asyncio.to_thread(resumable.close_part, upload_id, offset, tmp_path, out)
+
+    new_offset = await asyncio.to_thread(resumable.current_offset, upload_id)
+    return Response(status_code=204, headers={"Upload-Offset": str(new_offset), **TUS_HEADERS})
+
+# POST 所有段落收齊後，組合並放進專案的 in_process / final 資料夾
+@router.post("/resumable/{upload_id}/finalize")
+async def finalize_resumable_upload(
+    upload_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    user = require_user(request)
+    info = load_upload_session(upload_id, user)
+    project = await get_uploadable_project(db, info["project_id"], user)
+
+    folder = datetime.now().strftime("%Y-%m-%d_%H-%M")
+    stage_path = f"upload_file/{project.title}/{info['stage']}/{folder}"
+    file_path = os.path.join(stage_path, info["filename"])
+
+    try:
+        size, digest = await asyncio.to_thread(resumable.finalize, upload_id, file_path)
+    except resumable.SessionNotFound:
+        raise HTTPException(status_code=404, detail="上傳工作階段不存在或已過期")
+    except resumable.UploadIncomplete:
+        raise HTTPException(status_code=409, detail="檔案尚未上傳完成")
+
+    await record_project_file(db, project.id, info["stage"], folder, info["filename"], size, digest, user["id"])
+    if info["stage"] == "final":
+        await jobs.aenqueue(db, "build_archive", {"path": stage_path}, key=f"build_archive:{stage_path}:{digest}")
+    await db.commit()
+
+    return {"path": file_path, "size": size, "sha256": digest}
+
+# DELETE 放棄上傳
+@router.delete("/resumable/{upload_id}")
+def delete_resumable_upload(upload_id: str, request: Request):
+    user = require_user(request)
+    load_upload_session(upload_id, user)
+    try:
+        resumable.delete(upload_id)
+    except resumable.SessionNotFound:
+        raise HTTPException(status_code=404, detail="上傳工作階段不存在或已過期")
+
+    return Response(status_code=204, headers=TUS_HEADERS)
@@ -0,0 +1,95 @@
+# scheduler.py
+# 背景排程: 定期把超過報價截止時間的專案改為 noBid，取代在列表頁逐筆更新；並回收過期的續傳上傳工作階段、session、已完成的背景工作
+# 與沒有參照的 blob(報價失敗時 stage_upload 已存好的計劃書)
+import asyncio
+import logging
+import os
+from datetime import datetime
+from sqlalchemy import update
+from database import AsyncSessionLocal
+import blobstore
+import jobs
+import models
+import page_cache
+import resumable
+import sessions
+
+logger = logging.getLogger(__name__)
+
+# 掃描間隔(秒)，0 代表不啟動排程
+DEADLINE_SWEEP_INTERVAL = float(os.getenv("DEADLINE_SWEEP_INTERVAL", "60"))
+UPLOAD_SESSION_GC_INTERVAL = float(os.getenv("UPLOAD_SESSION_GC_INTERVAL", "3600"))
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "600"))
+JOB_PURGE_INTERVAL = float(os.getenv("JOB_PURGE_INTERVAL", "3600"))
+BLOB_GC_INTERVAL = float(os.getenv("BLOB_GC_INTERVAL", "3600"))
+
+_tasks = []
+
+async def expire_overdue_projects():
+    """一條 UPDATE 將所有過期的 open 專案改為 noBid，回傳更新筆數"""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            update(models.Project)
+            .where(models.Project.status == "open", models.Project.proposal_deadline < datetime.now())
+            .values(status="noBid", version=models.Project.version + 1)
+        )
+        await db.commit()
+        return result.rowcount
+
+async def sweep_deadlines():
+    expired = await expire_overdue_projects()
+    if expired:
+        await page_cache.ainvalidate(page_cache.AVAILABLE_PROJECTS)
+        logger.info("已將 %d 個過期專案設為 noBid", expired)
+
+async def sweep_upload_sessions():
+    removed = await asyncio.to_thread(resumable.gc_stale)
+    if removed:
+        logger.info("已刪除 %d 個過期的上傳工作階段", removed)
+
+async def sweep_sessions():
+    removed = await asyncio.to_thread(sessions.store.sweep)
+    if removed:
+        logger.info("已刪除 %d 個過期的 session", removed)
+
+async def purge_jobs():
+    removed = await asyncio.to_thread(jobs.purge_finished)
+    if removed:
+        logger.info("已刪除 %d 筆已完成的背景工作", removed)
+
+async def sweep_blobs():
+    removed = await asyncio.to_thread(blobstore.gc)
+    if removed:
+        logger.info("已刪除 %d 個未被參照的 blob", removed)
+
+async def _run_forever(interval, job):
+    while True:
+        try:
+            await job()
+        except Exception:
+            logger.exception("排程工作 %s 失敗", job.__name__)
+        await asyncio.sleep(interval)
+
+def start():
+    if _tasks:
+        return
+    loop = asyncio.get_running_loop()
+    sweeps = (
+        (DEADLINE_SWEEP_INTERVAL, sweep_deadlines),
+        (UPLOAD_SESSION_GC_INTERVAL, sweep_upload_sessions),
+        (SESSION_SWEEP_INTERVAL, sweep_sessions),
+        (JOB_PURGE_INTERVAL, purge_jobs),
+        (BLOB_GC_INTERVAL, sweep_blobs),
+    )
+    for interval, job in sweeps:
+        if interval > 0:
+            _tasks.append(loop.create_task(_run_forever(interval, job)))
+
+async def stop():
+    for task in _tasks:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    _tasks.clear()
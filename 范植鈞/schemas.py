@@ -12,7 +12,8 @@ class UserCreate(BaseModel):
 class UserOut(BaseModel):
     id: int
     username: str
-    email: EmailStr
+    # 輸出資料庫中已存的 email，不再驗證格式(註冊表單未驗證，舊資料可能不符合 EmailStr)
+    email: str
     role: str
     class Config:
         orm_mode = True
@@ -32,6 +33,7 @@ class ProjectOut(ProjectBase):
     status: str
     close_requested: bool
     create_time: datetime
+    proposal_deadline: datetime
     close_time: Optional[datetime]
     close_explanation: Optional[str]
 
@@ -68,3 +70,18 @@ class BidOut(BidBase):
 
     class Config:
         orm_mode = True
+
+# 上傳檔案
+class ProjectFileOut(BaseModel):
+    id: int
+    project_id: int
+    stage: str
+    folder: str
+    filename: str
+    size: int
+    sha256: str
+    uploader_id: Optional[int]
+    upload_time: datetime
+
+    class Config:
+        orm_mode = True
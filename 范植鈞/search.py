@@ -0,0 +1,68 @@
+# search.py
+# 專案全文檢索: projects.search_vector 由資料庫產生並建 GIN 索引(見 models.Project)
+# 查詢字串的每個詞都做前綴比對；中日韓文字拆成單字後以相鄰(<->)比對，等同子字串搜尋
+import os
+import re
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import with_expression
+import models
+
+# 查詢字串最多取用的詞數
+SEARCH_MAX_TERMS = 10
+# 依相關度排序時只計算最新的這幾筆符合結果的 rank；常見詞可能符合數十萬筆，全部計算需要數百毫秒以上，0 代表不限制
+# 超過時頁面與 API 會標示結果已截斷(見 rank_truncated)
+SEARCH_RANK_CANDIDATES = int(os.getenv("SEARCH_RANK_CANDIDATES", "1000"))
+PROJECT_STATUSES = ("open", "in_process", "request_close", "closed", "noBid")
+
+# 中日韓單字，或不含 tsquery 運算子的其他連續字元(如 node.js 交給 Postgres 的 parser 處理)
+_TOKEN = re.compile(rf"({models.SEARCH_CJK_PATTERN})|((?:(?!{models.SEARCH_CJK_PATTERN})[^\s&|!():*<>'\\])+)")
+
+def to_tsquery_text(q):
+    """把使用者輸入轉為 to_tsquery 的語法，例如 "網站 react" -> "(網 <-> 站) & (react:*)"；沒有可搜尋的詞時回傳 None"""
+    terms = []
+    for word in (q or "").split()[:SEARCH_MAX_TERMS]:
+        lexemes = [cjk or f"{other.lower()}:*" for cjk, other in _TOKEN.findall(word) if cjk or re.search(r"\w", other)]
+        if lexemes:
+            terms.append("(" + " <-> ".join(lexemes) + ")")
+    return " & ".join(terms) or None
+
+def _conditions(query, user, statuses):
+    conditions = [
+        models.Project.search_vector.op("@@")(query),
+        or_(
+            models.Project.status == "open",
+            models.Project.client_id == user["id"],
+            models.Project.assigned_contractor_id == user["id"],
+        ),
+    ]
+    if statuses:
+        conditions.append(models.Project.status.in_(statuses))
+    return conditions
+
+def search_statement(stmt, q, user, statuses=None, ranked=True):
+    """替 select(Project) 加上全文檢索條件，並把相關度填入 Project.search_rank，回傳 (查詢, rank 運算式)
+    非 open 的專案只有委託人與被指派的接案人搜尋得到；ranked 為 True(依相關度排序)時只在最新的候選結果中排名"""
+    query_text = to_tsquery_text(q)
+    if query_text is None:
+        return stmt.filter(False), None
+    query = func.to_tsquery("simple", query_text)
+    rank = func.ts_rank_cd(models.Project.search_vector, query)
+    conditions = _conditions(query, user, statuses)
+    if ranked and SEARCH_RANK_CANDIDATES:
+        candidates = (
+            select(models.Project.id).filter(*conditions)
+            .order_by(models.Project.create_time.desc()).limit(SEARCH_RANK_CANDIDATES)
+        )
+        stmt = stmt.filter(models.Project.id.in_(candidates))
+    else:
+        stmt = stmt.filter(*conditions)
+    return stmt.options(with_expression(models.Project.search_rank, rank)), rank
+
+async def rank_truncated(db, q, user, statuses=None):
+    """符合的專案是否超過 SEARCH_RANK_CANDIDATES 筆，即依相關度排序時較舊的結果不會出現；只數到上限加一筆就停止"""
+    query_text = to_tsquery_text(q)
+    if query_text is None or not SEARCH_RANK_CANDIDATES:
+        return False
+    matches = select(models.Project.id).filter(*_conditions(func.to_tsquery("simple", query_text), user, statuses))
+    count = await db.scalar(select(func.count()).select_from(matches.limit(SEARCH_RANK_CANDIDATES + 1).subquery()))
+    return count > SEARCH_RANK_CANDIDATES
@@ -0,0 +1,201 @@
+# sessions.py
+# 伺服器端 session: cookie 只帶簽章過的 session id，內容存在伺服器端，路由照樣使用 request.session
+# SESSION_BACKEND: memory(每個 worker 各自的 LRU，單一 worker 時使用)、sqlite(同一台機器的多個 worker 共用)、redis
+# 內容沒有變動時不寫入 store 也不回傳 Set-Cookie；登入身分改變時換發新的 session id
+import asyncio
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from itsdangerous import BadSignature, Signer
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_SECRET_KEY = os.getenv("SESSION_SECRET_KEY", "super-secret-session-key")
+# session 有效時間(秒)，超過一半時間沒有更新時會自動延長
+SESSION_MAX_AGE = int(os.getenv("SESSION_MAX_AGE", str(14 * 24 * 60 * 60)))
+# memory: 每個 worker 最多保留的 session 數，超過時淘汰最久沒用到的
+SESSION_MEMORY_MAX_ENTRIES = int(os.getenv("SESSION_MEMORY_MAX_ENTRIES", "100000"))
+SESSION_SQLITE_PATH = os.getenv("SESSION_SQLITE_PATH", "sessions.sqlite3")
+SESSION_REDIS_URL = os.getenv("SESSION_REDIS_URL", "redis://localhost:6379/0")
+
+class MemorySessionStore:
+    def __init__(self, max_entries=SESSION_MEMORY_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def load(self, sid):
+        """回傳 (內容 JSON, 到期時間) 或 None"""
+        with self._lock:
+            item = self._data.get(sid)
+            if item is None:
+                return None
+            if item[1] < time.time():
+                del self._data[sid]
+                return None
+            self._data.move_to_end(sid)
+            return item
+
+    async def save(self, sid, data, expires):
+        with self._lock:
+            self._data[sid] = (data, expires)
+            self._data.move_to_end(sid)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    async def delete(self, sid):
+        with self._lock:
+            self._data.pop(sid, None)
+
+    def sweep(self):
+        """刪除已過期的 session，回傳刪除數"""
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, (data, expires) in self._data.items() if expires < now]
+            for sid in expired:
+                del self._data[sid]
+        return len(expired)
+
+class SQLiteSessionStore:
+    def __init__(self, path=SESSION_SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data TEXT NOT NULL, expires REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_sessions_expires ON sessions (expires)")
+
+    def _connect(self):
+        # 每個 thread 一條連線；WAL 讓多個 worker 可以同時讀
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _load(self, sid):
+        return self._connect().execute(
+            "SELECT data, expires FROM sessions WHERE id = ? AND expires >= ?", (sid, time.time())
+        ).fetchone()
+
+    def _save(self, sid, data, expires):
+        self._connect().execute(
+            "INSERT INTO sessions (id, data, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET data = excluded.data, expires = excluded.expires",
+            (sid, data, expires),
+        )
+
+    def _delete(self, sid):
+        self._connect().execute("DELETE FROM sessions WHERE id = ?", (sid,))
+
+    async def load(self, sid):
+        return await asyncio.to_thread(self._load, sid)
+
+    async def save(self, sid, data, expires):
+        await asyncio.to_thread(self._save, sid, data, expires)
+
+    async def delete(self, sid):
+        await asyncio.to_thread(self._delete, sid)
+
+    def sweep(self):
+        return self._connect().execute("DELETE FROM sessions WHERE expires < ?", (time.time(),)).rowcount
+
+class RedisSessionStore:
+    def __init__(self, url=SESSION_REDIS_URL):
+        import redis.asyncio
+        self._redis = redis.asyncio.from_url(url)
+
+    def _key(self, sid):
+        return f"session:{sid}"
+
+    async def load(self, sid):
+        value = await self._redis.get(self._key(sid))
+        if value is None:
+            return None
+        expires, data = json.loads(value)
+        return data, expires
+
+    async def save(self, sid, data, expires):
+        ttl = max(int(expires - time.time()), 1)
+        await self._redis.set(self._key(sid), json.dumps([expires, data]), ex=ttl)
+
+    async def delete(self, sid):
+        await self._redis.delete(self._key(sid))
+
+    def sweep(self):
+        # 由 Redis 的 TTL 自行過期
+        return 0
+
+def create_store(backend=SESSION_BACKEND):
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    if backend == "redis":
+        return RedisSessionStore()
+    return MemorySessionStore()
+
+store = create_store()
+
+class ServerSessionMiddleware:
+    """用法與 starlette 的 SessionMiddleware 相同，但 cookie 只存放簽章過的 session id"""
+
+    def __init__(self, app, store=store, secret_key=SESSION_SECRET_KEY, session_cookie="session",
+                 max_age=SESSION_MAX_AGE, path="/", same_site="lax", https_only=False):
+        self.app = app
+        self.store = store
+        self.signer = Signer(secret_key, salt="session-id")
+        self.session_cookie = session_cookie
+        self.max_age = max_age
+        self.cookie_flags = f"path={path}; httponly; samesite={same_site}" + ("; secure" if https_only else "")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        cookie = HTTPConnection(scope).cookies.get(self.session_cookie)
+        sid = None
+        initial_data, expires = "{}", 0
+        if cookie:
+            try:
+                sid = self.signer.unsign(cookie).decode()
+            except BadSignature:
+                sid = None
+        if sid:
+            loaded = await self.store.load(sid)
+            if loaded:
+                initial_data, expires = loaded
+            else:
+                sid = None
+        scope["session"] = json.loads(initial_data)
+        initial_user = scope["session"].get("user")
+
+        async def send_wrapper(message):
+            nonlocal sid
+            if message["type"] == "http.response.start":
+                session = scope["session"]
+                headers = MutableHeaders(scope=message)
+                if session:
+                    data = json.dumps(session, ensure_ascii=False, separators=(",", ":"))
+                    now = time.time()
+                    if sid is None or data != initial_data or expires - now < self.max_age / 2:
+                        # 登入、登出或換帳號時換發新 id，避免 session fixation
+                        if sid is None or session.get("user") != initial_user:
+                            if sid:
+                                await self.store.delete(sid)
+                            sid = secrets.token_urlsafe(32)
+                        await self.store.save(sid, data, now + self.max_age)
+                        value = self.signer.sign(sid).decode()
+                        headers.append("Set-Cookie", f"{self.session_cookie}={value}; Max-Age={self.max_age}; {self.cookie_flags}")
+                elif cookie:
+                    if sid:
+                        await self.store.delete(sid)
+                    headers.append("Set-Cookie", f"{self.session_cookie}=null; expires=Thu, 01 Jan 1970 00:00:00 GMT; {self.cookie_flags}")
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,316 @@
+# storage.py
+# 檔案下載的儲存後端: 應用程式只做權限檢查，實際檔案傳輸交給 nginx 或物件儲存
+#   local: 直接送檔；設定 ACCEL_REDIRECT_PREFIX 時改回傳 X-Accel-Redirect 由 nginx 送檔，
+#          設定 STORAGE_SIGNED_URLS 時改導向有時效的 HMAC 簽章網址 /files/...(需設定 STORAGE_SIGNING_KEY)
+#   s3:    檔案另存到 S3 相容儲存(如 MinIO)，下載時導向 presigned URL
+# nginx 設定範例(ACCEL_REDIRECT_PREFIX=/protected/):
+#   location /protected/ { internal; alias /path/to/范植鈞/; }
+import functools
+import hashlib
+import hmac
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import quote, urlencode
+from fastapi import HTTPException
+from fastapi.responses import FileResponse, RedirectResponse, Response, StreamingResponse
+import blobstore
+
+logger = logging.getLogger(__name__)
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+STORAGE_ROOT = os.getenv("STORAGE_ROOT", ".")
+ACCEL_REDIRECT_PREFIX = os.getenv("ACCEL_REDIRECT_PREFIX", "")
+STORAGE_SIGNED_URLS = os.getenv("STORAGE_SIGNED_URLS", "false").lower() in ("1", "true", "yes")
+# 簽章網址有效秒數與簽章金鑰；啟用簽章網址時必須設定金鑰，不提供預設值(知道預設值就能偽造網址)
+SIGNED_URL_TTL = int(os.getenv("SIGNED_URL_TTL", "300"))
+STORAGE_SIGNING_KEY = os.getenv("STORAGE_SIGNING_KEY", "").encode()
+if STORAGE_SIGNED_URLS and not STORAGE_SIGNING_KEY:
+    raise RuntimeError("STORAGE_SIGNED_URLS 需要設定 STORAGE_SIGNING_KEY")
+
+# Range 回應每次讀取的大小
+RANGE_CHUNK_SIZE = 64 * 1024
+
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")
+S3_BUCKET = os.getenv("S3_BUCKET", "freelance-platform")
+S3_ACCESS_KEY = os.getenv("S3_ACCESS_KEY")
+S3_SECRET_KEY = os.getenv("S3_SECRET_KEY")
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+# 記住已確認存在的物件 key 數量，下載時不必每次 head_object
+S3_KNOWN_KEYS = int(os.getenv("S3_KNOWN_KEYS", "4096"))
+
+def content_disposition(filename):
+    # 支援中文檔名
+    return f"attachment; filename*=UTF-8''{quote(filename)}"
+
+def sign(key, expires):
+    if not STORAGE_SIGNING_KEY:
+        raise RuntimeError("未設定 STORAGE_SIGNING_KEY，無法產生簽章網址")
+    message = f"{key}:{expires}".encode()
+    return hmac.new(STORAGE_SIGNING_KEY, message, hashlib.sha256).hexdigest()
+
+def verify_signature(key, expires, signature):
+    if not STORAGE_SIGNING_KEY or expires < time.time():
+        return False
+    return hmac.compare_digest(sign(key, expires), signature)
+
+@functools.lru_cache(maxsize=4096)
+def _content_hash(path, size, mtime_ns):
+    return blobstore.hash_file(path)
+
+def file_etag(path, st):
+    """以內容雜湊作為 strong ETag；blob 與 zip 快取的檔名本身就是雜湊，不必再計算"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    if not re.fullmatch(r"[0-9a-f]{64}", name):
+        name = _content_hash(path, st.st_size, st.st_mtime_ns)
+    return f'"{name}"'
+
+def is_not_modified(request, etag, mtime):
+    """If-None-Match 優先，沒有時才看 If-Modified-Since"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip() for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def parse_ranges(header, size):
+    """解析 Range: bytes=...，回傳排序並合併後的 [(start, end)](含 end)
+    格式不符或不是 bytes 時回傳 None(忽略 Range 送出整個檔案)；沒有可滿足的範圍時回傳 []"""
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes":
+        return None
+    ranges = []
+    for part in spec.split(","):
+        start, sep, end = part.strip().partition("-")
+        if not sep:
+            return None
+        try:
+            if not start.strip():
+                # bytes=-N: 最後 N 個位元組
+                length = int(end)
+                if length > 0 and size:
+                    ranges.append((max(size - length, 0), size - 1))
+                continue
+            start = int(start)
+            end = int(end) if end.strip() else size - 1
+        except ValueError:
+            return None
+        if start >= size:
+            continue
+        if start > end:
+            return None
+        ranges.append((start, min(end, size - 1)))
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def _iter_file(path, ranges, parts=None):
+    """依序讀出各範圍；parts 為多段回應時每段前的標頭與最後的結尾"""
+    with open(path, "rb") as f:
+        for i, (start, end) in enumerate(ranges):
+            if parts:
+                yield parts[i]
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(RANGE_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+            if parts:
+                yield b"\r\n"
+        if parts:
+            yield parts[-1]
+
+def range_response(path, st, media_type, headers, request):
+    """處理 Range / If-Range: If-Range 與本模組的 ETag 或 Last-Modified 相同時才回應部分內容(206)，否則送出整個檔案
+    只用 starlette 的公開介面，不依賴 FileResponse 內部各版本不同的 Range 實作"""
+    size = st.st_size
+    http_if_range = request.headers.get("if-range")
+    ranges = parse_ranges(request.headers["range"], size)
+    if http_if_range is not None and http_if_range not in (headers["ETag"], headers["Last-Modified"]):
+        ranges = None
+    if ranges is None:
+        return StreamingResponse(_iter_file(path, [(0, size - 1)] if size else []), media_type=media_type,
+                                 headers={**headers, "Content-Length": str(size)})
+    if not ranges:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        return StreamingResponse(_iter_file(path, ranges), status_code=206, media_type=media_type, headers={
+            **headers, "Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(end - start + 1),
+        })
+    boundary = uuid.uuid4().hex
+    parts = [
+        f"--{boundary}\r\nContent-Type: {media_type}\r\nContent-Range: bytes {start}-{end}/{size}\r\n\r\n".encode()
+        for start, end in ranges
+    ] + [f"--{boundary}--\r\n".encode()]
+    length = sum(len(part) for part in parts) + sum(end - start + 1 + 2 for start, end in ranges)
+    return StreamingResponse(_iter_file(path, ranges, parts), status_code=206,
+                             media_type=f"multipart/byteranges; boundary={boundary}",
+                             headers={**headers, "Content-Length": str(length)})
+
+class LocalStorage:
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def path(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        if os.path.commonpath([self.root, path]) != self.root:
+            raise HTTPException(status_code=400, detail="無效的檔案路徑")
+        return path
+
+    def key_for(self, local_path):
+        return os.path.relpath(os.path.abspath(local_path), self.root).replace(os.sep, "/")
+
+    def put_file(self, local_path, key):
+        target = self.path(key)
+        if os.path.abspath(local_path) != target:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(local_path, target)
+
+    def exists(self, key):
+        return os.path.isfile(self.path(key))
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def signed_url(self, key, filename):
+        expires = int(time.time()) + SIGNED_URL_TTL
+        query = urlencode({"expires": expires, "sig": sign(key, expires), "filename": filename})
+        return f"/files/{quote(key)}?{query}"
+
+    def send(self, key, filename, media_type, request=None):
+        """直接回應檔案內容(nginx 可代送時只回傳 X-Accel-Redirect 標頭)
+        支援 ETag / Last-Modified 條件式請求(304)，Range 與多段 Range(206)見 range_response"""
+        if not self.exists(key):
+            raise HTTPException(status_code=404, detail="檔案不存在")
+        path = self.path(key)
+        st = os.stat(path)
+        validators = {"ETag": file_etag(path, st), "Last-Modified": formatdate(st.st_mtime, usegmt=True)}
+        if request is not None and is_not_modified(request, validators["ETag"], st.st_mtime):
+            return Response(status_code=304, headers=validators)
+        headers = {"Content-Disposition": content_disposition(filename), "Accept-Ranges": "bytes", **validators}
+        if ACCEL_REDIRECT_PREFIX:
+            headers["X-Accel-Redirect"] = ACCEL_REDIRECT_PREFIX + quote(key)
+            return Response(media_type=media_type, headers=headers)
+        if request is not None and "range" in request.headers:
+            return range_response(path, st, media_type, headers, request)
+        return FileResponse(path, media_type=media_type, headers=headers, stat_result=st)
+
+    def serve(self, key, filename, media_type="application/octet-stream", request=None):
+        if STORAGE_SIGNED_URLS:
+            return RedirectResponse(self.signed_url(key, filename), status_code=302)
+        return self.send(key, filename, media_type, request)
+
+class S3Storage:
+    def __init__(self):
+        # 只有使用 s3 後端時才需要安裝 boto3
+        import boto3
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=S3_ENDPOINT_URL,
+            aws_access_key_id=S3_ACCESS_KEY,
+            aws_secret_access_key=S3_SECRET_KEY,
+            region_name=S3_REGION,
+        )
+        self.local = LocalStorage(STORAGE_ROOT)
+        # 已上傳或確認存在的 key(LRU)；zip 快取的 key 是內容雜湊，物件存在後內容不會變，只會被 delete 移除
+        self._known = OrderedDict()
+        self._known_lock = threading.Lock()
+
+    def _remember(self, key):
+        with self._known_lock:
+            self._known[key] = True
+            self._known.move_to_end(key)
+            while len(self._known) > S3_KNOWN_KEYS:
+                self._known.popitem(last=False)
+
+    def key_for(self, local_path):
+        return self.local.key_for(local_path)
+
+    def put_file(self, local_path, key):
+        self.client.upload_file(local_path, S3_BUCKET, key)
+        self._remember(key)
+
+    def exists(self, key):
+        with self._known_lock:
+            if key in self._known:
+                self._known.move_to_end(key)
+                return True
+        try:
+            self.client.head_object(Bucket=S3_BUCKET, Key=key)
+        except self.client.exceptions.ClientError:
+            return False
+        self._remember(key)
+        return True
+
+    def delete(self, key):
+        with self._known_lock:
+            self._known.pop(key, None)
+        self.client.delete_object(Bucket=S3_BUCKET, Key=key)
+
+    def signed_url(self, key, filename, media_type="application/octet-stream"):
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": S3_BUCKET,
+                "Key": key,
+                "ResponseContentDisposition": content_disposition(filename),
+                "ResponseContentType": media_type,
+            },
+            ExpiresIn=SIGNED_URL_TTL,
+        )
+
+    def serve(self, key, filename, media_type="application/octet-stream", request=None):
+        # publish 失敗(只記錄)或物件已被刪除時，改由本機檔案送出，不導向不存在的物件
+        # 已知存在的 key 不再查詢物件儲存；其他 worker 淘汰快取時本機檔案也已刪除，lookup 不會命中，不會導向已刪除的物件
+        if not self.exists(key):
+            logger.warning("儲存後端沒有 %s，改由本機送出", key)
+            return self.local.send(key, filename, media_type, request)
+        # Range 與條件式請求由物件儲存處理
+        return RedirectResponse(self.signed_url(key, filename, media_type), status_code=302)
+
+def _create_backend():
+    if STORAGE_BACKEND == "s3":
+        return S3Storage()
+    return LocalStorage(STORAGE_ROOT)
+
+backend = _create_backend()
+
+def publish(local_path):
+    """把本機產生的檔案放到儲存後端，回傳 key；上傳失敗只記錄，不影響本次下載"""
+    key = backend.key_for(local_path)
+    try:
+        backend.put_file(local_path, key)
+    except Exception:
+        logger.exception("檔案上傳到儲存後端失敗: %s", key)
+    return key
+
+def unpublish(local_path):
+    """刪除儲存後端上對應本機檔案的物件；失敗只記錄"""
+    key = backend.key_for(local_path)
+    try:
+        backend.delete(key)
+    except Exception:
+        logger.exception("刪除儲存後端的檔案失敗: %s", key)
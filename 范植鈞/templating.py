@@ -0,0 +1,101 @@
+# templating.py
+# 所有路由共用同一個 Jinja2 環境: 編譯結果存在磁碟(bytecode cache)，worker 重啟時不必重新編譯
+# {% cache key, ... %}...{% endcache %} 把片段的渲染結果快取在記憶體(每個 worker 一份 LRU)，key 需包含版本號才能在資料變動時失效
+# 並記錄每個模板的渲染次數與耗時，可由 /internal/templates 查看
+import os
+import threading
+import time
+from collections import OrderedDict
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, nodes
+from jinja2.ext import Extension
+
+TEMPLATE_DIR = "templates"
+TEMPLATE_BYTECODE_CACHE_DIR = os.getenv("TEMPLATE_BYTECODE_CACHE_DIR", "template_cache")
+# 片段快取最多保留的筆數，0 代表停用
+TEMPLATE_FRAGMENT_CACHE_SIZE = int(os.getenv("TEMPLATE_FRAGMENT_CACHE_SIZE", "5000"))
+
+_lock = threading.Lock()
+render_stats = {}
+fragment_stats = {"hits": 0, "misses": 0}
+
+class FragmentCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+
+    def get(self, key):
+        with _lock:
+            value = self._data.get(key)
+            if value is None:
+                fragment_stats["misses"] += 1
+                return None
+            self._data.move_to_end(key)
+            fragment_stats["hits"] += 1
+            return value
+
+    def set(self, key, value):
+        if not self.max_entries:
+            return
+        with _lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+fragment_cache = FragmentCache(TEMPLATE_FRAGMENT_CACHE_SIZE)
+
+class FragmentCacheExtension(Extension):
+    """{% cache "project-card", project.id, project.version %}...{% endcache %}"""
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key_parts = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            key_parts.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(self.call_method("_render", [nodes.List(key_parts)]), [], [], body).set_lineno(lineno)
+
+    def _render(self, key_parts, caller):
+        key = tuple(key_parts)
+        value = fragment_cache.get(key)
+        if value is None:
+            value = caller()
+            fragment_cache.set(key, value)
+        return value
+
+def _record_render(name, elapsed):
+    with _lock:
+        stat = render_stats.setdefault(name, {"renders": 0, "total_ms": 0.0, "max_ms": 0.0})
+        stat["renders"] += 1
+        stat["total_ms"] += elapsed * 1000
+        stat["max_ms"] = max(stat["max_ms"], elapsed * 1000)
+
+class TimedJinja2Templates(Jinja2Templates):
+    def TemplateResponse(self, *args, **kwargs):
+        # starlette 在建立 response 時就完成渲染
+        start = time.perf_counter()
+        response = super().TemplateResponse(*args, **kwargs)
+        _record_render(response.template.name, time.perf_counter() - start)
+        return response
+
+def template_status():
+    with _lock:
+        renders = {
+            name: {**stat, "avg_ms": stat["total_ms"] / stat["renders"]}
+            for name, stat in render_stats.items()
+        }
+        return {"renders": renders, "fragments": {**fragment_stats, "entries": len(fragment_cache)}}
+
+os.makedirs(TEMPLATE_BYTECODE_CACHE_DIR, exist_ok=True)
+env = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    autoescape=True,
+    bytecode_cache=FileSystemBytecodeCache(TEMPLATE_BYTECODE_CACHE_DIR),
+    extensions=[FragmentCacheExtension],
+)
+templates = TimedJinja2Templates(env=env)
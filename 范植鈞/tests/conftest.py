@@ -0,0 +1,127 @@
+# 測試共用設定
+# 需要資料庫的測試使用一個可以清空的 Postgres 資料庫(每次執行會重建 public schema):
+#   TEST_DATABASE_URL=postgresql://user:pw@localhost/platform_test python -m pytest tests
+# 未設定 TEST_DATABASE_URL 時略過這些測試
+# app 以相對路徑讀寫 templates、upload_file 等目錄，測試在暫存目錄中執行(templates 以連結指回 app)
+import itertools
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+if TEST_DATABASE_URL:
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+    os.environ["ASYNC_DATABASE_URL"] = TEST_DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+# 模組載入時讀取的設定，需在 import app 之前設定
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("SESSION_BACKEND", "memory")
+os.environ.setdefault("PAGE_CACHE_BACKEND", "memory")
+# 列表測試以 50 筆一頁
+os.environ.setdefault("PROJECT_PAGE_SIZE", "50")
+
+PASSWORD = "pw"
+_names = itertools.count(1)
+
+# 測試模組在收集時就會 import app 的模組(有些在 import 時建立目錄)，所以在這裡就切換到暫存目錄
+WORKDIR = tempfile.mkdtemp(prefix="platform-test-")
+os.symlink(os.path.join(APP_DIR, "templates"), os.path.join(WORKDIR, "templates"))
+os.chdir(WORKDIR)
+
+@pytest.fixture(scope="session")
+def app():
+    """重建測試資料庫後載入 app(import main 時會套用 migration)"""
+    if not TEST_DATABASE_URL:
+        pytest.skip("未設定 TEST_DATABASE_URL")
+    from sqlalchemy import create_engine
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import NullPool
+
+    engine = create_engine(TEST_DATABASE_URL)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP SCHEMA public CASCADE; CREATE SCHEMA public")
+    engine.dispose()
+
+    import database
+    from main import app
+    # 每個 TestClient 各自一個 event loop，asyncpg 連線不能跨 loop 重用，測試改用不保留連線的 engine
+    database.AsyncSessionLocal.configure(bind=create_async_engine(database.ASYNC_SQLALCHEMY_DATABASE_URL, poolclass=NullPool))
+    return app
+
+@pytest.fixture(scope="session")
+def make_user(app):
+    """建立使用者，回傳 (user id, username)"""
+    import database
+    import models
+    from passwords import hash_password
+
+    hashed = hash_password(PASSWORD)
+
+    def make(role):
+        username = f"test-{role}-{next(_names)}"
+        with database.SessionLocal() as db:
+            user = models.User(username=username, email=f"{username}@example.com", hashed_password=hashed, role=role)
+            db.add(user)
+            db.commit()
+            return user.id, username
+    return make
+
+@pytest.fixture(scope="session")
+def login(app):
+    """回傳已登入的 TestClient"""
+    from fastapi.testclient import TestClient
+
+    def login(username):
+        client = TestClient(app)
+        response = client.post("/auth/login", data={"username": username, "password": PASSWORD}, follow_redirects=False)
+        assert response.status_code == 302
+        return client
+    return login
+
+@pytest.fixture(scope="session")
+def make_projects(app):
+    """替委託人建立 count 個開放專案，bidders 的每個接案人各報價一次，回傳專案 id"""
+    import database
+    import models
+
+    def make(client_id, count, bidders=(), title="test-project"):
+        now = datetime.now()
+        with database.SessionLocal() as db:
+            projects = [
+                models.Project(title=f"{title}-{i}", description="測試專案", client_id=client_id,
+                               create_time=now - timedelta(minutes=i), proposal_deadline=now + timedelta(days=7))
+                for i in range(count)
+            ]
+            db.add_all(projects)
+            db.flush()
+            db.add_all(
+                models.Bid(project_id=project.id, contractor_id=contractor_id, price=1000,
+                           proposal_file=f"upload_proposal/{project.title}/{contractor_id}/proposal.pdf")
+                for project in projects for contractor_id in bidders
+            )
+            db.commit()
+            return [project.id for project in projects]
+    return make
+
+@pytest.fixture
+def count_queries(app):
+    """記錄 sync 與 async engine 送出的 SQL"""
+    from sqlalchemy import event
+    import database
+
+    statements = []
+    engines = [database.engine, database.AsyncSessionLocal.kw["bind"].sync_engine]
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", record)
+    yield statements
+    for engine in engines:
+        event.remove(engine, "before_cursor_execute", record)
@@ -0,0 +1,91 @@
+# JSON API(v1): 列表、單一專案、fields 欄位選擇與目前使用者
+import pytest
+
+@pytest.fixture(scope="module")
+def api(make_user, make_projects, login):
+    client_id, client_name = make_user("client")
+    bidder_id, bidder_name = make_user("contractor")
+    other_id, other_name = make_user("contractor")
+    project_ids = make_projects(client_id, 3, bidders=(bidder_id, other_id), title="api")
+    return {
+        "client_id": client_id, "bidder_id": bidder_id, "other_id": other_id, "project_ids": project_ids,
+        "client": login(client_name), "bidder": login(bidder_name), "other": login(other_name),
+    }
+
+def set_project_status(project_id, status):
+    import database
+    import models
+
+    with database.SessionLocal() as db:
+        db.get(models.Project, project_id).status = status
+        db.commit()
+
+def test_requires_login(app):
+    from fastapi.testclient import TestClient
+
+    client = TestClient(app)
+    for path in ("/api/v1/me", "/api/v1/projects", "/api/v1/bids"):
+        assert client.get(path).status_code == 401
+
+def test_me_with_unvalidated_email(make_user, login):
+    """HTML 註冊不驗證 email 格式，/me 仍要能輸出已存的資料"""
+    import database
+    import models
+
+    user_id, username = make_user("contractor")
+    with database.SessionLocal() as db:
+        db.get(models.User, user_id).email = "co@x"
+        db.commit()
+    client = login(username)
+
+    response = client.get("/api/v1/me")
+    assert response.status_code == 200
+    assert response.json() == {"id": user_id, "username": username, "email": "co@x", "role": "contractor"}
+    assert client.get("/api/v1/me", params={"fields": "username, role"}).json() == {"username": username, "role": "contractor"}
+    assert client.get("/api/v1/me", params={"fields": "password"}).status_code == 400
+
+def test_list_projects(api):
+    ids = api["project_ids"]
+    mine = api["client"].get("/api/v1/projects", params={"scope": "mine"}).json()
+    assert [item["id"] for item in mine["items"]] == ids
+    assert all(item["client_id"] == api["client_id"] and item["status"] == "open" for item in mine["items"])
+
+    bids = api["bidder"].get("/api/v1/projects", params={"scope": "mine", "fields": "id,title"}).json()
+    assert bids["items"] == [{"id": project_id, "title": f"api-{i}"} for i, project_id in enumerate(ids)]
+
+    available = api["bidder"].get("/api/v1/projects", params={"fields": "id"}).json()
+    assert {"id": ids[0]} in available["items"]
+    assert all(set(item) == {"id"} for item in available["items"])
+
+    assert api["client"].get("/api/v1/projects", params={"scope": "all"}).status_code == 400
+    assert api["client"].get("/api/v1/projects", params={"fields": "id,secret"}).status_code == 400
+
+def test_project_detail(api):
+    project_id = api["project_ids"][1]
+    detail = api["client"].get(f"/api/v1/projects/{project_id}").json()
+    assert detail["id"] == project_id and detail["title"] == "api-1" and detail["close_requested"] is False
+    assert api["other"].get(f"/api/v1/projects/{project_id}", params={"fields": "title,status"}).json() == {"title": "api-1", "status": "open"}
+    assert api["client"].get("/api/v1/projects/0").status_code == 404
+
+def test_project_detail_visibility(api, make_user, login):
+    project_id = api["project_ids"][2]
+    set_project_status(project_id, "in_process")
+    _, stranger = make_user("contractor")
+    assert login(stranger).get(f"/api/v1/projects/{project_id}").status_code == 403
+    # 報價過的接案人仍可看專案，但看不到退件紀錄與檔案
+    assert api["bidder"].get(f"/api/v1/projects/{project_id}").status_code == 200
+    assert api["bidder"].get(f"/api/v1/projects/{project_id}/files").status_code == 403
+
+def test_project_bids(api):
+    project_id = api["project_ids"][0]
+    all_bids = api["client"].get(f"/api/v1/projects/{project_id}/bids", params={"fields": "contractor_id"}).json()
+    assert sorted(item["contractor_id"] for item in all_bids["items"]) == sorted((api["bidder_id"], api["other_id"]))
+    own = api["bidder"].get(f"/api/v1/projects/{project_id}/bids").json()
+    assert [item["contractor_id"] for item in own["items"]] == [api["bidder_id"]]
+    assert own["next"] is None
+
+    page = api["bidder"].get("/api/v1/bids", params={"limit": 2}).json()
+    assert len(page["items"]) == 2 and page["next"] is not None
+    rest = api["bidder"].get("/api/v1/bids", params={"limit": 2, "after": page["next"]}).json()
+    assert [item["project_id"] for item in page["items"] + rest["items"]] == api["project_ids"]
+    assert rest["next"] is None
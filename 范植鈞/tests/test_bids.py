@@ -0,0 +1,31 @@
+# 報價與指派同時進行: 報價的 INSERT ... SELECT 以 FOR SHARE 讀取專案，指派 commit 後重新檢查狀態
+import threading
+
+def test_bid_waits_for_concurrent_assignment(make_user, make_projects, login):
+    import database
+    import models
+    from sqlalchemy import update
+
+    client_id, _ = make_user("client")
+    assigned_id, _ = make_user("contractor")
+    _, contractor = make_user("contractor")
+    project_id, = make_projects(client_id, 1, [assigned_id], title="bid-race")
+    bidder = login(contractor)
+
+    responses = []
+    with database.SessionLocal() as db:
+        # 指派尚未 commit，專案列已被鎖住
+        db.execute(update(models.Project).where(models.Project.id == project_id).values(assigned_contractor_id=assigned_id, status="in_process"))
+        thread = threading.Thread(target=lambda: responses.append(bidder.post(
+            "/projects/bid", data={"project_id": project_id, "price": 500},
+            files={"file": ("proposal.pdf", b"%PDF-1.4 race")}, follow_redirects=False,
+        )))
+        thread.start()
+        thread.join(1)
+        assert thread.is_alive()
+        db.commit()
+    thread.join(10)
+
+    assert responses[0].status_code == 400
+    with database.SessionLocal() as db:
+        assert db.query(models.Bid).filter(models.Bid.project_id == project_id).count() == 1
@@ -0,0 +1,29 @@
+# blobstore: 重複上傳不改變已參照檔案的 mtime，gc 寬限期以 atime 重新起算
+import hashlib
+import io
+import os
+
+import blobstore
+
+CONTENT = b"proposal"
+DIGEST = hashlib.sha256(CONTENT).hexdigest()
+OLD = 1_000_000
+
+def test_reuse_keeps_mtime_and_defers_gc(tmp_path, monkeypatch):
+    monkeypatch.setattr(blobstore, "BLOB_ROOT", str(tmp_path / "blobs"))
+    assert blobstore.put_stream(io.BytesIO(CONTENT), DIGEST, len(CONTENT))
+    reference = tmp_path / "upload_proposal" / "p.pdf"
+    reference.parent.mkdir()
+    blobstore.link_to(DIGEST, str(reference))
+    os.utime(reference, (OLD, OLD))
+
+    # 同樣內容再上傳一次(例如另一個報價的 stage_upload): 既有參照的 Last-Modified 不變
+    assert not blobstore.put_stream(io.BytesIO(CONTENT), DIGEST, len(CONTENT))
+    assert os.stat(reference).st_mtime == OLD
+
+    # 參照刪除後只剩 blob: 剛重複上傳過，寬限期內不回收；超過寬限期才回收
+    reference.unlink()
+    assert blobstore.gc(grace_seconds=60) == 0
+    os.utime(blobstore.blob_path(DIGEST), (OLD, OLD))
+    assert blobstore.gc(grace_seconds=60) == 1
+    assert not blobstore.exists(DIGEST)
@@ -0,0 +1,77 @@
+# 刪除專案與帳號: 只刪除該專案自己的檔案，受影響的專案卡片快取版本會遞增
+import os
+
+def write(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"data")
+
+def queued_payloads(kind):
+    import database
+    import models
+
+    with database.SessionLocal() as db:
+        return [job.payload for job in db.query(models.Job).filter(models.Job.kind == kind, models.Job.status == "queued")]
+
+def test_delete_project_keeps_namesake_files(make_user, make_projects, login):
+    """兩個同名專案: 刪除其中一個時，另一個的計劃書與上傳檔案不受影響"""
+    import database
+    import jobs
+    import models
+
+    client_id, client = make_user("client")
+    _, bidder = make_user("contractor")
+    deleted_id, = make_projects(client_id, 1, title="namesake")
+    kept_id, = make_projects(client_id, 1, title="namesake")
+    # 以報價路由上傳計劃書，磁碟上的位置與 proposal_file 和正式流程相同
+    contractor = login(bidder)
+    for project_id in (deleted_id, kept_id):
+        response = contractor.post("/projects/bid", data={"project_id": project_id, "price": 1000},
+                                   files={"file": (f"{project_id}.pdf", b"%PDF-1.4")}, follow_redirects=False)
+        assert response.status_code == 302
+    with database.SessionLocal() as db:
+        # 專案改為進行中，不出現在可承接列表
+        for project_id in (deleted_id, kept_id):
+            db.query(models.Project).filter(models.Project.id == project_id).update({"status": "in_process"})
+            db.add(models.ProjectFile(project_id=project_id, stage="in_process", folder=f"f{project_id}",
+                                      filename="progress.txt", size=4, sha256="0" * 64))
+        db.commit()
+    own_proposal = f"upload_proposal/namesake-0/{bidder}/{deleted_id}.pdf"
+    own = [f"{own_proposal}/{deleted_id}.pdf", f"upload_file/namesake-0/in_process/f{deleted_id}/progress.txt"]
+    kept = [f"upload_proposal/namesake-0/{bidder}/{kept_id}.pdf/{kept_id}.pdf", f"upload_file/namesake-0/in_process/f{kept_id}/progress.txt"]
+    for path in own[1:] + kept[1:]:
+        write(path)
+    assert all(os.path.isfile(path) for path in own + kept)
+
+    response = login(client).post(f"/projects/delete/{deleted_id}", follow_redirects=False)
+    assert response.status_code == 302
+    payload, = [p for p in queued_payloads("remove_files") if own_proposal in p["paths"]]
+    assert sorted(payload["paths"]) == sorted([own_proposal, own[1]])
+    jobs.remove_files(payload)
+
+    assert not any(os.path.exists(path) for path in own)
+    assert not os.path.exists(own_proposal)
+    assert not os.path.exists(f"upload_file/namesake-0/in_process/f{deleted_id}")
+    assert all(os.path.exists(path) for path in kept)
+
+def test_delete_account_bumps_bid_on_projects(make_user, make_projects, login):
+    """接案人刪除帳號: 報價被 CASCADE 刪除、指派被 SET NULL 的專案都要遞增 version"""
+    import database
+    import models
+
+    client_id, _ = make_user("client")
+    contractor_id, contractor = make_user("contractor")
+    bid_on, assigned, untouched = make_projects(client_id, 3, title="account-delete")
+    with database.SessionLocal() as db:
+        db.add(models.Bid(project_id=bid_on, contractor_id=contractor_id, price=1000))
+        db.query(models.Project).filter(models.Project.id.in_([bid_on, assigned, untouched])).update(
+            {"status": "in_process"})
+        db.query(models.Project).filter(models.Project.id == assigned).update({"assigned_contractor_id": contractor_id})
+        db.commit()
+
+    response = login(contractor).post("/auth/delete_account", follow_redirects=False)
+    assert response.status_code == 302
+    with database.SessionLocal() as db:
+        versions = dict(db.query(models.Project.id, models.Project.version).filter(models.Project.id.in_([bid_on, assigned, untouched])))
+        assert db.get(models.User, contractor_id) is None
+    assert versions == {bid_on: 1, assigned: 1, untouched: 0}
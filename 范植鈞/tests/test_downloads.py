@@ -0,0 +1,174 @@
+# 檔案下載的 Range / 條件式請求: 以 LocalStorage 送出暫存檔，不需要資料庫
+import io
+import os
+import re
+import zipfile
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+import archive_cache
+import storage
+
+CONTENT = bytes(range(256)) * 400
+
+@pytest.fixture
+def client(tmp_path):
+    (tmp_path / "deliverable.bin").write_bytes(CONTENT)
+    backend = storage.LocalStorage(tmp_path)
+    app = FastAPI()
+
+    @app.get("/download/{key:path}")
+    def download(key: str, request: Request):
+        return backend.send(key, "deliverable.bin", "application/octet-stream", request)
+
+    return TestClient(app)
+
+def test_full_download_has_validators(client):
+    response = client.get("/download/deliverable.bin")
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["accept-ranges"] == "bytes"
+    assert re.fullmatch(r'"[0-9a-f]{64}"', response.headers["etag"])
+    assert "last-modified" in response.headers
+
+def test_conditional_get(client):
+    first = client.get("/download/deliverable.bin")
+    response = client.get("/download/deliverable.bin", headers={"If-None-Match": first.headers["etag"]})
+    assert response.status_code == 304
+    assert response.content == b""
+    response = client.get("/download/deliverable.bin", headers={"If-Modified-Since": first.headers["last-modified"]})
+    assert response.status_code == 304
+    response = client.get("/download/deliverable.bin", headers={"If-None-Match": '"stale"'})
+    assert response.status_code == 200
+
+def test_resumed_transfer(client):
+    """下載到一半中斷，帶 Range 與 If-Range 從已收到的位置續傳"""
+    received = b""
+    with client.stream("GET", "/download/deliverable.bin") as response:
+        etag = response.headers["etag"]
+        for chunk in response.iter_bytes(4096):
+            received += chunk
+            if len(received) >= 10_000:
+                break
+    assert 0 < len(received) < len(CONTENT)
+
+    response = client.get("/download/deliverable.bin", headers={"Range": f"bytes={len(received)}-", "If-Range": etag})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes {len(received)}-{len(CONTENT) - 1}/{len(CONTENT)}"
+    assert received + response.content == CONTENT
+
+def test_resume_with_stale_validator_restarts(client):
+    response = client.get("/download/deliverable.bin", headers={"Range": "bytes=100-", "If-Range": '"stale"'})
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+def test_multiple_ranges(client):
+    response = client.get("/download/deliverable.bin", headers={"Range": "bytes=0-9, 1000-1099, 102300-"})
+    assert response.status_code == 206
+    assert "content-range" not in response.headers
+    content_type = response.headers["content-type"]
+    assert content_type.startswith("multipart/byteranges; boundary=")
+    boundary = content_type.split("boundary=")[1].encode()
+
+    # 各段以空行分隔標頭與內容(starlette 換行用 \n，RFC 是 \r\n，兩種都接受)
+    parts = []
+    for part in response.content.split(b"--" + boundary)[1:-1]:
+        head, body = re.split(rb"\r?\n\r?\n", part.lstrip(b"\r\n"), maxsplit=1)
+        start, end = map(int, re.search(rb"Content-Range: bytes (\d+)-(\d+)/", head, re.I).groups())
+        parts.append((start, end, re.sub(rb"\r?\n$", b"", body)))
+    assert [(start, end) for start, end, _ in parts] == [(0, 9), (1000, 1099), (102300, len(CONTENT) - 1)]
+    for start, end, body in parts:
+        assert body == CONTENT[start:end + 1]
+
+def test_suffix_and_overlapping_ranges(client):
+    response = client.get("/download/deliverable.bin", headers={"Range": "bytes=-100"})
+    assert response.status_code == 206
+    assert response.content == CONTENT[-100:]
+    # 重疊的範圍合併成一段
+    response = client.get("/download/deliverable.bin", headers={"Range": "bytes=0-99, 50-199"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 0-199/{len(CONTENT)}"
+    assert response.content == CONTENT[:200]
+
+def test_unsatisfiable_and_malformed_ranges(client):
+    response = client.get("/download/deliverable.bin", headers={"Range": f"bytes={len(CONTENT)}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(CONTENT)}"
+    # 無法解析的 Range 忽略，送出整個檔案
+    response = client.get("/download/deliverable.bin", headers={"Range": "items=0-9"})
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+def test_cached_archive_hit_keeps_validators(tmp_path, monkeypatch):
+    """zip 快取命中時只更新 atime(LRU)，Last-Modified 與 ETag 不變，條件式請求與續傳仍有效"""
+    monkeypatch.setattr(archive_cache, "ARCHIVE_CACHE_DIR", str(tmp_path))
+    old, recent = tmp_path / "old.zip", tmp_path / "recent.zip"
+    for path in (old, recent):
+        path.write_bytes(b"zip")
+        os.utime(path, (1_000_000, 1_000_000))
+
+    assert archive_cache.lookup("old") == str(old)
+    assert os.stat(old).st_mtime == 1_000_000
+    assert os.stat(old).st_atime > 1_000_000
+    # 剛使用過的保留，最久未使用的先淘汰
+    monkeypatch.setattr(archive_cache, "ARCHIVE_CACHE_MAX_BYTES", 3)
+    monkeypatch.setattr(storage, "unpublish", lambda path: None)
+    archive_cache.evict()
+    assert old.exists() and not recent.exists()
+
+def test_proposal_download_requires_client_or_bidder(app, make_user, make_projects, login):
+    """計劃書以報價 id 下載，只有專案的委託人與報價的接案人可以下載"""
+    import database
+    import models
+
+    client_id, client = make_user("client")
+    _, other_client = make_user("client")
+    _, bidder = make_user("contractor")
+    _, other_contractor = make_user("contractor")
+    project_id, = make_projects(client_id, 1, title="proposal-download")
+    response = login(bidder).post("/projects/bid", data={"project_id": project_id, "price": 1000},
+                                  files={"file": ("plan.pdf", b"%PDF-1.4 plan")}, follow_redirects=False)
+    assert response.status_code == 302
+    with database.SessionLocal() as db:
+        bid_id = db.query(models.Bid.id).filter(models.Bid.project_id == project_id).scalar()
+
+    url = f"/projects/proposal_download_zip?bid_id={bid_id}"
+    for username in (client, bidder):
+        response = login(username).get(url)
+        assert response.status_code == 200
+        assert zipfile.ZipFile(io.BytesIO(response.content)).read("plan.pdf") == b"%PDF-1.4 plan"
+    for username in (other_client, other_contractor):
+        assert login(username).get(url).status_code == 403
+    assert TestClient(app).get(url).status_code == 401
+    assert login(client).get("/projects/proposal_download_zip?bid_id=0").status_code == 404
+    # 不再接受任意路徑
+    assert login(client).get("/projects/proposal_download_zip?path=upload_proposal").status_code == 422
+
+def test_stage_download_requires_project_member(make_user, make_projects, login):
+    import database
+    import models
+
+    client_id, client = make_user("client")
+    contractor_id, contractor = make_user("contractor")
+    _, outsider = make_user("contractor")
+    project_id, = make_projects(client_id, 1, title="stage-download")
+    with database.SessionLocal() as db:
+        db.query(models.Project).filter(models.Project.id == project_id).update(
+            {"assigned_contractor_id": contractor_id, "status": "in_process"})
+        db.add(models.ProjectFile(project_id=project_id, stage="in_process", folder="2026-01-01_10-00",
+                                  filename="progress.txt", size=4, sha256="0" * 64))
+        db.commit()
+    folder = "upload_file/stage-download-0/in_process/2026-01-01_10-00"
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, "progress.txt"), "wb") as f:
+        f.write(b"data")
+
+    url = f"/projects/download_zip?project_id={project_id}&folder=2026-01-01_10-00&stage=in_process"
+    assert login(client).get(url).status_code == 200
+    assert login(contractor).get(url).status_code == 200
+    assert login(outsider).get(url).status_code == 403
+    # 資料庫沒有紀錄的資料夾或階段
+    assert login(client).get(url.replace("2026-01-01_10-00", "..")).status_code == 404
+    assert login(client).get(url.replace("stage=in_process", "stage=..")).status_code == 400
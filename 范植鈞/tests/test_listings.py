@@ -0,0 +1,69 @@
+# 專案列表的查詢數: 一頁 50 個專案與一頁 2 個專案送出的 SQL 數相同，不會隨專案或報價數增加(N+1)
+import pytest
+
+import page_cache
+
+BIDDERS = 5
+
+@pytest.fixture(scope="module")
+def listing(make_user, make_projects):
+    """兩個委託人(2 個與 60 個專案)，每個專案都有 BIDDERS 個接案人報價"""
+    contractors = [make_user("contractor") for _ in range(BIDDERS)]
+    bidder_ids = [user_id for user_id, _ in contractors]
+    small_id, small = make_user("client")
+    big_id, big = make_user("client")
+    make_projects(small_id, 2, bidder_ids, title="listing-small")
+    make_projects(big_id, 60, bidder_ids, title="listing-big")
+    return {"small": small, "big": big, "contractor": contractors[0][1]}
+
+def count_page(client, url, statements):
+    client.get(url)  # 第一次請求會建立連線與初始化，不列入計算
+    statements.clear()
+    response = client.get(url)
+    assert response.status_code == 200
+    return len(statements), response.text
+
+def test_client_projects_page(listing, login, count_queries):
+    small, small_page = count_page(login(listing["small"]), "/projects/my_projects", count_queries)
+    big, big_page = count_page(login(listing["big"]), "/projects/my_projects", count_queries)
+    assert big_page.count("選定接案人</button>") == 50 * BIDDERS
+    # 專案(含指派的接案人) 1 條 + 報價與報價人 1 條
+    assert small == big == 2
+
+def test_contractor_pages(listing, login, count_queries):
+    contractor = login(listing["contractor"])
+    count, page = count_page(contractor, "/projects/my_bids", count_queries)
+    assert page.count("已報價") == 50
+    # 專案與自己的報價 join 成 1 條
+    assert count == 1
+
+    count, page = count_page(contractor, "/projects/search?q=listing&sort=newest", count_queries)
+    assert page.count("已報價") == 50
+    assert count == 1
+
+def test_available_page(listing, login, count_queries):
+    contractor = login(listing["contractor"])
+    contractor.get("/projects/available_page")
+    page_cache.invalidate(page_cache.AVAILABLE_PROJECTS)
+    count_queries.clear()
+    response = contractor.get("/projects/available_page")
+    assert response.status_code == 200
+    # 快取失效後重新查詢: 專案 1 條 + 自己的報價 1 條；之後專案由快取提供，只查自己的報價
+    assert len(count_queries) == 2
+    count_queries.clear()
+    response = contractor.get("/projects/available_page")
+    assert len(count_queries) == 1
+    # 其他測試建立的開放專案也可能在這一頁，接案人只對 listing 專案報價過
+    assert response.text.count("已報價") == response.text.count("專案名稱: listing-") > 0
+
+    # 共用快取只有專案欄位，不含其他人的報價與計劃書路徑
+    cached = [data for data, _, _ in page_cache.store._data.values()]
+    assert cached and not any("upload_proposal" in data or "\"price\"" in data for data in cached)
+
+def test_available_page_client_sees_own_bids_only(listing, login, count_queries):
+    count, page = count_page(login(listing["big"]), "/projects/available_page", count_queries)
+    # 自己專案的報價與報價人 1 條
+    assert count == 1
+    assert page.count("選定接案人</button>") == page.count("刪除專案</button>") * BIDDERS > 0
+    count, page = count_page(login(listing["small"]), "/projects/available_page", count_queries)
+    assert page.count("選定接案人</button>") == page.count("刪除專案</button>") * BIDDERS
@@ -0,0 +1,59 @@
+# 退件: 同一分鐘的結案資料夾被退件兩次，兩次的檔案各自保留在不同的退件資料夾
+import hashlib
+import os
+
+def upload_final(project_id, folder, content):
+    """模擬接案人上傳結案檔案: 寫入磁碟並新增 final 紀錄"""
+    import database
+    import models
+
+    path = f"upload_file/reject-twice-0/final/{folder}/report.pdf"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+    with database.SessionLocal() as db:
+        db.add(models.ProjectFile(project_id=project_id, stage="final", folder=folder, filename="report.pdf",
+                                  size=len(content), sha256=hashlib.sha256(content).hexdigest()))
+        db.commit()
+
+def reject(client, project_id):
+    import database
+    import jobs
+    import models
+
+    response = client.post("/projects/decision", data={"project_id": project_id, "decision": "reject", "explanation": "請修改"},
+                           follow_redirects=False)
+    assert response.status_code == 303
+    with database.SessionLocal() as db:
+        job = db.query(models.Job).filter(models.Job.kind == "move_files", models.Job.key.like(f"reject:{project_id}:%"),
+                                          models.Job.status == "queued").one()
+        job.status = "done"
+        db.commit()
+        jobs.move_files(job.payload)
+        return job.payload["dest"]
+
+def test_reject_same_folder_twice(make_user, make_projects, login):
+    import database
+    import models
+
+    client_id, client = make_user("client")
+    project_id, = make_projects(client_id, 1, title="reject-twice")
+    with database.SessionLocal() as db:
+        db.query(models.Project).filter(models.Project.id == project_id).update({"status": "in_process"})
+        db.commit()
+    client = login(client)
+
+    upload_final(project_id, "2026-01-01_10-00", b"first")
+    first = reject(client, project_id)
+    # 同一分鐘內重新上傳，放進同名的結案資料夾後再被退件
+    upload_final(project_id, "2026-01-01_10-00", b"second")
+    second = reject(client, project_id)
+
+    assert first != second
+    with open(os.path.join(first, "report.pdf"), "rb") as f:
+        assert f.read() == b"first"
+    with open(os.path.join(second, "report.pdf"), "rb") as f:
+        assert f.read() == b"second"
+    with database.SessionLocal() as db:
+        rows = db.query(models.ProjectFile.stage, models.ProjectFile.folder).filter(models.ProjectFile.project_id == project_id).all()
+    assert sorted(rows) == sorted(("rejected", os.path.basename(path)) for path in (first, second))
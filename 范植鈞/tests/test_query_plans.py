@@ -0,0 +1,28 @@
+# 熱門查詢的執行計畫: 沿用 benchmarks/explain_plans.py 的資料與查詢，任一查詢對大資料表使用 Seq Scan 即失敗
+# 使用者數與 benchmark 預設相同(每人的專案、報價筆數貼近實際)，專案數只需讓 planner 偏好索引
+import pytest
+
+from benchmarks import explain_plans
+
+PROJECTS = 20_000
+CLIENTS = 2_000
+CONTRACTORS = 5_000
+
+@pytest.fixture(scope="module")
+def plan_db(app):
+    import database
+
+    with database.SessionLocal() as db:
+        explain_plans.generate(db, PROJECTS, CLIENTS, CONTRACTORS)
+    yield
+    explain_plans.cleanup()
+
+def test_hot_queries_use_indexes(plan_db):
+    import database
+
+    with database.SessionLocal() as db:
+        queries = explain_plans.hot_queries(db)
+        scans = {name: explain_plans.seq_scans(explain_plans.explain(db, stmt)) for name, stmt in queries}
+        db.rollback()
+    assert len(queries) == len(scans)
+    assert {name: tables for name, tables in scans.items() if tables} == {}
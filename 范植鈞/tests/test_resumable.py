@@ -0,0 +1,110 @@
+# 可續傳上傳: 連線在 PATCH 途中中斷後，以 HEAD 查詢 offset 接續，最後 finalize 放進專案資料夾
+import asyncio
+import base64
+import hashlib
+import os
+
+import pytest
+
+DATA = os.urandom(3 * 1024 * 1024 + 12345)
+
+def metadata(**values):
+    return ",".join(f"{key} {base64.b64encode(str(value).encode()).decode()}" for key, value in values.items())
+
+@pytest.fixture
+def upload(make_user, make_projects, login):
+    """被指派的接案人已建立一個上傳工作階段，回傳 (client, 上傳網址, 專案 id)"""
+    import database
+    import models
+
+    client_id, _ = make_user("client")
+    contractor_id, contractor = make_user("contractor")
+    project_id, = make_projects(client_id, 1, title="resumable")
+    with database.SessionLocal() as db:
+        db.query(models.Project).filter(models.Project.id == project_id).update({"assigned_contractor_id": contractor_id, "status": "in_process"})
+        db.commit()
+
+    client = login(contractor)
+    response = client.post("/upload/resumable", headers={
+        "Tus-Resumable": "1.0.0",
+        "Upload-Length": str(len(DATA)),
+        "Upload-Metadata": metadata(project_id=project_id, stage="final", filename="video.bin"),
+    })
+    assert response.status_code == 201
+    return client, response.headers["location"], project_id
+
+def patch_then_disconnect(app, client, url, offset, chunks):
+    """直接呼叫 ASGI app: 送出幾段 body 後回報 http.disconnect，和 server 在連線被切斷時的行為相同"""
+    messages = [{"type": "http.request", "body": chunk, "more_body": True} for chunk in chunks]
+    headers = [
+        (b"host", b"testserver"),
+        (b"cookie", "; ".join(f"{name}={value}" for name, value in client.cookies.items()).encode()),
+        (b"content-type", b"application/offset+octet-stream"),
+        (b"upload-offset", str(offset).encode()),
+        (b"tus-resumable", b"1.0.0"),
+    ]
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "PATCH", "scheme": "http",
+        "path": url, "raw_path": url.encode(), "query_string": b"", "root_path": "", "headers": headers,
+        "client": ("testclient", 50000), "server": ("testserver", 80),
+    }
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        pass
+
+    asyncio.run(app(scope, receive, send))
+
+def head_offset(client, url):
+    response = client.head(url, headers={"Tus-Resumable": "1.0.0"})
+    assert response.status_code == 200
+    return int(response.headers["upload-offset"]), response.headers["upload-ranges"]
+
+def patch(client, url, offset, body):
+    return client.patch(url, content=body, headers={
+        "Tus-Resumable": "1.0.0", "Content-Type": "application/offset+octet-stream", "Upload-Offset": str(offset),
+    })
+
+def finalize_and_check(client, url, project_id):
+    import database
+    import models
+
+    response = client.post(f"{url}/finalize")
+    assert response.status_code == 200
+    result = response.json()
+    assert result["size"] == len(DATA)
+    assert result["sha256"] == hashlib.sha256(DATA).hexdigest()
+    with open(result["path"], "rb") as f:
+        assert f.read() == DATA
+    with database.SessionLocal() as db:
+        row = db.query(models.ProjectFile).filter(models.ProjectFile.project_id == project_id).one()
+        assert (row.stage, row.filename, row.size) == ("final", "video.bin", len(DATA))
+
+def test_resume_after_connection_killed(app, upload):
+    client, url, project_id = upload
+    sent = [DATA[i:i + 64 * 1024] for i in range(0, 1024 * 1024 + 5000, 64 * 1024)]
+    patch_then_disconnect(app, client, url, 0, sent)
+
+    # 中斷前收到的部分都已保留
+    offset, _ = head_offset(client, url)
+    assert offset == sum(len(chunk) for chunk in sent)
+    assert client.post(f"{url}/finalize").status_code == 409
+
+    response = patch(client, url, offset, DATA[offset:])
+    assert response.status_code == 204
+    assert int(response.headers["upload-offset"]) == len(DATA)
+    finalize_and_check(client, url, project_id)
+
+def test_parallel_parts_out_of_order(app, upload):
+    client, url, project_id = upload
+    middle = len(DATA) // 2
+    assert patch(client, url, middle, DATA[middle:]).status_code == 204
+    offset, ranges = head_offset(client, url)
+    assert offset == 0
+    assert ranges == f"{middle}-{len(DATA) - 1}"
+
+    response = patch(client, url, 0, DATA[:middle])
+    assert int(response.headers["upload-offset"]) == len(DATA)
+    finalize_and_check(client, url, project_id)
@@ -0,0 +1,42 @@
+# 全文檢索: 依相關度排序只在最新的 SEARCH_RANK_CANDIDATES 筆中排名，超過時 API 與頁面需標示結果已截斷
+import pytest
+
+import search
+from routers import projects as project_routes
+
+@pytest.fixture(scope="module")
+def searcher(make_user, make_projects, login):
+    client_id, username = make_user("client")
+    make_projects(client_id, 5, title="截斷測試")
+    return login(username)
+
+@pytest.fixture
+def candidates(monkeypatch):
+    def set_limit(limit):
+        monkeypatch.setattr(search, "SEARCH_RANK_CANDIDATES", limit)
+        monkeypatch.setattr(project_routes, "SEARCH_RANK_CANDIDATES", limit)
+    return set_limit
+
+def test_api_marks_truncated_relevance(searcher, candidates):
+    candidates(3)
+    result = searcher.get("/api/v1/projects/search", params={"q": "截斷測試", "fields": "title,rank"}).json()
+    assert result["truncated"] is True
+    assert len(result["items"]) == 3
+    assert all(set(item) == {"title", "rank"} for item in result["items"])
+
+    result = searcher.get("/api/v1/projects/search", params={"q": "截斷測試", "sort": "newest", "fields": "id"}).json()
+    assert result["truncated"] is False
+    assert len(result["items"]) == 5
+    assert all(set(item) == {"id"} for item in result["items"])
+
+    candidates(10)
+    result = searcher.get("/api/v1/projects/search", params={"q": "截斷測試"}).json()
+    assert result["truncated"] is False
+    assert len(result["items"]) == 5
+
+def test_page_shows_truncation_notice(searcher, candidates):
+    candidates(3)
+    assert "相關度排序只包含最新的 3 筆" in searcher.get("/projects/search", params={"q": "截斷測試"}).text
+    assert "相關度排序只包含" not in searcher.get("/projects/search", params={"q": "截斷測試", "sort": "newest"}).text
+    candidates(10)
+    assert "相關度排序只包含" not in searcher.get("/projects/search", params={"q": "截斷測試"}).text
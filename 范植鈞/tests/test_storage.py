@@ -0,0 +1,75 @@
+# 儲存後端: 簽章金鑰設定檢查，以及以 moto 模擬的 S3 相容儲存(未安裝 moto、boto3 時略過)
+import os
+import subprocess
+import sys
+
+import pytest
+
+import storage
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def import_storage(**env):
+    environ = {key: value for key, value in os.environ.items() if not key.startswith("STORAGE_")}
+    return subprocess.run([sys.executable, "-c", "import storage"], cwd=APP_DIR, capture_output=True, text=True,
+                          env={**environ, **env})
+
+def test_signed_urls_require_signing_key():
+    result = import_storage(STORAGE_SIGNED_URLS="true")
+    assert result.returncode != 0
+    assert "STORAGE_SIGNING_KEY" in result.stderr
+    assert import_storage(STORAGE_SIGNED_URLS="true", STORAGE_SIGNING_KEY="k").returncode == 0
+    assert import_storage().returncode == 0
+
+def test_unsigned_without_key(monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_SIGNING_KEY", b"")
+    with pytest.raises(RuntimeError):
+        storage.sign("a.zip", 2_000_000_000)
+    assert not storage.verify_signature("a.zip", 2_000_000_000, "0" * 64)
+
+@pytest.fixture
+def s3(tmp_path, monkeypatch):
+    """moto 模擬的 S3，回傳 (建立後端的函式, 本機檔案)"""
+    moto = pytest.importorskip("moto")
+    pytest.importorskip("boto3")
+    for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+        monkeypatch.setenv(name, "testing")
+    monkeypatch.setattr(storage, "STORAGE_ROOT", str(tmp_path))
+    archive = tmp_path / "archive_cache" / ("a" * 64 + ".zip")
+    archive.parent.mkdir()
+    archive.write_bytes(b"PK zip")
+    with moto.mock_aws():
+        def create():
+            backend = storage.S3Storage()
+            calls = []
+            head_object = backend.client.head_object
+            backend.client.head_object = lambda **kwargs: calls.append(kwargs) or head_object(**kwargs)
+            return backend, calls
+        backend, _ = create()
+        backend.client.create_bucket(Bucket=storage.S3_BUCKET)
+        monkeypatch.setattr(storage, "backend", backend)
+        yield create, str(archive)
+
+def test_s3_publish_serve_and_unpublish(s3):
+    create, archive = s3
+    key = storage.publish(archive)
+    backend = storage.backend
+    stored = backend.client.get_object(Bucket=storage.S3_BUCKET, Key=key)["Body"].read()
+    assert stored == b"PK zip"
+
+    # 已知存在的物件直接導向 presigned URL，不必每次 head_object
+    backend, calls = create()
+    for _ in range(3):
+        response = backend.serve(key, "a.zip", "application/zip")
+        assert response.status_code == 302
+        assert storage.S3_BUCKET in response.headers["location"] and key in response.headers["location"]
+    assert len(calls) == 1
+
+    # 物件刪除後改由本機檔案送出
+    storage.unpublish(archive)
+    backend, calls = create()
+    with pytest.raises(backend.client.exceptions.ClientError):
+        backend.client.head_object(Bucket=storage.S3_BUCKET, Key=key)
+    response = backend.serve(key, "a.zip", "application/zip")
+    assert response.status_code == 200
+    assert response.path == os.path.abspath(archive)
@@ -0,0 +1,66 @@
+# uploads.py
+# 上傳檔案以固定大小分塊處理，整個複製在 thread 中執行，不佔用 event loop 也不會整檔讀進記憶體
+# 內容存進 blobstore，目標資料夾只放指向 blob 的參照，重複上傳相同檔案不會再寫入資料
+import asyncio
+import hashlib
+import os
+from fastapi import HTTPException, Request, UploadFile
+from fastapi.responses import JSONResponse
+import blobstore
+
+# 每次讀寫的區塊大小(bytes)
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+# 單一檔案大小上限(bytes)，0 代表不限制
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+
+class UploadTooLarge(Exception):
+    pass
+
+async def reject_oversized_uploads(request: Request, call_next):
+    """middleware: Content-Length 已超過上限時，在解析 multipart 之前就拒絕"""
+    length = request.headers.get("content-length")
+    if UPLOAD_MAX_BYTES and length and length.isdigit() and int(length) > UPLOAD_MAX_BYTES:
+        return JSONResponse({"detail": "檔案過大"}, status_code=413)
+    return await call_next(request)
+
+def _store_stream(src, max_bytes):
+    # 先只讀取計算雜湊與大小；內容已在 blobstore 時不必再寫入
+    sha256 = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = src.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if max_bytes and size > max_bytes:
+            raise UploadTooLarge()
+        sha256.update(chunk)
+    digest = sha256.hexdigest()
+    src.seek(0)
+    # blob 以暫存檔 + rename 寫入，不會留下寫到一半的檔案
+    blobstore.put_stream(src, digest, size)
+    return size, digest
+
+def link_upload(digest, dest_dir, filename):
+    """在 dest_dir 建立指向 blob 的參照，回傳檔案路徑"""
+    os.makedirs(dest_dir, exist_ok=True)
+    dest_path = os.path.join(dest_dir, os.path.basename(filename))
+    blobstore.link_to(digest, dest_path)
+    return dest_path
+
+async def stage_upload(file: UploadFile):
+    """只把上傳內容存進 blobstore，還沒有任何資料夾參照它，回傳 (位元組數, sha256)
+    確定要保留時再以 link_upload 放到目標資料夾；沒有被參照的 blob 會由 blobstore gc 回收"""
+    if UPLOAD_MAX_BYTES and file.size is not None and file.size > UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="檔案過大")
+    await file.seek(0)
+    try:
+        return await asyncio.to_thread(_store_stream, file.file, UPLOAD_MAX_BYTES)
+    except UploadTooLarge:
+        raise HTTPException(status_code=413, detail="檔案過大")
+
+async def save_upload(file: UploadFile, dest_dir, filename=None):
+    """把上傳檔案串流存到 dest_dir，回傳 (檔案路徑, 位元組數, sha256)"""
+    size, digest = await stage_upload(file)
+    dest_path = await asyncio.to_thread(link_upload, digest, dest_dir, filename or file.filename)
+    return dest_path, size, digest
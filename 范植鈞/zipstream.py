@@ -0,0 +1,69 @@
+# zipstream.py
+# 邊讀檔邊產生 zip，StreamingResponse 可以立即送出第一個 byte，記憶體用量與資料夾大小無關
+import os
+import zipfile
+
+# 每次讀取的區塊大小(bytes)
+ZIP_CHUNK_SIZE = int(os.getenv("ZIP_CHUNK_SIZE", str(1024 * 1024)))
+
+# 已壓縮過的格式直接存入(ZIP_STORED)，再 deflate 只會浪費 CPU
+STORED_EXTENSIONS = {
+    ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".webp",
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".7z", ".rar",
+    ".mp3", ".mp4", ".mov", ".avi", ".mkv",
+    ".docx", ".xlsx", ".pptx",
+}
+
+class _StreamBuffer:
+    """ZipFile 的輸出目標: 只暫存尚未送出的資料；沒有 seek()，ZipFile 會改用 data descriptor"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+def compress_type_for(filename):
+    if os.path.splitext(filename)[1].lower() in STORED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+def iter_folder_zip(base_path):
+    """將資料夾打包成 zip 的 generator，檔名相對於 base_path"""
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, mode="w") as zf:
+        for root, dirs, files in os.walk(base_path):
+            for file in files:
+                file_path = os.path.join(root, file)
+                # 列出後才被搬走的檔案(例如背景工作把被退件的檔案移到 rejected)略過
+                try:
+                    zinfo = zipfile.ZipInfo.from_file(file_path, arcname=os.path.relpath(file_path, base_path))
+                    src = open(file_path, "rb")
+                except FileNotFoundError:
+                    continue
+                zinfo.compress_type = compress_type_for(file)
+                with src, zf.open(zinfo, mode="w") as dest:
+                    while True:
+                        chunk = src.read(ZIP_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        dest.write(chunk)
+                        data = buffer.drain()
+                        if data:
+                            yield data
+                data = buffer.drain()
+                if data:
+                    yield data
+    # 結尾的 central directory
+    data = buffer.drain()
+    if data:
+        yield data